@@ -0,0 +1,65 @@
+"""
+Compares the ways a zone can reach the parser: streamed from the file, as an mmap of the file,
+as bytes decoded chunk by chunk (iter_lines), and as bytes decoded whole and split into lines
+(the former in-memory path, kept here as the baseline).
+
+Reports the parse time and the peak memory traced on top of the zone itself.
+
+Usage: PYTHONPATH=src python benchmarks/bench_input.py [count]
+"""
+import argparse
+import mmap
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from cleandns.zone_parser import ZoneParser, iter_lines
+
+sys.path.insert(0, str(Path(__file__).parent))
+from zone_generator import write_zone  # noqa: E402
+
+
+def parse_file(path: Path, data: bytes) -> int:
+    with open(path, "r") as file:
+        return sum(1 for _ in ZoneParser(path.name).parse(file))
+
+
+def parse_mmap(path: Path, data: bytes) -> int:
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return sum(1 for _ in ZoneParser(path.name).parse(iter_lines(mapped)))
+
+
+def parse_bytes(path: Path, data: bytes) -> int:
+    return sum(1 for _ in ZoneParser(path.name).parse(iter_lines(data)))
+
+
+def legacy_parse_bytes(path: Path, data: bytes) -> int:
+    """The in-memory path as it was before iter_lines, kept here as the baseline."""
+    return sum(1 for _ in ZoneParser(path.name).parse(data.decode().splitlines()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the ways a zone can reach the parser.")
+    parser.add_argument("count", type=int, nargs="?", default=1_000_000, help="number of records")
+    count = parser.parse_args().count
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_zone(Path(directory) / "bench.zone", records=count)
+        data = path.read_bytes()
+        print(f"{count} records, {len(data) / 2 ** 20:.1f} MiB")
+        for function in (parse_file, parse_mmap, parse_bytes, legacy_parse_bytes):
+            start = time.perf_counter()
+            function(path, data)
+            elapsed = time.perf_counter() - start
+
+            # Records are dropped as they are parsed, so the peak is the input handling alone
+            tracemalloc.start()
+            function(path, data)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{function.__name__:20} {elapsed:7.3f}s  peak {peak / 2 ** 20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Measures the memory held per record after parsing a zone, compared with the former
+representation (dataclasses with a per-instance __dict__).
+
+Usage: PYTHONPATH=src python benchmarks/bench_memory.py [count]
+"""
+import argparse
+import gc
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Optional, Any
+
+from cleandns.record_types import RecordType, DNSClass
+from cleandns.zone_parser import ZoneParser
+
+
+@dataclass
+class LegacyRecord:
+    """The record layout as it was before slots, kept here as the baseline."""
+    name: str
+    ttl: int
+    type: RecordType
+    rdata: Any
+    comment: Optional[str] = field(compare=False)
+    class_: DNSClass
+
+
+def zone_lines(count: int):
+    yield "$TTL 3600\n"
+    yield "@ IN SOA ns1.example.com. admin.example.com. 1 3600 1800 604800 86400\n"
+    for i in range(count // 2):
+        yield f"host-{i} IN A 10.{i % 256}.{i // 256 % 256}.{i // 65536 % 256}\n"
+    for i in range(count - count // 2):
+        yield f"{i % 256}.{i // 256 % 256}.{i // 65536 % 256} IN PTR host-{i}.example.com.\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the memory held per parsed record.")
+    parser.add_argument("count", type=int, nargs="?", default=1_000_000, help="number of records")
+    count = parser.parse_args().count
+
+    tracemalloc.start()
+    records = list(ZoneParser("bench.zone").parse(zone_lines(count)))
+    gc.collect()
+    current_size = tracemalloc.get_traced_memory()[0]
+
+    # Same strings, held by the former record layout instead
+    legacy = [LegacyRecord(r.name, r.ttl, r.type, r.rdata, r.comment, r.class_) for r in records]
+    del records
+    gc.collect()
+    legacy_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"records:          {len(legacy)}")
+    print(f"dataclass+dict:   {legacy_size / 2 ** 20:.1f} MiB ({legacy_size / len(legacy):.0f} B/record)")
+    print(f"slotted:          {current_size / 2 ** 20:.1f} MiB ({current_size / len(legacy):.0f} B/record)")
+    print(f"saved:            {(1 - current_size / legacy_size) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Times and memory-profiles every phase of cleaning a zone on synthetic zones, writes the
+results to JSON and optionally compares them with a stored baseline.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_phases.py --records 1000 100000 --output results.json
+    PYTHONPATH=src python benchmarks/bench_phases.py --records 1000 100000 --baseline results.json
+
+The comparison exits with code 1 when a phase got slower (or bigger) than the baseline by more
+than the tolerance.
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from cleandns.dns_file import DNSFile
+from cleandns.logger import BufferedLogger
+
+sys.path.insert(0, str(Path(__file__).parent))
+from zone_generator import write_zone  # noqa: E402
+
+PHASES = ["init", "remove_duplicates", "sort", "reconstruct_file", "replace_file"]
+# Differences below these are measurement noise, whatever the relative change
+MIN_DELTA = {"seconds": 0.01, "peak_bytes": 256 * 1024}
+
+
+def run_phases(path: Path, measure: Callable) -> Dict[str, float]:
+    """
+    Runs every phase on a fresh copy of the zone, measuring each one with `measure`.
+    """
+    results = {}
+    dns_file = None
+
+    def init():
+        nonlocal dns_file
+        dns_file = DNSFile(path, logger=BufferedLogger())
+
+    results["init"] = measure(init)
+    results["remove_duplicates"] = measure(lambda: dns_file.remove_duplicates())
+    results["sort"] = measure(lambda: dns_file.sort())
+    results["reconstruct_file"] = measure(lambda: dns_file.reconstruct_file())
+    results["replace_file"] = measure(lambda: dns_file.replace_file())
+    return results
+
+
+def measure_time(function: Callable) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def measure_peak_memory(function: Callable) -> int:
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    function()
+    return tracemalloc.get_traced_memory()[1] - before
+
+
+def benchmark(records: int, kind: str, duplicate_ratio: float, disorder: float, repeat: int) -> Dict:
+    with tempfile.TemporaryDirectory() as directory:
+        source = write_zone(Path(directory) / "source.zone", records=records, kind=kind,
+                            duplicate_ratio=duplicate_ratio, disorder=disorder)
+        zone_text = source.read_text()
+        path = Path(directory) / "bench.zone"
+
+        # Timing runs without tracemalloc, which would slow every allocation down
+        seconds = {phase: float("inf") for phase in PHASES}
+        for _ in range(repeat):
+            path.write_text(zone_text)
+            for phase, elapsed in run_phases(path, measure_time).items():
+                seconds[phase] = min(seconds[phase], elapsed)
+
+        path.write_text(zone_text)
+        tracemalloc.start()
+        try:
+            peak_bytes = run_phases(path, measure_peak_memory)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "records": records,
+        "kind": kind,
+        "duplicate_ratio": duplicate_ratio,
+        "disorder": disorder,
+        "phases": {phase: {"seconds": seconds[phase], "peak_bytes": peak_bytes[phase]} for phase in PHASES},
+    }
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    """
+    Returns a description of every phase that regressed by more than the tolerance.
+    """
+    def key(result):
+        return result["kind"], result["records"], result["duplicate_ratio"], result["disorder"]
+
+    baseline_by_key = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = baseline_by_key.get(key(result))
+        if reference is None:
+            continue
+        for phase, values in result["phases"].items():
+            for metric in ("seconds", "peak_bytes"):
+                old = reference["phases"].get(phase, {}).get(metric)
+                new = values[metric]
+                if old and new > old * (1 + tolerance) and new - old > MIN_DELTA[metric]:
+                    regressions.append(f"{result['kind']} {result['records']} {phase} {metric}: {old:.4g} -> {new:.4g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every phase of cleaning a zone.")
+    parser.add_argument("--records", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--kind", choices=["forward", "reverse"], nargs="+", default=["forward", "reverse"])
+    parser.add_argument("--duplicate-ratio", type=float, default=0.05)
+    parser.add_argument("--disorder", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per zone, the fastest is kept")
+    parser.add_argument("--output", type=Path, help="where to write the JSON results")
+    parser.add_argument("--baseline", type=Path, help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = []
+    for kind in args.kind:
+        for records in args.records:
+            result = benchmark(records, kind, args.duplicate_ratio, args.disorder, args.repeat)
+            results.append(result)
+            phases = "  ".join(f"{phase} {values['seconds']:.3f}s/{values['peak_bytes'] / 2 ** 20:.1f}MiB"
+                               for phase, values in result["phases"].items())
+            print(f"{kind:8} {records:>9}  {phases}")
+
+    report = {"python": platform.python_version(), "results": results}
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text())["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compares sorting a reverse zone with the precomputed sort keys against the former
+comparison-based ordering (PTRRecord.__lt__ rebuilding both label lists on every call).
+
+Usage: PYTHONPATH=src python benchmarks/bench_sort.py [count]
+"""
+import argparse
+import random
+import time
+from dataclasses import dataclass
+from operator import attrgetter
+
+from cleandns.record_types import PTRRecord, RecordType, DNSClass
+
+
+@dataclass
+class LegacyPTRRecord(PTRRecord):
+    """The PTR ordering as it was before sort keys, kept here as the baseline."""
+
+    def __lt__(self, other: object) -> bool:
+        def sort_key(name: str):
+            return [
+                (0, int(part)) if part.isdigit() else (1, part.lower())
+                for part in name.split('.')
+            ]
+
+        self_key = sort_key(self.name)
+        other_key = sort_key(other.name)
+
+        if self_key != other_key:
+            return self_key < other_key
+
+        return str(self.rdata).lower() < str(other.rdata).lower()
+
+
+def make_records(record_cls, count: int, seed: int = 42):
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        a, b, c = rng.randrange(256), rng.randrange(256), rng.randrange(256)
+        records.append(record_cls(name=f"{a}.{b}.{c}", ttl=3600, type=RecordType.PTR, class_=DNSClass.IN,
+                                  rdata=f"host-{c}-{b}-{a}.example.com.", comment=None))
+    return records
+
+
+def timed(function, records):
+    start = time.perf_counter()
+    result = function(records)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sorting by precomputed keys with the former comparison-based ordering.")
+    parser.add_argument("count", type=int, nargs="?", default=1_000_000, help="number of records")
+    count = parser.parse_args().count
+
+    legacy_time, legacy_order = timed(sorted, make_records(LegacyPTRRecord, count))
+    key_time, key_order = timed(lambda records: sorted(records, key=attrgetter("sort_key")), make_records(PTRRecord, count))
+
+    assert [r.name for r in legacy_order] == [r.name for r in key_order], "orderings differ"
+
+    print(f"records:        {count}")
+    print(f"__lt__ sort:    {legacy_time:.2f}s")
+    print(f"sort_key sort:  {key_time:.2f}s")
+    print(f"speedup:        {legacy_time / key_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
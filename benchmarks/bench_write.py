@@ -0,0 +1,69 @@
+"""
+Compares rewriting a zone through ZoneWriter (chunked encoding into a large binary buffer)
+against the former text-mode write of one formatted line per record, with and without fsync.
+
+Usage: PYTHONPATH=src python benchmarks/bench_write.py [count]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from cleandns.dns_file import DNSFile
+from cleandns.logger import BufferedLogger
+from cleandns.zone_writer import ZoneWriter
+
+sys.path.insert(0, str(Path(__file__).parent))
+from zone_generator import write_zone  # noqa: E402
+
+
+def legacy_write(dns_file: DNSFile, path: Path, durability: str) -> int:
+    """The rewrite as it was before ZoneWriter, kept here as the baseline."""
+    with open(path, "w") as new_file:
+        for line in dns_file.render_lines():
+            new_file.write(line)
+        new_file.flush()
+        if durability != "none":
+            os.fsync(new_file.fileno())
+    return path.stat().st_size
+
+
+def writer_write(dns_file: DNSFile, path: Path, durability: str) -> int:
+    writer = ZoneWriter(durability=durability)
+    with writer.open(path) as new_file:
+        return writer.write(new_file, dns_file.render_lines())
+
+
+def bench(function, dns_file: DNSFile, path: Path, durability: str, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        path.unlink(missing_ok=True)
+        start = time.perf_counter()
+        size = function(dns_file, path, durability)
+        best = min(best, time.perf_counter() - start)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare writing a zone through ZoneWriter with the former line-by-line write.")
+    parser.add_argument("count", type=int, nargs="?", default=1_000_000, help="number of records")
+    count = parser.parse_args().count
+    with tempfile.TemporaryDirectory() as directory:
+        source = write_zone(Path(directory) / "source.zone", records=count)
+        dns_file = DNSFile(source, logger=BufferedLogger())
+        output = Path(directory) / "out.zone"
+
+        print(f"{count} records")
+        for durability in ("none", "file"):
+            legacy, size = bench(legacy_write, dns_file, output, durability)
+            buffered, _ = bench(writer_write, dns_file, output, durability)
+            megabytes = size / 2 ** 20
+            print(f"durability={durability:5} legacy: {legacy:.3f}s ({megabytes / legacy:.1f} MB/s)  "
+                  f"ZoneWriter: {buffered:.3f}s ({megabytes / buffered:.1f} MB/s)  "
+                  f"speedup: {legacy / buffered:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Deterministic synthetic zone generator for the benchmarks.
+
+The same arguments always produce the same file, so runs can be compared with each other.
+
+Usage: python benchmarks/zone_generator.py OUTPUT --records 100000 [--kind reverse] [--duplicate-ratio 0.05] [--disorder 0.5]
+"""
+import argparse
+import random
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_FORWARD_MIX = {"A": 0.85, "CNAME": 0.1, "NS": 0.05}
+
+HEADER = [
+    "$TTL 3600",
+    "@\tIN\tSOA\tns1.example.com. admin.example.com. (",
+    "\t\t\t\t2024010101\t; serial",
+    "\t\t\t\t3600\t; refresh",
+    "\t\t\t\t1800\t; retry",
+    "\t\t\t\t604800\t; expire",
+    "\t\t\t\t86400)\t; minimum",
+    "@\tIN\tNS\tns1.example.com.",
+    "@\tIN\tNS\tns2.example.com.",
+]
+
+
+def _forward_records(count: int, rng: random.Random, type_mix: Dict[str, float]) -> List[Tuple[str, str, str]]:
+    types = list(type_mix)
+    weights = [type_mix[t] for t in types]
+    records = []
+    for i, rtype in enumerate(rng.choices(types, weights=weights, k=count)):
+        name = f"host-{i:08d}"
+        if rtype == "A":
+            rdata = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+        elif rtype == "AAAA":
+            rdata = f"fd00::{i >> 16 & 0xffff:x}:{i & 0xffff:x}"
+        elif rtype == "NS":
+            rdata = f"ns{i % 4 + 1}.example.com."
+        elif rtype == "MX":
+            rdata = f"10 mail-{i % 16}.example.com."
+        elif rtype == "TXT":
+            rdata = f'"v=spf1 include:_spf{i % 8}.example.com ~all"'
+        else:
+            rdata = f"host-{rng.randrange(count):08d}.example.com."
+        records.append((name, rtype, rdata))
+    return records
+
+
+def _reverse_records(count: int) -> List[Tuple[str, str, str]]:
+    # Relative to a /8 origin: "<host>.<subnet>.<block>", in the natural (numeric label) order cleandns sorts PTRs by
+    return [(f"{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", "PTR", f"host-{i:08d}.example.com.") for i in range(count)]
+
+
+def generate_zone(records: int, kind: str = "forward", duplicate_ratio: float = 0.0, disorder: float = 1.0,
+                  type_mix: Optional[Dict[str, float]] = None, seed: int = 0) -> Iterator[str]:
+    """
+    Yields the lines of a zone holding `records` records besides the SOA and apex NS records.
+
+    - kind: "forward" (types drawn from type_mix) or "reverse" (PTR records only)
+    - duplicate_ratio: the share of records that repeat an earlier one
+    - disorder: the share of records moved away from their sorted position (0 = already clean)
+    """
+    rng = random.Random(seed)
+    duplicates = int(records * duplicate_ratio)
+    unique = records - duplicates
+
+    if kind == "forward":
+        entries = _forward_records(unique, rng, type_mix or DEFAULT_FORWARD_MIX)
+    elif kind == "reverse":
+        entries = _reverse_records(unique)
+    else:
+        raise ValueError(f"Unknown zone kind: {kind}")
+
+    # Clean zones are grouped by type, NS first
+    entries.sort(key=lambda entry: (entry[1] != "NS", entry[1]))
+
+    if duplicates and entries:
+        # Each duplicate follows its original, so a zone without disorder stays sorted
+        copies = Counter(rng.randrange(len(entries)) for _ in range(duplicates))
+        entries = [entry for index, entry in enumerate(entries) for _ in range(1 + copies[index])]
+
+    moved = int(len(entries) * disorder)
+    if moved > 1:
+        positions = rng.sample(range(len(entries)), moved)
+        values = [entries[p] for p in positions]
+        rng.shuffle(values)
+        for position, value in zip(positions, values):
+            entries[position] = value
+
+    yield from HEADER
+    for name, rtype, rdata in entries:
+        yield f"{name}\tIN\t{rtype}\t{rdata}"
+
+
+def write_zone(path: Path, **kwargs) -> Path:
+    with open(path, "w") as file:
+        file.writelines(f"{line}\n" for line in generate_zone(**kwargs))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic zone file.")
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--kind", choices=["forward", "reverse"], default="forward")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0)
+    parser.add_argument("--disorder", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_zone(args.output, records=args.records, kind=args.kind, duplicate_ratio=args.duplicate_ratio,
+               disorder=args.disorder, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
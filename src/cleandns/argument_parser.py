@@ -1,5 +1,35 @@
 import argparse
 
+from cleandns.backup import BACKUP_MODES
+from cleandns.zone_writer import DEFAULT_BUFFER_SIZE, DURABILITY_MODES
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+# reverse_zones.REVERSE_PREFIX_LENGTHS, not imported here since it loads the parser
+REVERSE_PREFIX_LENGTHS = [8, 16, 24]
+
+
+def parse_age(text: str) -> int:
+    """
+    Parses an age with BIND TTL units (e.g. 3600, 30d, 1w2d) into seconds.
+    """
+    # The zone parser (and the record types behind it) only load if an age is actually given
+    from cleandns.zone_parser import parse_ttl
+
+    return parse_ttl(text)
+
+
+def parse_size(text: str) -> int:
+    """
+    Parses a size in bytes with an optional binary unit suffix (e.g. 4096, 64K, 512M, 1G).
+    """
+    value = text.strip().upper().removesuffix("B")
+    unit = value[-1:] if value[-1:] in SIZE_UNITS else ""
+    number = value[:len(value) - len(unit)]
+    if not number.isdigit() or int(number) == 0:
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}")
+    return int(number) * SIZE_UNITS[unit]
+
+
 
 class ArgumentParser:
     def __init__(self):
@@ -10,6 +40,201 @@ class ArgumentParser:
             type=str,
             help="the DNS files that will be treated by the program"
         )
+        self.parser.add_argument(
+            "--check",
+            action="store_true",
+            help="only verify that the files have no duplicates and are sorted, exit with 1 otherwise (nothing is written)"
+        )
+        self.parser.add_argument(
+            "--report-all",
+            action="store_true",
+            help="with --check, report every violation instead of stopping at the first one"
+        )
+        self.parser.add_argument(
+            "-j", "--jobs",
+            type=int,
+            default=1,
+            help="the number of files processed in parallel (0 uses every CPU)"
+        )
+        self.parser.add_argument(
+            "--async-io",
+            action="store_true",
+            help="overlap reading, backing up and replacing files with the parsing of other files "
+                 "(for zones on slow or network filesystems; replaces --jobs)"
+        )
+        self.parser.add_argument(
+            "--io-workers",
+            type=int,
+            default=8,
+            metavar="N",
+            help="with --async-io, the maximum number of filesystem operations running at once (default: 8)"
+        )
+        self.parser.add_argument(
+            "--max-in-flight",
+            type=int,
+            default=16,
+            metavar="N",
+            help="with --async-io, the maximum number of files being processed at once (default: 16)"
+        )
+        self.parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="process every file, even the ones unchanged since they were last cleaned"
+        )
+        self.parser.add_argument(
+            "--cache-file",
+            type=str,
+            help="the fingerprint index of the cleaned files (default: ~/.cache/cleandns/fingerprints.json)"
+        )
+        self.parser.add_argument(
+            "--canonical-duplicates",
+            action="store_true",
+            help="detect duplicates case-insensitively and regardless of the final dot (e.g. WWW and www.)"
+        )
+        self.parser.add_argument(
+            "--backup-mode",
+            choices=BACKUP_MODES,
+            default="hardlink",
+            help="how the original file is backed up before being replaced (default: hardlink)"
+        )
+        self.parser.add_argument(
+            "--backup-dir",
+            type=str,
+            help="the directory the backups are kept in, in a subdirectory per zone directory (default: next to the file)"
+        )
+        self.parser.add_argument(
+            "--compress-backups",
+            action="store_true",
+            help="gzip the backups"
+        )
+        self.parser.add_argument(
+            "--keep-backups",
+            type=int,
+            metavar="N",
+            help="only keep the N most recent backups of each file"
+        )
+        self.parser.add_argument(
+            "--backup-max-age",
+            type=parse_age,
+            metavar="AGE",
+            help="delete the backups older than AGE (e.g. 30d, 2w)"
+        )
+        self.parser.add_argument(
+            "--max-memory",
+            type=parse_size,
+            metavar="SIZE",
+            help="clean each zone within about SIZE of memory (e.g. 512M) by sorting it on disk, "
+                 "for zones larger than RAM (per file, so multiply by --jobs)"
+        )
+        self.parser.add_argument(
+            "--spill-dir",
+            type=str,
+            metavar="DIR",
+            help="with --max-memory, where the sorted runs are spilled (default: next to each zone)"
+        )
+        self.parser.add_argument(
+            "--durability",
+            choices=DURABILITY_MODES,
+            default="file",
+            help="none: leave flushing to the OS, file: fsync each new file before it replaces the old one, "
+                 "full: also fsync the directory after the replace (default: file)"
+        )
+        self.parser.add_argument(
+            "--write-buffer-size",
+            type=parse_size,
+            default=DEFAULT_BUFFER_SIZE,
+            metavar="SIZE",
+            help="the buffer the rewritten files are written through (e.g. 64K, 4M; default: 1M)"
+        )
+        self.parser.add_argument(
+            "--profile",
+            action="store_true",
+            help="log the time, record counts, bytes and peak memory of every phase for each file"
+        )
+        self.parser.add_argument(
+            "--metrics-json",
+            type=str,
+            metavar="PATH",
+            help="append the metrics of each file as JSON lines to PATH ('-' for stdout)"
+        )
+        self.parser.add_argument(
+            "--cross-zone-checks",
+            action="store_true",
+            help="index the owner names of all the files and report dangling CNAMEs, long CNAME chains "
+                 "and CNAMEs next to other data, across zones (fails the run with --check)"
+        )
+        self.parser.add_argument(
+            "--max-cname-hops",
+            type=int,
+            default=3,
+            metavar="N",
+            help="with --cross-zone-checks, report the CNAME chains longer than N hops (default: 3)"
+        )
+        self.parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="parse the files with dnspython, which validates every record (slower)"
+        )
+
+        subparsers = self.parser.add_subparsers(dest="command", metavar="COMMAND")
+        diff_parser = subparsers.add_parser("diff", help="show the records added and removed between two zone files")
+        diff_parser.add_argument("old", type=str, help="the original zone file")
+        diff_parser.add_argument("new", type=str, help="the new zone file")
+        diff_parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="parse the files with dnspython, which validates every record (slower)"
+        )
+
+        watch_parser = subparsers.add_parser("watch", help="stay resident and re-clean the zones of a directory whenever they change")
+        watch_parser.add_argument("directory", type=str, help="the directory holding the zone files")
+        watch_parser.add_argument(
+            "--pattern",
+            type=str,
+            default="*",
+            help="only watch the files matching this glob pattern (default: every file)"
+        )
+        watch_parser.add_argument(
+            "--debounce",
+            type=float,
+            default=0.01,
+            metavar="SECONDS",
+            help="wait until the directory has been quiet this long before cleaning (default: 0.01)"
+        )
+        watch_parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            metavar="SECONDS",
+            help="how often the directory is scanned when inotify is unavailable (default: 1)"
+        )
+        watch_parser.add_argument(
+            "--polling",
+            action="store_true",
+            help="scan the directory instead of using inotify (e.g. on network filesystems)"
+        )
+
+        reverse_parser = subparsers.add_parser("reverse", help="create or update the reverse (PTR) zones of the A records of forward zones")
+        reverse_parser.add_argument("forward", nargs="+", type=str, help="the forward zone files")
+        reverse_parser.add_argument(
+            "-o", "--output-dir",
+            type=str,
+            default=".",
+            metavar="DIR",
+            help="the directory of the reverse zones, one <network>.in-addr.arpa.zone file each (default: the current directory)"
+        )
+        reverse_parser.add_argument(
+            "--prefix-length",
+            type=int,
+            choices=REVERSE_PREFIX_LENGTHS,
+            default=24,
+            help="the size of the network covered by each reverse zone (default: 24)"
+        )
+        reverse_parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="remove the PTR records whose address is no longer in the forward zones"
+        )
 
     def parse_arguments(self, args=None):
         return self.parser.parse_args(args)
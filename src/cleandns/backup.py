@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import os
+import re
+import shutil
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: reflinks fall back to copies
+    fcntl = None
+
+BACKUP_MODES = ["hardlink", "reflink", "copy", "none"]
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H-%M-%S"
+COMPRESSED_SUFFIX = ".gz"
+# The suffix a backup adds to the name of its zone, see BackupPolicy.backup_path
+BACKUP_SUFFIX = re.compile(r"\.\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(\.gz)?$")
+# ioctl(2) request cloning a whole file on Btrfs, XFS and other copy-on-write filesystems
+FICLONE = 0x40049409
+
+
+def reflink(source: Path, destination: Path):
+    with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+        fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+    shutil.copystat(source, destination)
+
+
+@dataclass
+class BackupPolicy:
+    """
+    How the original zone is kept before it gets replaced, and how long it is kept.
+
+    - hardlink: the backup is a second name for the original inode. The new content arrives
+      through os.replace, so the original data is never touched and nothing is copied.
+    - reflink: a copy-on-write clone, where the filesystem supports it.
+    - copy: a full copy of the file.
+    - none: no backup at all.
+
+    When no cheap backup is possible (e.g. the backup directory is on another filesystem),
+    the backup falls back to a copy. Compressed backups are always written in full.
+    In a backup directory, the backups of each zone directory are kept in a subdirectory of
+    their own, so that zones with the same file name (a/db.local, b/db.local) never share backups.
+    """
+    mode: str = "hardlink"
+    directory: Optional[Path] = None
+    compress: bool = False
+    keep_last: Optional[int] = None
+    max_age: Optional[int] = None
+
+    def backup_directory(self, path: Path) -> Path:
+        if self.directory is None:
+            return path.parent
+        # Named after the zone directory, with a hash of its full path telling apart directories of the same name
+        source = path.resolve().parent
+        digest = hashlib.sha256(str(source).encode()).hexdigest()[:12]
+        return self.directory / f"{source.name or 'root'}-{digest}"
+
+    def backup_path(self, path: Path, timestamp: datetime) -> Path:
+        suffix = COMPRESSED_SUFFIX if self.compress else ""
+        return self.backup_directory(path) / f"{path.name}.{timestamp.strftime(TIMESTAMP_FORMAT)}{suffix}"
+
+    def create(self, path: Path, timestamp: Optional[datetime] = None) -> Optional[Path]:
+        """
+        Backs the file up and returns the backup path (None when backups are disabled).
+        Must be called before the file is replaced.
+        """
+        if self.mode == "none":
+            return None
+
+        backup_path = self.backup_path(path, timestamp or datetime.now())
+        backup_path.parent.mkdir(parents=True, exist_ok=True)
+        # A backup taken in the same second is overwritten, like a copy would be
+        backup_path.unlink(missing_ok=True)
+
+        if self.compress:
+            with open(path, "rb") as source, gzip.open(backup_path, "wb") as destination:
+                shutil.copyfileobj(source, destination)
+            shutil.copystat(path, backup_path)
+            return backup_path
+
+        try:
+            if self.mode == "hardlink":
+                os.link(path, backup_path)
+                return backup_path
+            if self.mode == "reflink" and fcntl is not None:
+                reflink(path, backup_path)
+                return backup_path
+        except OSError:
+            backup_path.unlink(missing_ok=True)
+
+        shutil.copy2(path, backup_path)
+        return backup_path
+
+    def backups(self, path: Path) -> List[Path]:
+        """
+        Returns the existing backups of the file, oldest first.
+        """
+        prefix = f"{path.name}."
+        found = []
+        directory = self.backup_directory(path)
+        if not directory.is_dir():
+            return found
+        for candidate in directory.iterdir():
+            if not candidate.name.startswith(prefix):
+                continue
+            if backup_timestamp(candidate, path) is not None:
+                found.append(candidate)
+        return sorted(found, key=lambda backup: backup_timestamp(backup, path))
+
+    def prune(self, path: Path, now: Optional[datetime] = None) -> List[Path]:
+        """
+        Deletes the backups of the file beyond keep_last or older than max_age (in seconds).
+        Returns the deleted backups.
+        """
+        if self.keep_last is None and self.max_age is None:
+            return []
+
+        backups = self.backups(path)
+        expired = []
+        if self.keep_last is not None:
+            expired = backups[:max(len(backups) - self.keep_last, 0)]
+        if self.max_age is not None:
+            now = now or datetime.now()
+            expired += [backup for backup in backups[len(expired):]
+                        if (now - backup_timestamp(backup, path)).total_seconds() > self.max_age]
+
+        for backup in expired:
+            backup.unlink(missing_ok=True)
+        return expired
+
+
+def is_backup(path: Path) -> bool:
+    return BACKUP_SUFFIX.search(path.name) is not None
+
+
+def backup_timestamp(backup: Path, path: Path) -> Optional[datetime]:
+    """
+    Returns when the backup was taken, or None if the file is not a backup of path.
+    """
+    stamp = backup.name[len(path.name) + 1:]
+    if stamp.endswith(COMPRESSED_SUFFIX):
+        stamp = stamp[:-len(COMPRESSED_SUFFIX)]
+    try:
+        return datetime.strptime(stamp, TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Mapping, Union
+
+from cleandns.dns_file import DNSFile
+from cleandns.logger import BufferedLogger
+
+ZoneContent = Union[str, bytes, bytearray, memoryview]
+
+
+@dataclass(frozen=True)
+class CleanResult:
+    """
+    A zone cleaned in memory: the rendered zone file, its serial (incremented when the zone
+    changed, like a save would) and what the cleaning did.
+    """
+    text: str
+    serial: int
+    modified: bool
+    records_in: int
+    records_out: int
+    duplicates_removed: int
+
+
+def clean_zone(content: ZoneContent, *, dedupe: bool = True, sort: bool = True, canonical: bool = False,
+               strict: bool = False, name: str = "zone") -> CleanResult:
+    """
+    Cleans a zone given as text or bytes, without touching the disk: no temp file and no backup.
+    The records, their identities and their order are the ones DNSFile uses for zone files.
+    name only appears in error messages, and $INCLUDE directives are resolved from the current directory.
+    Raises ZoneSyntaxError, MissingSOArecord or ValueError if the zone is invalid.
+    """
+    # The zone never becomes a file: the path only names it
+    zone = DNSFile(Path(name), strict=strict, logger=BufferedLogger(), content=content)
+    records_in = zone.record_count
+    if dedupe:
+        zone.remove_duplicates(canonical=canonical)
+    records_out = zone.record_count
+    if sort:
+        zone.sort()
+    if zone.modified:
+        zone.increment_serial()
+    return CleanResult(text="".join(zone.render_lines()), serial=zone.soa_record.serial, modified=zone.modified,
+                       records_in=records_in, records_out=records_out, duplicates_removed=records_in - records_out)
+
+
+def _clean_named_zone(name: str, content: ZoneContent, options: dict) -> CleanResult:
+    return clean_zone(content, name=name, **options)
+
+
+def clean_zones(zones: Mapping[str, ZoneContent], *, jobs: int = 1, dedupe: bool = True, sort: bool = True,
+                canonical: bool = False, strict: bool = False) -> Dict[str, CleanResult]:
+    """
+    Cleans many zones given by name, like clean_zone, and returns their results by name in the same order.
+    With jobs > 1 the zones are cleaned in that many worker processes. The first invalid zone raises.
+    """
+    options = dict(dedupe=dedupe, sort=sort, canonical=canonical, strict=strict)
+    if jobs <= 1 or len(zones) <= 1:
+        return {name: clean_zone(content, name=name, **options) for name, content in zones.items()}
+
+    # Only loaded when the zones are actually cleaned in parallel
+    from concurrent.futures import ProcessPoolExecutor
+
+    names = list(zones)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # Memoryviews can't be pickled over to the workers
+        contents = (zones[name].tobytes() if isinstance(zones[name], memoryview) else zones[name] for name in names)
+        results = executor.map(_clean_named_zone, names, contents, [options] * len(names))
+        return dict(zip(names, results))
@@ -1,17 +1,21 @@
-from datetime import datetime
 from collections import defaultdict
-from typing import Dict, List, Optional
+from operator import attrgetter
+from itertools import chain
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Union
 
+from cleandns.backup import BackupPolicy
 from cleandns.exceptions import MissingSOArecord
 from cleandns.logger import Logger
+from cleandns.metrics import FileMetrics, NULL_METRICS
+import mmap
 import os
 import shutil
-import dns.zone
-import dns.rdataclass
-import dns.ttl
-import dns.rdatatype
+import time
 
-from cleandns.record_types import ARecord, NSRecord, CNAMERecord, SOARecord, PTRRecord, RecordType, DNSClass
+from cleandns.record_types import ARecord, AAAARecord, NSRecord, CNAMERecord, SOARecord, PTRRecord, GenericRecord, RecordType, DNSClass, AbstractRecord
+from cleandns.zone_diff import ZoneDiff, diff_zones
+from cleandns.zone_parser import Include, ZoneParser, iter_lines
+from cleandns.zone_writer import ZONE_FILE_ENCODING, ZoneWriter
 
 from pathlib import Path
 
@@ -24,41 +28,102 @@ class DNSFile:
     ttl: Optional[int]
     soa_record: Optional[SOARecord]
     records: Dict[RecordType, List]
+    includes: List[Include]
     modified: bool
+    strict: bool
+    bytes_written: int
+    backup_policy: BackupPolicy
+    writer: ZoneWriter
 
     # The constructor takes the name of the file and sets the type of file, the file content, the space before the incrementation value, the incrementation value and the list of DNS entries.
-    def __init__(self, path: Path):
-        self.logger = Logger()
+    # In strict mode the file is validated by dnspython instead of the native streaming parser.
+    # When the content of the file was already read (e.g. by an I/O worker), it is parsed instead of reading the file again.
+    # The content may be text or any bytes-like object (bytes, memoryview, mmap), which is decoded chunk by chunk.
+    def __init__(self, path: Path, strict: bool = False, logger: Optional[Logger] = None, metrics: Optional[FileMetrics] = None,
+                 backup_policy: Optional[BackupPolicy] = None, writer: Optional[ZoneWriter] = None,
+                 content: Optional[Union[str, bytes, memoryview, mmap.mmap]] = None):
+        self.logger = logger or Logger()
+        self.metrics = metrics or NULL_METRICS
+        self.backup_policy = backup_policy or BackupPolicy()
+        self.writer = writer or ZoneWriter()
         self.path = path
-        self.__set_TTL()
-        self.__set_DNS_records()
+        self.strict = strict
+        self.__set_DNS_records(content)
         self.modified = False
+        self.bytes_written = 0
 
-    def __set_TTL(self):
+    def __set_TTL(self, file_content: str):
+        import dns.ttl
+
+        self.ttl = None
+        for line in file_content.splitlines():
+            line_clean = line.split(';')[0].strip()
+            if line_clean.upper().startswith("$TTL"):
+                parts = line_clean.split()
+                if len(parts) >= 2:
+                    try:
+                        self.ttl = dns.ttl.from_text(parts[1])
+                    except (ValueError, dns.ttl.BadTTL):
+                        raise ValueError(f"Invalid TTL format in {self.path.name}: {parts[1]}")
+                break
+
+    def __set_DNS_records(self, content=None):
         self.ttl = None
-        with open(self.path, "r") as file:
-            for line in file:
-                line_clean = line.split(';')[0].strip()
-                if line_clean.upper().startswith("$TTL"):
-                    parts = line_clean.split()
-                    if len(parts) >= 2:
-                        try:
-                            self.ttl = dns.ttl.from_text(parts[1])
-                        except (ValueError, dns.ttl.BadTTL):
-                            raise ValueError(f"Invalid TTL format in {self.path.name}: {parts[1]}")
-                    break
-
-    def __set_DNS_records(self):
         self.soa_record = None
         self.records = defaultdict(list)
+        self.includes = []
+        # The fingerprints of the included files, so that a change to one of them is noticed
+        self.dependencies = {}
+
+        if self.strict:
+            self.__read_records_strict(content)
+        else:
+            self.__read_records(content)
+
+        if self.soa_record is None:
+            raise MissingSOArecord(f"Missing SOA record in {self.path.name}")
 
-        with open(self.path, "r") as file:
-            file_content = file.read()
+    def __add_record(self, record: AbstractRecord):
+        if record.type == RecordType.SOA:
+            self.soa_record = record
+        else:
+            self.records[record.type].append(record)
+
+    def __read_records(self, content=None):
+        # Single pass over the file: records are built while the lines are streamed.
+        # $INCLUDE directives are resolved next to the zone, and their records are kept apart
+        parser = ZoneParser(self.path.name, directory=self.path.parent)
+        if content is not None:
+            lines = content.splitlines() if isinstance(content, str) else iter_lines(content)
+            for record in parser.parse(lines):
+                self.__add_record(record)
+        else:
+            with open(self.path, "r") as file:
+                for record in parser.parse(file):
+                    self.__add_record(record)
+        self.ttl = parser.ttl
+        self.includes = parser.includes
+        self.dependencies = parser.dependencies
+
+    def __read_records_strict(self, content=None):
+        # dnspython takes longer to import than most zones take to clean, so only strict mode loads it
+        import dns.rdataclass
+        import dns.rdatatype
+        import dns.zone
+
+        if content is not None:
+            # dnspython needs the whole zone as text
+            file_content = content if isinstance(content, str) else str(memoryview(content), ZONE_FILE_ENCODING)
+        else:
+            with open(self.path, "r") as file:
+                file_content = file.read()
+        self.__set_TTL(file_content)
         zone = dns.zone.from_text(file_content, origin="", relativize=False, check_origin=False)
 
         # Mapping for standard records that share the same constructor signature
         record_types = {
             dns.rdatatype.A: (ARecord, RecordType.A),
+            dns.rdatatype.AAAA: (AAAARecord, RecordType.AAAA),
             dns.rdatatype.NS: (NSRecord, RecordType.NS),
             dns.rdatatype.CNAME: (CNAMERecord, RecordType.CNAME),
             dns.rdatatype.PTR: (PTRRecord, RecordType.PTR),
@@ -79,7 +144,7 @@ class DNSFile:
                             rdata=rdata.to_text(),
                             comment=None
                         )
-                        self.records[enum_type].append(current_record)
+                        self.__add_record(current_record)
 
                     elif rdtype == dns.rdatatype.SOA:
                         current_record = SOARecord(name=name.to_text(omit_final_dot=True),
@@ -95,96 +160,204 @@ class DNSFile:
                                                    retry=rdata.retry,
                                                    expire=rdata.expire,
                                                    minimum=rdata.minimum)
-                        self.soa_record = current_record
+                        self.__add_record(current_record)
 
-        if self.soa_record is None:
-            raise MissingSOArecord(f"Missing SOA record in {self.path.name}")
+                    else:
+                        # Passed through untouched, like the native parser does
+                        current_record = GenericRecord(
+                            name=name.to_text(omit_final_dot=True),
+                            ttl=rdataset.ttl,
+                            class_=DNSClass(dns.rdataclass.to_text(rdataset.rdclass)),
+                            type=RecordType(dns.rdatatype.to_text(rdtype)),
+                            rdata=rdata.to_text(),
+                            comment=None
+                        )
+                        self.__add_record(current_record)
+
+    @property
+    def record_count(self) -> int:
+        # The records of the included files are not part of the zone file itself
+        return sum(len(records) for records in self.records.values()) + (self.soa_record is not None)
+
+    def __included_keys(self, get_key: Callable[[AbstractRecord], Any]) -> Dict[RecordType, Set[Any]]:
+        # A zone record repeating an included one is a duplicate: the included files are left untouched
+        keys = defaultdict(set)
+        for include in self.includes:
+            for record in include.records:
+                keys[record.type].add(get_key(record))
+        return keys
 
     def increment_serial(self):
         self.soa_record.increment_serial()
 
-    def remove_duplicates(self):
+    def remove_duplicates(self, canonical: bool = False):
+        """
+        Removes the records whose identity was already seen, keeping the first occurrence.
+        With canonical, names are compared case-insensitively and regardless of the final dot.
+        """
+        get_key = attrgetter("canonical_identity" if canonical else "identity")
+        included_keys = self.__included_keys(get_key)
         for r_type in self.records:
             unique_records = []
-            seen = set()
+            seen = set(included_keys.get(r_type, ()))
             for record in self.records[r_type]:
-                # Use the string representation as a key since records are not hashable
-                record_key = str(record)
+                record_key = get_key(record)
                 if record_key not in seen:
                     seen.add(record_key)
                     unique_records.append(record)
-            
+
             if len(unique_records) < len(self.records[r_type]):
                 self.records[r_type] = unique_records
                 self.modified = True
 
     def sort(self):
         for records in self.records.values():
-            new_order = sorted(records)
-            if new_order != records:
+            # Keys are computed once per record instead of on every comparison
+            new_order = sorted(records, key=attrgetter("sort_key"))
+            # Sorting only permutes the records, so identity is enough to detect a change
+            if any(new is not old for new, old in zip(new_order, records)):
                 # Update the list in-place and mark as modified
                 records[:] = new_order
                 self.modified = True
 
 
+    def check(self, canonical: bool = False, report_all: bool = False) -> List[str]:
+        """
+        Verifies in a single pass, without changing anything, that the zone has no duplicates and is sorted.
+        Returns the violations found: only the first one unless report_all is set.
+        A zone passes exactly when remove_duplicates() and sort() would leave it unmodified.
+        """
+        get_key = attrgetter("canonical_identity" if canonical else "identity")
+        violations = []
+        included_keys = self.__included_keys(get_key)
+        for r_type, records in self.records.items():
+            seen = set(included_keys.get(r_type, ()))
+            previous = None
+            for record in records:
+                record_key = get_key(record)
+                if record_key in seen:
+                    violations.append(f"duplicate {r_type.value} record: {record}")
+                else:
+                    seen.add(record_key)
+                    if previous is not None and record.sort_key < previous.sort_key:
+                        violations.append(f"{r_type.value} record {record.name} is out of order (after {previous.name})")
+                    previous = record
+                if violations and not report_all:
+                    return violations
+        return violations
+
+    def diff(self, other: "DNSFile") -> ZoneDiff:
+        """
+        Returns the records added and removed in other compared to this zone, and the serial change.
+        """
+        return diff_zones(self.soa_record, self.records, other.soa_record, other.records)
+
     @property
     def tmp_path(self) -> Path:
         return self.path.with_name(f"{self.path.name}.tmp")
 
-    def reconstruct_file(self):
-        # Open the file
-        new_file = self.__create_tmp_file()
-
+    def render_lines(self) -> Iterator[str]:
+        """
+        Yields the lines of the zone file (newlines included), rendered lazily.
+        """
         # Add the default TTL
         if self.ttl is not None:
-            new_file.write(f"$TTL\t{self.ttl}\n")
+            yield f"$TTL\t{self.ttl}\n"
 
         # Add the SOA record
         if self.soa_record:
-            new_file.write(f"{self.soa_record}\n")
+            yield f"{self.soa_record}\n"
 
-        # Add the NS records
-        if RecordType.NS in self.records:
-            for record in self.records[RecordType.NS]:
-                new_file.write(f"{record}\n")
+        # Keep the $INCLUDE directives, their files are not rewritten
+        for include in self.includes:
+            yield f"{include}\n"
 
-        # Add the rest of the records
-        for r_type, records in self.records.items():
-            if r_type != RecordType.NS:
-                for record in records:
-                    new_file.write(f"{record}\n")
+        # Add the NS records, then the rest of the records
+        others = (records for r_type, records in self.records.items() if r_type != RecordType.NS)
+        yield from record_lines(chain(self.records.get(RecordType.NS, ()), *others))
 
-        # Close the file
-        new_file.close()
+    def reconstruct_file(self):
+        # The writer renders and encodes the records in large chunks, and syncs the file before closing it
+        with self.__create_tmp_file() as new_file:
+            self.bytes_written = self.writer.write(new_file, self.render_lines())
 
     def __create_tmp_file(self):
-        # Create tmp file in the same directory as the original to ensure atomic move later
-        try:
-            self.logger.info(f"Creating the file {self.tmp_path.name} ...")
-            return open(self.tmp_path, "x")
-        except FileExistsError:
-            self.logger.warning(f"The file {self.tmp_path.name} already exists and is going to be overwritten.")
-            return open(self.tmp_path, "w")
+        return create_tmp_file(self.tmp_path, self.writer, self.logger)
 
     def replace_file(self):
         """
         Takes the name of the file and replaces the old file with the new one
         """
+        replace_zone_file(self.path, self.tmp_path, self.backup_policy, self.writer, self.logger)
+
+    def save(self) -> bool:
+        """
+        Writes the zone back to disk if it was modified. Returns True if the file was rewritten.
+        An unmodified zone is left untouched: no temp file, no backup and no mtime change.
+        """
+        if not self.modified:
+            self.logger.info("%s is already clean, skipping the rewrite.", self.path.name)
+            return False
+
+        start = time.perf_counter()
+        self.increment_serial()
+        with self.metrics.phase("write"):
+            self.reconstruct_file()
+        with self.metrics.phase("replace"):
+            self.replace_file()
+        elapsed = time.perf_counter() - start
+        self.logger.info("Wrote %d bytes to %s in %.3fs", self.bytes_written, self.path.name, elapsed)
+        return True
+
+
+def create_tmp_file(tmp_path: Path, writer: ZoneWriter, logger: Logger) -> BinaryIO:
+    # Create tmp file in the same directory as the original to ensure atomic move later
+    try:
+        logger.info("Creating the file %s ...", tmp_path.name)
+        return writer.open(tmp_path, exclusive=True)
+    except FileExistsError:
+        logger.warning("The file %s already exists and is going to be overwritten.", tmp_path.name)
+        return writer.open(tmp_path)
 
-        current_date = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        backup_path = self.path.with_name(f"{self.path.name}.{current_date}")
 
-        if self.path.exists():
-            # Create a backup copy (preserves metadata and keeps original safe until the very end)
-            shutil.copy2(self.path, backup_path)
-            # Apply original file permissions to the new temp file
-            shutil.copymode(self.path, self.tmp_path)
+def record_lines(records: Iterable[AbstractRecord]) -> Iterator[str]:
+    """
+    Yields the lines of the records, each generic record preceded by an $ORIGIN directive when it was
+    read under another origin than the previous one: the names in its rdata may be relative to it.
+    The other records only have relative owners when they were read without an origin, so $ORIGIN .
+    is written back before them.
+    """
+    # The origin last written, None while the one the zone is loaded with applies
+    current = None
+    for record in records:
+        if type(record) is GenericRecord:
+            origin = record.origin
+        elif current is not None and not record.name.endswith("."):
+            origin = None
+        else:
+            origin = current
+        if origin != current:
+            yield f"$ORIGIN\t{origin or '.'}\n"
+            current = origin
+        yield f"{record}\n"
+
+
+def replace_zone_file(path: Path, tmp_path: Path, backup_policy: BackupPolicy, writer: ZoneWriter, logger: Logger):
+    """
+    Backs the zone up, then atomically replaces it with the new file at tmp_path and prunes the old backups.
+    """
+    if path.exists():
+        # Back the original up first (a hardlink by default, so the old data is kept without copying it)
+        backup_path = backup_policy.create(path)
+        if backup_path is not None:
+            logger.info("Backed up %s to %s", path.name, backup_path)
+        # Apply original file permissions to the new temp file
+        shutil.copymode(path, tmp_path)
 
-        # Atomic replacement: Overwrites self.path with tmp_path in one operation
-        os.replace(self.tmp_path, self.path)
+    # Atomic replacement: Overwrites path with tmp_path in one operation
+    os.replace(tmp_path, path)
+    writer.sync_directory(path)
 
-    def save(self):
-        if self.modified:
-            self.increment_serial()
-        self.reconstruct_file()
-        self.replace_file()
+    expired = backup_policy.prune(path)
+    if expired:
+        logger.info("Removed %d expired backup(s) of %s", len(expired), path.name)
@@ -12,4 +12,8 @@ class UnknownRecordType(Exception):
 
 class MissingSOArecord(Exception):
     """Raised when the SOA record is missing."""
-    pass
\ No newline at end of file
+    pass
+
+class ZoneSyntaxError(Exception):
+    """Raised when a zone file cannot be parsed."""
+    pass
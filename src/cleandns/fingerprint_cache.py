@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+try:
+    import fcntl
+except ImportError:  # Windows: updates are still atomic, only concurrent merges are not serialized
+    fcntl = None
+
+# Version 2 added the cleaning options to the entries: older entries don't say what they were cleaned with
+# Version 3 added the included files: older entries can't tell when one of them changed
+CACHE_VERSION = 3
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def default_cache_path() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "cleandns" / "fingerprints.json"
+
+
+def options_key(options: Optional[Dict[str, Any]]) -> str:
+    """
+    The options that change how a file is cleaned (e.g. strict, canonical duplicates) as a stable string.
+    """
+    return json.dumps(options or {}, sort_keys=True)
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class Fingerprint:
+    size: int
+    mtime_ns: int
+    inode: int
+    sha256: str
+    # The options the file was cleaned with, see options_key
+    options: str
+    # The size, mtime and inode of each file it includes, as they were when it was cleaned
+    dependencies: Dict[str, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def from_path(cls, path: Path, options: str = "{}",
+                  dependencies: Optional[Mapping[Path, Sequence[int]]] = None) -> "Fingerprint":
+        stat = path.stat()
+        return cls(size=stat.st_size, mtime_ns=stat.st_mtime_ns, inode=stat.st_ino, sha256=hash_file(path), options=options,
+                   dependencies={str(dependency.resolve()): list(value) for dependency, value in (dependencies or {}).items()})
+
+    def dependencies_unchanged(self) -> bool:
+        for dependency, value in self.dependencies.items():
+            try:
+                stat = os.stat(dependency)
+            except OSError:
+                return False
+            if [stat.st_size, stat.st_mtime_ns, stat.st_ino] != value:
+                return False
+        return True
+
+
+class FingerprintCache:
+    """
+    An on-disk index of the files cleandns has already cleaned.
+
+    A file whose size, mtime and inode still match its entry is considered clean without
+    being read. When only the metadata changed (e.g. the file was touched or copied back),
+    the content hash decides and the entry is refreshed.
+    A file is only clean for the options it was cleaned with: after a default run, a run with
+    other options (e.g. --strict or --canonical-duplicates) processes it again.
+    A file is not clean either once one of the files it includes ($INCLUDE) changed.
+    """
+    path: Path
+    entries: Dict[str, Fingerprint]
+    options: str
+
+    def __init__(self, path: Optional[Path] = None, options: Optional[Dict[str, Any]] = None):
+        self.path = path or default_cache_path()
+        self.options = options_key(options)
+        self.entries = {}
+        self._updated = {}
+        self._removed = set()
+
+    @staticmethod
+    def _key(file_path: Path) -> str:
+        return str(file_path.resolve())
+
+    def load(self):
+        self.entries = self._read()
+
+    def _read(self) -> Dict[str, Fingerprint]:
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+        except (FileNotFoundError, ValueError):
+            # A missing or corrupted index only costs one full run
+            return {}
+        if data.get("version") != CACHE_VERSION:
+            return {}
+        try:
+            return {key: Fingerprint(**value) for key, value in data.get("entries", {}).items()}
+        except TypeError:
+            return {}
+
+    def is_clean(self, file_path: Path) -> bool:
+        """
+        Returns True if the file has not changed since it was last cleaned.
+        """
+        key = self._key(file_path)
+        entry = self.entries.get(key)
+        if entry is None or entry.options != self.options or not entry.dependencies_unchanged():
+            return False
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return False
+        if (stat.st_size, stat.st_mtime_ns, stat.st_ino) == (entry.size, entry.mtime_ns, entry.inode):
+            return True
+        if stat.st_size != entry.size or hash_file(file_path) != entry.sha256:
+            return False
+        self.update(file_path, {Path(dependency): value for dependency, value in entry.dependencies.items()})
+        return True
+
+    def update(self, file_path: Path, dependencies: Optional[Mapping[Path, Sequence[int]]] = None):
+        """
+        Records the file as clean, along with the fingerprints of the files it includes (see ZoneParser.dependencies).
+        """
+        key = self._key(file_path)
+        fingerprint = Fingerprint.from_path(file_path, self.options, dependencies)
+        self.entries[key] = fingerprint
+        self._updated[key] = fingerprint
+        self._removed.discard(key)
+
+    def discard(self, file_path: Path):
+        key = self._key(file_path)
+        self.entries.pop(key, None)
+        self._updated.pop(key, None)
+        self._removed.add(key)
+
+    def save(self):
+        """
+        Merges this run's changes into the index on disk and prunes entries of files that no longer exist.
+        The merge happens under an exclusive lock so concurrent runs don't lose each other's updates.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = self.path.with_name(f"{self.path.name}.lock")
+        with open(lock_path, "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                entries = self._read()
+                entries.update(self._updated)
+                for key in self._removed:
+                    entries.pop(key, None)
+                entries = {key: value for key, value in entries.items() if os.path.exists(key)}
+
+                tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+                with open(tmp_path, "w") as file:
+                    json.dump({"version": CACHE_VERSION,
+                               "entries": {key: asdict(value) for key, value in entries.items()}}, file)
+                os.replace(tmp_path, self.path)
+                self.entries = entries
+                self._updated = {}
+                self._removed = set()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
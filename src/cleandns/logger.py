@@ -1,4 +1,12 @@
 import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# The logging logger every Logger writes to, and the name of the handler printing it
+LOGGER_NAME = "cleandns"
+HANDLER_NAME = "cleandns-console"
+# Queue items marking the end of a file's messages: (index, DONE, payload)
+DONE = "done"
 
 class LoggerMeta(type):
     """
@@ -21,28 +29,33 @@ class LoggerMeta(type):
 
 
 class Logger(metaclass=LoggerMeta):
-    def __init__(self):
-        # Create a logger
-        self.logger = logging.getLogger("my_logger")
+    """
+    Messages take lazy %-style arguments (logger.info("Wrote %d bytes", size)): they are only
+    formatted if the level is enabled, so logging costs next to nothing where it is filtered out.
+    """
 
-        # Create a StreamHandler and set the custom formatter
-        handler = logging.StreamHandler()
-        handler.setFormatter(CustomFormatter())
+    def __init__(self):
+        self.logger = logging.getLogger(LOGGER_NAME)
 
-        # Add the handler to the logger
-        self.logger.addHandler(handler)
+        # The module may be imported twice (as cleandns.logger and as src.cleandns.logger), each copy with
+        # its own singleton: the handler is only added once, so that every line is printed once
+        if not any(handler.get_name() == HANDLER_NAME for handler in self.logger.handlers):
+            handler = logging.StreamHandler()
+            handler.set_name(HANDLER_NAME)
+            handler.setFormatter(CustomFormatter())
+            self.logger.addHandler(handler)
 
         # Set the logging level
         self.logger.setLevel(logging.INFO)
 
-    def info(self, string: str):
-        self.logger.info(string)
+    def info(self, message: str, *args: Any):
+        self.logger.info(message, *args)
 
-    def error(self, string: str):
-        self.logger.error(string)
+    def error(self, message: str, *args: Any):
+        self.logger.error(message, *args)
 
-    def warning(self, string: str):
-        self.logger.warning(string)
+    def warning(self, message: str, *args: Any):
+        self.logger.warning(message, *args)
 
 
 class CustomFormatter(logging.Formatter):
@@ -52,7 +65,120 @@ class CustomFormatter(logging.Formatter):
         logging.ERROR: "[-] %(message)s",
     }
 
+    def __init__(self):
+        super().__init__()
+        # One formatter per level, built once: switching the format of a shared formatter on every
+        # record would race between threads logging at different levels
+        self.formatters = {level: logging.Formatter(log_format) for level, log_format in self.FORMATS.items()}
+
     def format(self, record):
-        log_format = self.FORMATS.get(record.levelno, self._style._fmt)
-        self._style._fmt = log_format
-        return super().format(record)
+        formatter = self.formatters.get(record.levelno)
+        return formatter.format(record) if formatter is not None else super().format(record)
+
+
+class BufferedLogger:
+    """
+    A drop-in replacement for Logger that keeps the messages instead of printing them.
+    Worker threads log into it so that every message can be replayed in input order.
+    The arguments are kept as given and only formatted when the messages are read or replayed.
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[str, str, Tuple[Any, ...]]] = []
+
+    @property
+    def messages(self) -> List[Tuple[str, str]]:
+        return [(level, message % args if args else message) for level, message, args in self.entries]
+
+    def info(self, message: str, *args: Any):
+        self.entries.append(("info", message, args))
+
+    def error(self, message: str, *args: Any):
+        self.entries.append(("error", message, args))
+
+    def warning(self, message: str, *args: Any):
+        self.entries.append(("warning", message, args))
+
+    def replay(self, logger: Logger):
+        for level, message, args in self.entries:
+            getattr(logger, level)(message, *args)
+
+
+class QueueLogger:
+    """
+    A drop-in replacement for Logger in worker processes: every message is sent over a queue,
+    tagged with the index of the file being processed, to a LogForwarder in the parent.
+    """
+
+    def __init__(self, queue, index: int):
+        self.queue = queue
+        self.index = index
+
+    def _put(self, level: str, message: str, args: Tuple[Any, ...]):
+        # Only plain values cross the queue: anything else (paths, exceptions) is sent as its text
+        args = tuple(arg if isinstance(arg, (str, int, float)) else str(arg) for arg in args)
+        self.queue.put((self.index, level, message, args))
+
+    def info(self, message: str, *args: Any):
+        self._put("info", message, args)
+
+    def error(self, message: str, *args: Any):
+        self._put("error", message, args)
+
+    def warning(self, message: str, *args: Any):
+        self._put("warning", message, args)
+
+    def done(self, payload: Any = None):
+        """
+        Ends the messages of the file. The payload (e.g. its metrics) is handed to the forwarder's on_done.
+        """
+        self.queue.put((self.index, DONE, payload))
+
+
+class LogForwarder:
+    """
+    Prints the messages that worker processes send over a queue, in file order.
+
+    The messages of the earliest unfinished file are printed as they arrive, the others are held
+    until every file before them is done, so parallel runs print the same output as sequential
+    ones while still streaming it. on_done is called with the index and payload of each file, in order.
+    """
+
+    def __init__(self, queue, logger: Logger, count: int, on_done: Optional[Callable[[int, Any], None]] = None):
+        self.queue = queue
+        self.logger = logger
+        self.count = count
+        self.on_done = on_done
+        self.thread = threading.Thread(target=self._run, name="cleandns-log-forwarder", daemon=True)
+
+    def start(self) -> "LogForwarder":
+        self.thread.start()
+        return self
+
+    def join(self):
+        self.thread.join()
+
+    def _run(self):
+        head = 0
+        held: Dict[int, List[Tuple[str, str, Tuple[Any, ...]]]] = {}
+        finished: Dict[int, Any] = {}
+        while head < self.count:
+            index, level, *rest = self.queue.get()
+            if level == DONE:
+                # A file retried after a crash may end twice: only the first end counts
+                finished.setdefault(index, rest[0])
+            elif index <= head:
+                # Messages of a finished file (e.g. a late retry) are printed rather than lost
+                self._emit(level, *rest)
+            else:
+                held.setdefault(index, []).append((level, *rest))
+            while head in finished:
+                payload = finished.pop(head)
+                if self.on_done is not None:
+                    self.on_done(head, payload)
+                head += 1
+                for entry in held.pop(head, ()):
+                    self._emit(*entry)
+
+    def _emit(self, level: str, message: str, args: Tuple[Any, ...]):
+        getattr(self.logger, level)(message, *args)
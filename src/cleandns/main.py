@@ -1,28 +1,458 @@
+import os
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 from src.cleandns.argument_parser import ArgumentParser
-from src.cleandns.dns_file import DNSFile
-from src.cleandns.logger import Logger
+from src.cleandns.backup import BackupPolicy
+from src.cleandns.fingerprint_cache import FingerprintCache
+from src.cleandns.logger import Logger, BufferedLogger, LogForwarder, QueueLogger
+from src.cleandns.metrics import FileMetrics, MetricsReporter, NULL_METRICS
+from src.cleandns.zone_writer import ZoneWriter
 
-def process_file(file_path: Path, logger: Logger) -> bool:
+# The parser, dnspython, multiprocessing and the watcher are imported where they are used, so that
+# --help, runs where every file is skipped, and short-lived invocations don't pay for them
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from src.cleandns.dns_file import DNSFile
+    from src.cleandns.owner_index import OwnerIndex
+    from src.cleandns.watcher import DirectoryWatcher
+
+# Defaults of the asyncio pipeline: concurrent filesystem operations, and files held in memory at once
+DEFAULT_IO_WORKERS = 8
+DEFAULT_MAX_IN_FLIGHT = 16
+
+def check_file(file_path: Path, logger: Logger, strict: bool = False, canonical_duplicates: bool = False,
+               report_all: bool = False, metrics: Optional[FileMetrics] = None, content: Optional[bytes] = None,
+               owner_index: Optional["OwnerIndex"] = None, dependencies: Optional[Dict[Path, Any]] = None) -> bool:
+    """
+    Verifies that a DNS file is already clean without writing anything. Returns True if it is.
+    When the content of the file is given, it is parsed instead of reading the file.
+    When an owner index is given, the zone is added to it for the cross-zone checks.
+    When a dependencies dict is given, the fingerprints of the files the zone includes are added to it.
+    """
+    from src.cleandns.dns_file import DNSFile
+
+    phases = metrics or NULL_METRICS
+    if metrics is not None and content is None:
+        metrics.bytes_read = file_path.stat().st_size
+    with phases.phase("parse"):
+        dns_file = DNSFile(file_path, strict=strict, logger=logger, content=content)
+    if dependencies is not None:
+        dependencies.update(dns_file.dependencies)
+    if owner_index is not None:
+        owner_index.add_zone(dns_file)
+    with phases.phase("check"):
+        violations = dns_file.check(canonical=canonical_duplicates, report_all=report_all)
+    if metrics is not None:
+        metrics.records_in = metrics.records_out = dns_file.record_count
+
+    for violation in violations:
+        logger.error("%s is not clean: %s", file_path.name, violation)
+    if not violations:
+        logger.info("%s is clean", file_path.name)
+    return not violations
+
+def prepare_file(file_path: Path, logger: Logger, strict: bool = False, canonical_duplicates: bool = False,
+                 metrics: Optional[FileMetrics] = None, backup_policy: Optional[BackupPolicy] = None,
+                 writer: Optional[ZoneWriter] = None, content: Optional[bytes] = None) -> "DNSFile":
+    """
+    Parses a DNS file, removes its duplicates and sorts it: the CPU-bound part of process_file.
+    When the content of the file is given, it is parsed instead of reading the file.
+    """
+    from src.cleandns.dns_file import DNSFile
+
+    phases = metrics or NULL_METRICS
+    if metrics is not None and content is None:
+        metrics.bytes_read = file_path.stat().st_size
+    with phases.phase("parse"):
+        dns_file = DNSFile(file_path, strict=strict, logger=logger, metrics=metrics, backup_policy=backup_policy,
+                           writer=writer, content=content)
+    if metrics is not None:
+        metrics.records_in = dns_file.record_count
+    with phases.phase("remove_duplicates"):
+        dns_file.remove_duplicates(canonical=canonical_duplicates)
+    if metrics is not None:
+        metrics.records_out = dns_file.record_count
+        metrics.duplicates_removed = metrics.records_in - metrics.records_out
+    with phases.phase("sort"):
+        dns_file.sort()
+    if metrics is not None:
+        metrics.modified = dns_file.modified
+    return dns_file
+
+def process_file(file_path: Path, logger: Logger, strict: bool = False, canonical_duplicates: bool = False,
+                 metrics: Optional[FileMetrics] = None, backup_policy: Optional[BackupPolicy] = None,
+                 check: bool = False, report_all: bool = False, writer: Optional[ZoneWriter] = None,
+                 max_memory: Optional[int] = None, spill_directory: Optional[Path] = None,
+                 owner_index: Optional["OwnerIndex"] = None, dependencies: Optional[Dict[Path, Any]] = None) -> bool:
     """
     Process a single DNS file. Returns True if successful, False otherwise.
+    When metrics are given, every phase is measured into them.
+    In check mode, the file is only verified (see check_file).
+    With max_memory (in bytes), the zone is cleaned by an external merge sort (see ExternalZoneFile).
+    When an owner index is given, the zone is added to it for the cross-zone checks (except with max_memory).
+    When a dependencies dict is given, the fingerprints of the files the zone includes are added to it.
     """
     if not file_path.is_file():
-        logger.warning(f"Skipping {file_path}: Not a valid file.")
+        logger.warning("Skipping %s: Not a valid file.", file_path)
         return False
 
     try:
-        dns_file = DNSFile(file_path)
-        dns_file.remove_duplicates()
-        dns_file.sort()
-        dns_file.save()
-        logger.info(f"Successfully processed {file_path.name}")
+        if check:
+            return check_file(file_path, logger, strict=strict, canonical_duplicates=canonical_duplicates,
+                              report_all=report_all, metrics=metrics, owner_index=owner_index,
+                              dependencies=dependencies)
+        if max_memory is not None and not strict:
+            from src.cleandns.external_sort import ExternalZoneFile
+
+            dns_file = ExternalZoneFile(file_path, max_memory, logger=logger, metrics=metrics, backup_policy=backup_policy,
+                                        writer=writer, spill_directory=spill_directory)
+            dns_file.clean(canonical=canonical_duplicates)
+            if owner_index is not None:
+                logger.warning("%s is streamed with --max-memory and left out of the cross-zone checks", file_path.name)
+        else:
+            dns_file = prepare_file(file_path, logger, strict=strict, canonical_duplicates=canonical_duplicates,
+                                    metrics=metrics, backup_policy=backup_policy, writer=writer)
+            if owner_index is not None:
+                owner_index.add_zone(dns_file)
+            dns_file.save()
+        if dependencies is not None:
+            dependencies.update(dns_file.dependencies)
+        if metrics is not None:
+            metrics.bytes_written = dns_file.bytes_written
+        logger.info("Successfully processed %s", file_path.name)
         return True
     except Exception as e:
-        logger.error(f"Failed to process {file_path.name}: {e}")
+        logger.error("Failed to process %s: %s", file_path.name, e)
+        return False
+
+async def process_file_async(file_path: Path, logger: Logger, io_executor: "Executor", cpu_executor: "Executor",
+                             strict: bool = False, canonical_duplicates: bool = False,
+                             metrics: Optional[FileMetrics] = None, backup_policy: Optional[BackupPolicy] = None,
+                             check: bool = False, report_all: bool = False, writer: Optional[ZoneWriter] = None,
+                             max_memory: Optional[int] = None, spill_directory: Optional[Path] = None,
+                             owner_index: Optional["OwnerIndex"] = None,
+                             dependencies: Optional[Dict[Path, Any]] = None) -> bool:
+    """
+    process_file split into stages: the file is read, backed up and replaced on the I/O executor,
+    and parsed, deduplicated and sorted on the CPU executor. Logs and returns like process_file.
+    With max_memory, the zone can't be read into memory and is streamed by process_file on the CPU executor.
+    """
+    import asyncio
+    from functools import partial
+
+    loop = asyncio.get_running_loop()
+    if max_memory is not None and not strict and not check:
+        return await loop.run_in_executor(cpu_executor, partial(
+            process_file, file_path, logger, canonical_duplicates=canonical_duplicates, metrics=metrics,
+            backup_policy=backup_policy, writer=writer, max_memory=max_memory, spill_directory=spill_directory,
+            owner_index=owner_index, dependencies=dependencies))
+
+    phases = metrics or NULL_METRICS
+    if not await loop.run_in_executor(io_executor, file_path.is_file):
+        logger.warning("Skipping %s: Not a valid file.", file_path)
         return False
 
+    try:
+        with phases.phase("read"):
+            content = await loop.run_in_executor(io_executor, file_path.read_bytes)
+        if metrics is not None:
+            metrics.bytes_read = len(content)
+        if check:
+            return await loop.run_in_executor(cpu_executor, partial(
+                check_file, file_path, logger, strict=strict, canonical_duplicates=canonical_duplicates,
+                report_all=report_all, metrics=metrics, content=content, owner_index=owner_index,
+                dependencies=dependencies))
+        dns_file = await loop.run_in_executor(cpu_executor, partial(
+            prepare_file, file_path, logger, strict=strict, canonical_duplicates=canonical_duplicates,
+            metrics=metrics, backup_policy=backup_policy, writer=writer, content=content))
+        del content
+        if owner_index is not None:
+            owner_index.add_zone(dns_file)
+        await loop.run_in_executor(io_executor, dns_file.save)
+        if dependencies is not None:
+            dependencies.update(dns_file.dependencies)
+        if metrics is not None:
+            metrics.bytes_written = dns_file.bytes_written
+        logger.info("Successfully processed %s", file_path.name)
+        return True
+    except Exception as e:
+        logger.error("Failed to process %s: %s", file_path.name, e)
+        return False
+
+def process_files_async(files_to_process: List[Path], logger: Logger, io_workers: int = DEFAULT_IO_WORKERS,
+                        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, reporter: Optional[MetricsReporter] = None,
+                        file_dependencies: Optional[Dict[Path, Dict[Path, Any]]] = None, **options) -> List[bool]:
+    """
+    Process the files concurrently with an asyncio pipeline, so that waiting on the filesystem
+    (e.g. NFS reads, backups and renames) overlaps with parsing and sorting other zones.
+
+    At most io_workers filesystem operations run at once, a single worker does the CPU work,
+    and at most max_in_flight files are held in memory. Results are reported in input order.
+    The fingerprints of the files each zone includes are stored in file_dependencies, when given.
+    Returns the success of each file, in input order.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    collect_metrics = reporter is not None
+
+    async def run():
+        in_flight = asyncio.Semaphore(max_in_flight)
+        with ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="cleandns-io") as io_executor, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix="cleandns-cpu") as cpu_executor:
+
+            async def process(file_path: Path):
+                async with in_flight:
+                    buffered_logger = BufferedLogger()
+                    metrics = FileMetrics(str(file_path)) if collect_metrics else None
+                    dependencies = file_dependencies.setdefault(file_path, {}) if file_dependencies is not None else None
+                    success = await process_file_async(file_path, buffered_logger, io_executor, cpu_executor,
+                                                       metrics=metrics, dependencies=dependencies, **options)
+                    return success, buffered_logger, metrics
+
+            return await asyncio.gather(*(process(file_path) for file_path in files_to_process))
+
+    return replay_results(asyncio.run(run()), logger, reporter)
+
+def replay_results(results: List[Tuple[bool, BufferedLogger, Optional[FileMetrics]]], logger: Logger,
+                   reporter: Optional[MetricsReporter] = None) -> List[bool]:
+    """
+    Replays the buffered log lines (and reports the metrics) of each file in order, and returns their success.
+    """
+    successes = []
+    for success, buffered_logger, metrics in results:
+        buffered_logger.replay(logger)
+        if success and metrics is not None:
+            reporter.report(metrics)
+        successes.append(success)
+    return successes
+
+# The queue the worker processes send their log lines to, set when each worker starts
+worker_log_queue = None
+
+def init_worker_logging(queue):
+    global worker_log_queue
+    worker_log_queue = queue
+
+def process_file_forwarded(index: int, file_path: Path, options: Dict[str, Any], collect_metrics: bool = False,
+                           index_owners: bool = False) -> Tuple[bool, Optional["OwnerIndex"], Dict[Path, Any]]:
+    """
+    Runs process_file in a worker process, forwarding its log lines (and metrics) to the parent's LogForwarder.
+    With index_owners, the owners of the zone are indexed and sent back to be merged by the parent.
+    The fingerprints of the files the zone includes are sent back as well.
+    """
+    owner_index = None
+    if index_owners:
+        from src.cleandns.owner_index import OwnerIndex
+
+        owner_index = OwnerIndex()
+    queue_logger = QueueLogger(worker_log_queue, index)
+    metrics = FileMetrics(str(file_path)) if collect_metrics else None
+    dependencies = {}
+    success = process_file(file_path, queue_logger, metrics=metrics, owner_index=owner_index,
+                           dependencies=dependencies, **options)
+    queue_logger.done(metrics if success else None)
+    return success, owner_index, dependencies
+
+def process_files_parallel(files_to_process: List[Path], logger: Logger, jobs: int,
+                           reporter: Optional[MetricsReporter] = None, owner_index: Optional["OwnerIndex"] = None,
+                           file_dependencies: Optional[Dict[Path, Dict[Path, Any]]] = None, **options) -> List[bool]:
+    """
+    Process the files across a pool of worker processes, passing the options on to process_file.
+    Log lines are forwarded through a queue and printed in input order while the files are processed,
+    each file's metrics (when a reporter is given) right after its lines.
+    The owners indexed by the workers are merged into owner_index, when given, and the fingerprints
+    of the files each zone includes are stored in file_dependencies, when given.
+    Returns the success of each file, in input order.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    collect_metrics = reporter is not None
+    index_owners = owner_index is not None
+    results: Dict[int, Tuple[bool, Optional["OwnerIndex"], Dict[Path, Any]]] = {}
+    crashed = []
+
+    def report(index: int, metrics: Optional[FileMetrics]):
+        if metrics is not None:
+            reporter.report(metrics)
+
+    # The queue lives in a manager process: each worker talks to it over its own connection, so a worker
+    # dying mid-message (or terminated with a broken pool) can't leave a shared pipe or lock unusable
+    with multiprocessing.Manager() as manager:
+        queue = manager.Queue()
+        forwarder = LogForwarder(queue, logger, len(files_to_process), on_done=report).start()
+        pool_options = dict(initializer=init_worker_logging, initargs=(queue,))
+
+        with ProcessPoolExecutor(max_workers=jobs, **pool_options) as executor:
+            futures = [executor.submit(process_file_forwarded, index, file_path, options, collect_metrics,
+                                       index_owners) for index, file_path in enumerate(files_to_process)]
+            for index, future in enumerate(futures):
+                try:
+                    results[index] = future.result()
+                except BrokenProcessPool:
+                    crashed.append(index)
+
+        # A worker died (e.g. killed by the OOM killer) and took the pool down with it: retry the
+        # affected files one by one in their own pool so a single bad zone only fails itself
+        for index in crashed:
+            file_path = files_to_process[index]
+            try:
+                with ProcessPoolExecutor(max_workers=1, **pool_options) as executor:
+                    results[index] = executor.submit(process_file_forwarded, index, file_path, options,
+                                                     collect_metrics, index_owners).result()
+            except BrokenProcessPool:
+                queue_logger = QueueLogger(queue, index)
+                queue_logger.error("Failed to process %s: the worker process crashed", file_path.name)
+                queue_logger.done()
+                results[index] = (False, None, {})
+
+        # Every file has ended its lines by now, so the forwarder only has the queue left to drain
+        forwarder.join()
+
+    successes = []
+    for index in range(len(files_to_process)):
+        success, worker_index, dependencies = results[index]
+        if owner_index is not None and worker_index is not None:
+            owner_index.update(worker_index)
+        if file_dependencies is not None:
+            file_dependencies[files_to_process[index]] = dependencies
+        successes.append(success)
+    return successes
+
+def skip_clean_files(files_to_process: List[Path], cache: FingerprintCache, logger: Logger) -> List[Path]:
+    """
+    Returns the files that changed since they were last cleaned, logging the ones that are skipped.
+    """
+    pending = []
+    for file_path in files_to_process:
+        if file_path.is_file() and cache.is_clean(file_path):
+            logger.info("Skipping %s: unchanged since the last run.", file_path.name)
+        else:
+            pending.append(file_path)
+    return pending
+
+def clean_changed_files(files: List[Path], logger: Logger, cache: FingerprintCache,
+                        reporter: Optional[MetricsReporter] = None, **options) -> List[bool]:
+    """
+    Cleans the files that changed since they were last cleaned and records them in the cache.
+    Unchanged files, including the ones cleandns just rewrote itself, are skipped silently.
+    """
+    results = []
+    for file_path in files:
+        if cache.is_clean(file_path):
+            continue
+        metrics = FileMetrics(str(file_path)) if reporter is not None else None
+        dependencies = {}
+        success = process_file(file_path, logger, metrics=metrics, dependencies=dependencies, **options)
+        if success:
+            cache.update(file_path, dependencies)
+            if metrics is not None:
+                reporter.report(metrics)
+        else:
+            cache.discard(file_path)
+        results.append(success)
+    return results
+
+def watch_directory(watcher: "DirectoryWatcher", logger: Logger, cache: FingerprintCache, save_cache: bool = True,
+                    reporter: Optional[MetricsReporter] = None, **options):
+    """
+    Cleans every zone of the watched directory, then re-cleans each zone as soon as it changes.
+    Runs until interrupted. The modules, the cache and the watch stay warm between changes.
+    """
+    mode = "polling" if watcher.polling else "inotify"
+    logger.info("Watching %s for changes (%s) ...", watcher.directory, mode)
+    changed = watcher.zones()
+    try:
+        while True:
+            if clean_changed_files(changed, logger, cache, reporter=reporter, **options) and save_cache:
+                try:
+                    cache.save()
+                except OSError as e:
+                    logger.warning("Could not update the fingerprint cache %s: %s", cache.path, e)
+            changed = watcher.wait()
+    except KeyboardInterrupt:
+        logger.info("Stopped watching %s", watcher.directory)
+    finally:
+        watcher.close()
+
+def index_zone_files(files: List[Path], owner_index: "OwnerIndex", logger: Logger, strict: bool = False):
+    """
+    Adds the zones that are not processed (e.g. unchanged since the last run) to the owner index.
+    """
+    from src.cleandns.dns_file import DNSFile
+
+    for file_path in files:
+        try:
+            owner_index.add_zone(DNSFile(file_path, strict=strict, logger=logger))
+        except Exception as e:
+            logger.error("Failed to index %s: %s", file_path.name, e)
+
+def check_cross_zone(owner_index: "OwnerIndex", logger: Logger) -> bool:
+    """
+    Logs the CNAME problems found across the indexed zones. Returns True if there are none.
+    """
+    problems = 0
+    for problem in owner_index.problems():
+        logger.warning("%s", problem)
+        problems += 1
+    if problems:
+        logger.warning("Found %d CNAME problem(s) across %d zone(s)", problems, len(owner_index.origins))
+    return not problems
+
+def diff_files(old_path: Path, new_path: Path, logger: Logger, strict: bool = False) -> int:
+    """
+    Prints the differences between two zone files.
+    Returns 0 if they hold the same records, 1 if they differ and 2 on error (like diff).
+    """
+    from src.cleandns.dns_file import DNSFile
+
+    try:
+        old_file = DNSFile(old_path, strict=strict, logger=logger)
+        new_file = DNSFile(new_path, strict=strict, logger=logger)
+    except Exception as e:
+        logger.error("Failed to diff %s and %s: %s", old_path.name, new_path.name, e)
+        return 2
+
+    zone_diff = old_file.diff(new_file)
+    for line in zone_diff.lines():
+        print(line)
+    return 1 if zone_diff else 0
+
+def generate_reverse_zones(forward_paths: List[Path], output_directory: Path, logger: Logger, prefix_length: int = 24,
+                           prune: bool = False, strict: bool = False, backup_policy: Optional[BackupPolicy] = None,
+                           writer: Optional[ZoneWriter] = None) -> int:
+    """
+    Creates or updates the reverse zones of the A records of the forward zones, reading each forward zone once.
+    Returns 0 on success and 1 if any zone failed.
+    """
+    from src.cleandns.dns_file import DNSFile
+    from src.cleandns.reverse_zones import ReverseIndex, reconcile_reverse_zone
+
+    index = ReverseIndex(prefix_length)
+    has_error = False
+    for path in forward_paths:
+        try:
+            index.add_zone(DNSFile(path, strict=strict, logger=logger))
+        except Exception as e:
+            logger.error("Failed to read %s: %s", path.name, e)
+            has_error = True
+    if index.skipped:
+        logger.warning("Skipped %d A record(s) without a valid IPv4 address", index.skipped)
+
+    output_directory.mkdir(parents=True, exist_ok=True)
+    for zone_name in sorted(index.zones):
+        path = output_directory / f"{zone_name}.zone"
+        try:
+            reconcile_reverse_zone(path, zone_name, index.zones[zone_name], index.templates[zone_name], prune=prune,
+                                   logger=logger, backup_policy=backup_policy, writer=writer)
+        except Exception as e:
+            logger.error("Failed to update %s: %s", path.name, e)
+            has_error = True
+    return 1 if has_error else 0
+
 def main():
     # Initialize the singleton logger (configuration is handled inside the class)
     logger = Logger()
@@ -30,21 +460,130 @@ def main():
     arg_parser = ArgumentParser()
     args = arg_parser.parse_arguments()
 
+    if args.command == "diff":
+        sys.exit(diff_files(Path(args.old), Path(args.new), logger, strict=args.strict))
+
+    backup_policy = BackupPolicy(
+        mode=args.backup_mode,
+        directory=Path(args.backup_dir) if args.backup_dir else None,
+        compress=args.compress_backups,
+        keep_last=args.keep_backups,
+        max_age=args.backup_max_age
+    )
+    writer = ZoneWriter(buffer_size=args.write_buffer_size, durability=args.durability)
+
+    if args.command == "reverse":
+        sys.exit(generate_reverse_zones([Path(f) for f in args.forward], Path(args.output_dir), logger,
+                                        prefix_length=args.prefix_length, prune=args.prune, strict=args.strict,
+                                        backup_policy=backup_policy, writer=writer))
+
+    watching = args.command == "watch"
     files_to_process = []
 
-    if not args.files:
+    if not args.files and not watching:
         logger.warning("No files provided to process. Use --help for more information.")
         sys.exit(0)
 
-    files_to_process = [Path(f) for f in args.files]
+    if args.files:
+        files_to_process = [Path(f) for f in args.files]
 
-    has_error = False
+    if args.cross_zone_checks and watching:
+        arg_parser.parser.error("--cross-zone-checks can't be combined with watch")
+    all_files = files_to_process
 
-    # Process files sequentially
-    for file_path in files_to_process:
-        success = process_file(file_path, logger)
-        if not success:
-            has_error = True
+    # The options that change the result of a cleaning: a file cleaned with others is processed again
+    cache_options = dict(strict=args.strict, canonical_duplicates=args.canonical_duplicates)
+    cache = None
+    if not args.no_cache:
+        cache = FingerprintCache(Path(args.cache_file) if args.cache_file else None, options=cache_options)
+        cache.load()
+        if not watching:
+            files_to_process = skip_clean_files(files_to_process, cache, logger)
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    if args.max_memory is not None and args.strict:
+        arg_parser.parser.error("--max-memory can't be combined with --strict: dnspython loads the whole zone")
+    options = dict(strict=args.strict, canonical_duplicates=args.canonical_duplicates, backup_policy=backup_policy,
+                   check=args.check, report_all=args.report_all, writer=writer, max_memory=args.max_memory,
+                   spill_directory=Path(args.spill_dir) if args.spill_dir else None)
+
+    owner_index = None
+    if args.cross_zone_checks:
+        from src.cleandns.owner_index import OwnerIndex
+
+        # The zones are indexed while they are processed; the skipped ones still need reading once
+        owner_index = OwnerIndex(max_hops=args.max_cname_hops)
+        pending = set(files_to_process)
+        index_zone_files([f for f in all_files if f not in pending and f.is_file()], owner_index, logger, strict=args.strict)
+        options["owner_index"] = owner_index
+
+    reporter = None
+    metrics_output = None
+    if args.profile or args.metrics_json:
+        if args.metrics_json and args.metrics_json != "-":
+            metrics_output = open(args.metrics_json, "a")
+        reporter = MetricsReporter(logger, profile=args.profile,
+                                   json_output=sys.stdout if args.metrics_json == "-" else metrics_output)
+
+    if watching:
+        import signal
+        from src.cleandns.watcher import DirectoryWatcher
+
+        directory = Path(args.directory)
+        if not directory.is_dir():
+            logger.error("Cannot watch %s: Not a directory.", directory)
+            sys.exit(1)
+        watcher = DirectoryWatcher(directory, pattern=args.pattern, debounce=args.debounce,
+                                   poll_interval=args.poll_interval, polling=args.polling)
+        # Stop as cleanly on SIGTERM (e.g. from systemd) as on Ctrl+C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            # Without a persistent cache, an in-memory one still tells cleandns' own rewrites apart from edits
+            watch_directory(watcher, logger, cache or FingerprintCache(options=cache_options), save_cache=cache is not None,
+                            reporter=reporter, **options)
+        finally:
+            if metrics_output is not None:
+                metrics_output.close()
+        sys.exit(0)
+
+    # The files each zone includes, so that the cache notices when one of them changes
+    file_dependencies: Dict[Path, Dict[Path, Any]] = {}
+    try:
+        if args.async_io and len(files_to_process) > 1:
+            results = process_files_async(files_to_process, logger, io_workers=max(args.io_workers, 1),
+                                          max_in_flight=max(args.max_in_flight, 1), reporter=reporter,
+                                          file_dependencies=file_dependencies, **options)
+        elif jobs > 1 and len(files_to_process) > 1:
+            results = process_files_parallel(files_to_process, logger, jobs, reporter=reporter,
+                                             file_dependencies=file_dependencies, **options)
+        else:
+            # Process files sequentially
+            results = []
+            for file_path in files_to_process:
+                metrics = FileMetrics(str(file_path)) if reporter is not None else None
+                dependencies = file_dependencies.setdefault(file_path, {})
+                success = process_file(file_path, logger, metrics=metrics, dependencies=dependencies, **options)
+                if success and metrics is not None:
+                    reporter.report(metrics)
+                results.append(success)
+    finally:
+        if metrics_output is not None:
+            metrics_output.close()
+
+    has_error = not all(results)
+    if owner_index is not None and not check_cross_zone(owner_index, logger) and args.check:
+        has_error = True
+
+    if cache is not None:
+        for file_path, success in zip(files_to_process, results):
+            if success:
+                cache.update(file_path, file_dependencies.get(file_path))
+            else:
+                cache.discard(file_path)
+        try:
+            cache.save()
+        except OSError as e:
+            logger.warning("Could not update the fingerprint cache %s: %s", cache.path, e)
 
     # Exit with non-zero code if any file failed
     sys.exit(1 if has_error else 0)
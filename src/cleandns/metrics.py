@@ -0,0 +1,124 @@
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Optional, TextIO
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+# On Linux the peak resident set size (VmHWM) can be read, and reset by writing 5 to clear_refs
+PROC_STATUS = "/proc/self/status"
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+def reset_peak_memory() -> bool:
+    """
+    Resets the peak memory of the process to its current memory, so that the next peaks are the
+    ones of the work that follows. Returns False where that's not possible (anything but Linux).
+    """
+    try:
+        with open(PROC_CLEAR_REFS, "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_memory_bytes() -> int:
+    """
+    The peak memory of the process since the last reset_peak_memory(), or since it started.
+    """
+    try:
+        with open(PROC_STATUS, "r") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return 0
+    # Never reset: the peak of the whole process
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MAXRSS_UNIT
+
+
+@dataclass
+class FileMetrics:
+    """
+    What happened while processing one file: the wall time of every phase, the record
+    counts, the bytes read and written, and the peak memory.
+
+    The peak memory is the peak of the process while the file was processed: it is reset when
+    the first phase starts (peak_memory_scope "file"). Where it can't be reset, it is the peak
+    of the process since it started (peak_memory_scope "process"). Files processed at the same
+    time by one process (--async-io) share their peaks.
+    """
+    path: str
+    phases: Dict[str, float] = field(default_factory=dict)
+    records_in: int = 0
+    records_out: int = 0
+    duplicates_removed: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    peak_memory_bytes: int = 0
+    peak_memory_scope: str = "process"
+    modified: bool = False
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.phases and reset_peak_memory():
+            self.peak_memory_scope = "file"
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            self.peak_memory_bytes = max(self.peak_memory_bytes, peak_memory_bytes())
+
+    def summary(self) -> str:
+        phases = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.phases.items())
+        return (
+            f"{self.path}: {phases} | records {self.records_in} -> {self.records_out} "
+            f"({self.duplicates_removed} duplicates) | read {self.bytes_read} B, written {self.bytes_written} B "
+            f"| {'peak' if self.peak_memory_scope == 'file' else 'process peak'} memory "
+            f"{self.peak_memory_bytes / 2 ** 20:.1f} MiB"
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+
+class NullMetrics:
+    """
+    Stands in for FileMetrics when nothing is measured, so instrumented code costs next to nothing.
+    """
+    _context = nullcontext()
+
+    def phase(self, name: str):
+        return self._context
+
+
+NULL_METRICS = NullMetrics()
+
+
+class MetricsReporter:
+    """
+    Emits the metrics of each processed file as a human-readable summary and/or as JSON lines.
+    """
+
+    def __init__(self, logger, profile: bool = False, json_output: Optional[TextIO] = None):
+        self.logger = logger
+        self.profile = profile
+        self.json_output = json_output
+
+    def report(self, metrics: FileMetrics):
+        if self.profile:
+            self.logger.info("%s", metrics.summary())
+        if self.json_output is not None:
+            self.json_output.write(f"{metrics.to_json()}\n")
+            self.json_output.flush()
@@ -0,0 +1,140 @@
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from cleandns.dns_file import DNSFile
+from cleandns.record_types import AbstractRecord, RecordType
+from cleandns.reverse_zones import forward_origin, qualify
+
+# Resolvers give up after 8 to 16 hops; chains are best kept much shorter than that
+DEFAULT_MAX_CNAME_HOPS = 3
+# Types allowed next to a CNAME (RFC 2181 and RFC 4035)
+CNAME_COMPANION_TYPES = {RecordType.CNAME, RecordType.RRSIG, RecordType.NSEC, RecordType.NSEC3}
+
+
+def normalize(name: str) -> str:
+    return name.lower().rstrip(".")
+
+
+class OwnerIndex:
+    """
+    The owner names of many zones, hashed so that CNAMEs can be checked across zone boundaries:
+    targets without any data (dangling), chains longer than max_hops, and CNAMEs sharing their owner
+    with other data. Building the index and running the checks are both linear in the number of records.
+
+    Zones written without $ORIGIN don't say which names are relative, whatever their SOA owner: their
+    owners not under the zone are taken as relative to it, and so are the CNAME targets with a single
+    label or ending with the zone name.
+    """
+
+    def __init__(self, max_hops: int = DEFAULT_MAX_CNAME_HOPS):
+        self.max_hops = max_hops
+        # The zones indexed, by their normalized name
+        self.origins: Set[str] = set()
+        # Owner -> a type (other than CNAME) with data at that owner, preferably one conflicting with a CNAME
+        self.data: Dict[str, RecordType] = {}
+        # Owner -> its CNAME targets, with the file each CNAME comes from
+        self.cnames: Dict[str, List[Tuple[str, str]]] = {}
+
+    def add_zone(self, zone: DNSFile):
+        """
+        Indexes the records of a zone, the SOA and the included records too.
+        """
+        origin = forward_origin(zone)
+        source = zone.path.name
+        self.origins.add(normalize(origin))
+        self._add_data(normalize(qualify(zone.soa_record.name, origin)), RecordType.SOA)
+
+        records: Iterable[AbstractRecord] = chain.from_iterable(zone.records.values())
+        included = chain.from_iterable(include.records for include in zone.includes)
+        for record in chain(records, included):
+            owner = normalize(qualify(record.name, origin))
+            if record.type != RecordType.CNAME:
+                self._add_data(owner, record.type)
+                continue
+            target = normalize(record.rdata)
+            # Owners read under an $ORIGIN keep their final dot, and so do their absolute targets. Without one,
+            # every name was read relative to the root: the targets that look relative are qualified with the zone
+            read_from_root = not record.name.endswith(".") or record.name == "."
+            if read_from_root and ("." not in target or target == origin or target.endswith(f".{origin}")):
+                target = normalize(qualify(target, origin))
+            self.cnames.setdefault(owner, []).append((target, source))
+
+    def _add_data(self, owner: str, r_type: RecordType):
+        # A type that can't live next to a CNAME is kept over one that can
+        if self.data.get(owner, RecordType.CNAME) in CNAME_COMPANION_TYPES:
+            self.data[owner] = r_type
+
+    def update(self, other: "OwnerIndex"):
+        """
+        Merges the index of other zones into this one (e.g. the indexes built by worker processes).
+        """
+        self.origins |= other.origins
+        for owner, r_type in other.data.items():
+            self._add_data(owner, r_type)
+        for owner, targets in other.cnames.items():
+            self.cnames.setdefault(owner, []).extend(targets)
+
+    def _in_indexed_zone(self, name: str) -> Optional[str]:
+        # The indexed zone holding the name, found by walking up its labels
+        while True:
+            if name in self.origins:
+                return name
+            if "." not in name:
+                return None
+            name = name.split(".", 1)[1]
+
+    def _exists(self, name: str, zone: str) -> bool:
+        if name in self.data or name in self.cnames:
+            return True
+        # A wildcard at any level between the name and its zone answers for it
+        while name != zone and "." in name:
+            name = name.split(".", 1)[1]
+            if f"*.{name}" in self.data or f"*.{name}" in self.cnames:
+                return True
+        return False
+
+    def _chain_lengths(self) -> Dict[str, Optional[int]]:
+        """
+        Returns the number of CNAMEs followed from each CNAME owner to a name that is not a CNAME,
+        None for the owners in (or leading to) a loop. Each owner is walked once.
+        """
+        lengths: Dict[str, Optional[int]] = {}
+        for start in self.cnames:
+            path = []
+            on_path = set()
+            name = start
+            while name in self.cnames and name not in lengths and name not in on_path:
+                path.append(name)
+                on_path.add(name)
+                name = self.cnames[name][0][0]
+            if name in on_path:
+                length = None
+            else:
+                length = lengths.get(name, 0) if name in self.cnames else 0
+            for owner in reversed(path):
+                if length is not None:
+                    length += 1
+                lengths[owner] = length
+        return lengths
+
+    def problems(self) -> Iterator[str]:
+        """
+        Yields the CNAME problems found, by CNAME owner in the order they were indexed.
+        """
+        lengths = self._chain_lengths()
+        for owner, targets in self.cnames.items():
+            target, source = targets[0]
+            distinct_targets = len({cname_target for cname_target, _ in targets})
+            if distinct_targets > 1:
+                yield f"{source}: {owner} has {distinct_targets} CNAME records"
+            r_type = self.data.get(owner)
+            if r_type is not None and r_type not in CNAME_COMPANION_TYPES:
+                yield f"{source}: {owner} has both a CNAME and {r_type.value} data"
+            zone = self._in_indexed_zone(target)
+            if zone is not None and not self._exists(target, zone):
+                yield f"{source}: dangling CNAME {owner} -> {target}"
+            length = lengths[owner]
+            if length is None:
+                yield f"{source}: CNAME loop at {owner}"
+            elif length > self.max_hops:
+                yield f"{source}: CNAME chain of {length} hops from {owner} (more than {self.max_hops})"
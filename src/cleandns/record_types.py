@@ -1,7 +1,19 @@
 from abc import abstractmethod, ABC
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Optional, Union, Any
+from typing import Optional, Union, Any, Tuple
+
+
+# The IANA type mnemonics a zone file may hold, besides the members of RecordType below
+# (query-only types such as AXFR, ANY or OPT are left out)
+KNOWN_TYPE_MNEMONICS = frozenset({
+    "A6", "AFSDB", "AMTRELAY", "APL", "ATMA", "AVC", "BRID", "CERT", "CLA", "CSYNC", "DHCID", "DLV", "DOA",
+    "DSYNC", "EID", "EUI48", "EUI64", "GID", "GPOS", "HHIT", "HIP", "IPN", "IPSECKEY", "ISDN", "KEY", "KX",
+    "L32", "L64", "LOC", "LP", "MB", "MD", "MF", "MG", "MINFO", "MR", "NID", "NIMLOC", "NINFO", "NSAP",
+    "NSAP-PTR", "NULL", "NXNAME", "NXT", "OPENPGPKEY", "PX", "RESINFO", "RKEY", "RP", "RT", "SIG", "SINK",
+    "SMIMEA", "TA", "TALINK", "UID", "UINFO", "UNSPEC", "URI", "WALLET", "WKS", "X25", "ZONEMD",
+})
+MAX_TYPE_CODE = 2 ** 16 - 1
 
 
 class RecordType(Enum):
@@ -11,38 +23,150 @@ class RecordType(Enum):
     AAAA = 'AAAA'
     CNAME = 'CNAME'
     PTR = 'PTR'
+    # Types kept as opaque GenericRecords
+    MX = 'MX'
+    TXT = 'TXT'
+    SRV = 'SRV'
+    CAA = 'CAA'
+    SPF = 'SPF'
+    HINFO = 'HINFO'
+    NAPTR = 'NAPTR'
+    DNAME = 'DNAME'
+    SSHFP = 'SSHFP'
+    TLSA = 'TLSA'
+    SVCB = 'SVCB'
+    HTTPS = 'HTTPS'
+    DS = 'DS'
+    DNSKEY = 'DNSKEY'
+    RRSIG = 'RRSIG'
+    NSEC = 'NSEC'
+    NSEC3 = 'NSEC3'
+    NSEC3PARAM = 'NSEC3PARAM'
+    CDS = 'CDS'
+    CDNSKEY = 'CDNSKEY'
+
+    @classmethod
+    def _missing_(cls, value):
+        """
+        Any other known type mnemonic (e.g. LOC), or an RFC 3597 type number (e.g. TYPE65534), gets a member
+        of its own, created once and registered so that later lookups return the same member.
+        Anything else is not a type: the lookup raises ValueError, and the members stay bounded.
+        """
+        if not isinstance(value, str):
+            return None
+        number = value[4:] if value.startswith("TYPE") else ""
+        is_type_number = number.isascii() and number.isdigit() and int(number) <= MAX_TYPE_CODE
+        if value not in KNOWN_TYPE_MNEMONICS and not is_type_number:
+            return None
+        member = object.__new__(cls)
+        member._name_ = value
+        member._value_ = value
+        cls._value2member_map_[value] = member
+        return member
 
 class DNSClass(Enum):
     IN = 'IN'
     CH = 'CH'
 
-@dataclass
+@dataclass(slots=True)
 class AbstractRecord(ABC):
-    """Abstract class for DNS records."""
+    """
+    Abstract class for DNS records.
+    Records are slotted to keep multi-million-record zones small: the derived keys and texts below
+    are cached in slots as well, filled the first time they are needed and shared by every phase
+    (dedupe, sort and check). Records are not changed once read, except the SOA which clears
+    its caches itself: after changing another record in place, call invalidate().
+    """
     name: str
     ttl: int
     type: RecordType
     rdata: Union[str, Any]
     comment: Optional[str] = field(compare=False)
     class_: DNSClass
+    _sort_key: Optional[Tuple[Any, str]] = field(default=None, init=False, repr=False, compare=False)
+    _identity: Optional[Tuple[str, DNSClass, RecordType, str]] = field(default=None, init=False, repr=False, compare=False)
+    _canonical_identity: Optional[Tuple[str, DNSClass, RecordType, str]] = field(default=None, init=False, repr=False, compare=False)
+    _lowered_rdata: Optional[str] = field(default=None, init=False, repr=False, compare=False)
 
     def __str__(self) -> str:
         """
         Returns the record in the standard DNS zone file format (BIND format).
         """
+        # Not cached: each line is rendered once, when the zone is written, and keeping the
+        # lines on the records would hold the whole output in memory until the zone is dropped
         return f"{self.name}\t{self.ttl}\t{self.class_.value}\t{self.type.value}\t{self.rdata}"
 
+    def invalidate(self):
+        """
+        Clears the cached keys, so that they are computed again from the current fields.
+        """
+        self._sort_key = None
+        self._identity = None
+        self._canonical_identity = None
+        self._lowered_rdata = None
+
+    @property
+    def lowered_rdata(self) -> str:
+        """
+        The rdata as text in lowercase, which records are ordered and compared by.
+        """
+        if self._lowered_rdata is None:
+            self._lowered_rdata = str(self.rdata).lower()
+        return self._lowered_rdata
+
+    @property
+    def identity(self) -> Tuple[str, DNSClass, RecordType, str]:
+        """
+        The hashable identity of the record: owner, class, type and rdata. DNS names are case-insensitive,
+        so the owner is lowercased (as dnspython compares them); the rdata is kept exactly as written.
+        Two records with the same identity are duplicates, whatever their TTL.
+        """
+        if self._identity is None:
+            owner = self.name.lower()
+            # Most owners are lowercase already: the record's own string is kept instead of a copy
+            if owner == self.name:
+                owner = self.name
+            self._identity = (owner, self.class_, self.type, self._exact_rdata())
+        return self._identity
+
+    def _exact_rdata(self) -> str:
+        return str(self.rdata)
+
+    @property
+    def canonical_identity(self) -> Tuple[str, DNSClass, RecordType, str]:
+        """
+        The identity in DNS canonical form: names are case-insensitive and the final dot is ignored,
+        so "WWW" and "www." are the same owner.
+        """
+        if self._canonical_identity is None:
+            self._canonical_identity = (self.name.lower().rstrip('.'), self.class_, self.type, self._canonical_rdata())
+        return self._canonical_identity
+
+    def _canonical_rdata(self) -> str:
+        return self.lowered_rdata.rstrip('.')
+
+    def _name_key(self) -> Any:
+        return self.name.lower()
+
+    @property
+    def sort_key(self) -> Tuple[Any, str]:
+        """
+        The key records are ordered by: the name, then the lowercased rdata.
+        It is computed once per record, so sorting with it doesn't rebuild it on every comparison.
+        """
+        if self._sort_key is None:
+            self._sort_key = (self._name_key(), self.lowered_rdata)
+        return self._sort_key
+
     def __lt__(self, other: object) -> bool:
         if not isinstance(other, AbstractRecord):
             return NotImplemented
 
-        self_name_lower = self.name.lower()
-        other_name_lower = other.name.lower()
-
-        if self_name_lower != other_name_lower:
-            return self_name_lower < other_name_lower
-        return str(self.rdata).lower() < str(other.rdata).lower()
-@dataclass
+        if type(self)._name_key is not type(other)._name_key:
+            # Records whose names are ordered differently (e.g. PTR and A) are compared alphabetically
+            return (self.name.lower(), self.lowered_rdata) < (other.name.lower(), other.lowered_rdata)
+        return self.sort_key < other.sort_key
+@dataclass(slots=True)
 class SOARecord(AbstractRecord):
     mname: str 
     rname: str 
@@ -51,8 +175,26 @@ class SOARecord(AbstractRecord):
     retry: int 
     expire: int
     minimum: int 
+    # There is a single SOA per zone, so its text (the longest of all) is kept until a field changes
+    _text: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value: Any):
+        # The SOA is the one record changed in place (its serial): any change to a field clears the caches
+        object.__setattr__(self, name, value)
+        if not name.startswith("_"):
+            self.invalidate()
+
+    def invalidate(self):
+        # Slotted dataclasses are rebuilt as new classes, which breaks the zero-argument super()
+        AbstractRecord.invalidate(self)
+        self._text = None
 
     def __str__(self) -> str:
+        if self._text is None:
+            self._text = self._render()
+        return self._text
+
+    def _render(self) -> str:
         return (
             f"{self.name}\t{self.ttl}\t{self.class_.value}\t{self.type.value}\t{self.mname} {self.rname} (\n"
             f"\t\t\t\t{self.serial}\t; serial\n"
@@ -94,40 +236,46 @@ class SOARecord(AbstractRecord):
 
         return formatted_time
 
-@dataclass
+@dataclass(slots=True)
 class NSRecord(AbstractRecord):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class ARecord(AbstractRecord):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class AAAARecord(AbstractRecord):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class CNAMERecord(AbstractRecord):
     pass
 
-@dataclass
+@dataclass(slots=True)
+class GenericRecord(AbstractRecord):
+    """
+    A record of a type cleandns doesn't rewrite (MX, TXT, SRV, CAA, DNSSEC records...).
+    Its rdata is kept as the text it was read from and written back untouched, with the $ORIGIN
+    it was read under (None for the root) since the names in it may be relative.
+    """
+    origin: Optional[str] = field(default=None, repr=False)
+
+    def _exact_rdata(self) -> str:
+        # The same relative rdata under two origins names different targets
+        return str(self.rdata) if self.origin is None else f"{self.rdata}\t{self.origin}"
+
+    def _canonical_rdata(self) -> str:
+        # The rdata may be case-sensitive (e.g. TXT strings), only its whitespace is normalised
+        rdata = " ".join(str(self.rdata).split())
+        return rdata if self.origin is None else f"{rdata}\t{self.origin.lower()}"
+
+@dataclass(slots=True)
 class PTRRecord(AbstractRecord):
-    def __lt__(self, other: object) -> bool:
-        if not isinstance(other, PTRRecord):
-            return super().__lt__(other)
-        
-        def sort_key(name: str):
-            # Split into labels and convert to (type_priority, value)
-            # 0 for int (priority), 1 for string. This ensures 2 < 10 and 10 < "foo"
-            return [
-                (0, int(part)) if part.isdigit() else (1, part.lower())
-                for part in name.split('.')
-            ]
-        
-        self_key = sort_key(self.name)
-        other_key = sort_key(other.name)
-        
-        if self_key != other_key:
-            return self_key < other_key
-        
-        return str(self.rdata).lower() < str(other.rdata).lower()
+    def _name_key(self) -> Any:
+        # Split into labels and convert to (type_priority, value)
+        # 0 for int (priority), 1 for string. This ensures 2 < 10 and 10 < "foo"
+        return tuple(
+            (0, int(part)) if part.isdigit() else (1, part.lower())
+            for part in self.name.split('.')
+        )
@@ -0,0 +1,171 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from cleandns.backup import BackupPolicy
+from cleandns.dns_file import DNSFile
+from cleandns.logger import Logger
+from cleandns.record_types import DNSClass, PTRRecord, RecordType, SOARecord
+from cleandns.zone_writer import ZoneWriter
+
+# Reverse zones are delegated on octet boundaries (RFC 2317 classless delegation is not supported)
+REVERSE_PREFIX_LENGTHS = [8, 16, 24]
+REVERSE_DOMAIN = "in-addr.arpa"
+# Suffixes stripped from a zone file name to get the zone it holds, when its SOA doesn't say
+ZONE_FILE_SUFFIXES = (".zone", ".db")
+
+
+def forward_origin(zone: DNSFile) -> str:
+    """
+    Returns the name of a forward zone: the owner of its SOA, or the file name when the SOA
+    is written at "@" without an $ORIGIN (e.g. example.com.zone or db.example.com).
+    """
+    if zone.soa_record.name != ".":
+        return zone.soa_record.name.lower().rstrip(".")
+    name = zone.path.name
+    for suffix in ZONE_FILE_SUFFIXES:
+        name = name.removesuffix(suffix)
+    return name.removeprefix("db.").lower()
+
+
+def qualify(owner: str, origin: str) -> str:
+    # Owner names read under an $ORIGIN are stored absolute. The others are stored without the
+    # final dot: the ones not already under the origin are relative to it
+    if owner == ".":
+        return f"{origin}."
+    if owner.endswith("."):
+        return owner
+    lowered = owner.lower()
+    if lowered == origin or lowered.endswith(f".{origin}"):
+        return f"{owner}."
+    return f"{owner}.{origin}."
+
+
+def split_address(address: str) -> Optional[List[str]]:
+    # The octets of an IPv4 address in their shortest form, or None if it is not one
+    octets = address.split(".")
+    if len(octets) != 4 or not all(octet.isdigit() and int(octet) < 256 for octet in octets):
+        return None
+    return [str(int(octet)) for octet in octets]
+
+
+@dataclass(frozen=True)
+class ZoneTemplate:
+    """
+    The SOA, name servers and default TTL a new reverse zone is created with, taken from
+    the first forward zone that has addresses in it.
+    """
+    ttl: Optional[int]
+    soa_record: SOARecord
+    name_servers: Tuple[str, ...]
+
+    @classmethod
+    def from_zone(cls, zone: DNSFile) -> "ZoneTemplate":
+        name_servers = tuple(record.rdata for record in zone.records.get(RecordType.NS, ()))
+        return cls(zone.ttl, zone.soa_record, name_servers)
+
+    def render(self, zone_name: str) -> str:
+        # The serial starts at 0: saving the new zone increments it like any other change.
+        # The $ORIGIN puts the SOA and NS records at the apex of the reverse zone, not at the root
+        soa = self.soa_record
+        lines = [f"$TTL {self.ttl}"] if self.ttl is not None else []
+        lines.append(f"$ORIGIN {zone_name}.")
+        lines.append(f"@ {soa.ttl} IN SOA {soa.mname} {soa.rname} 0 {soa.refresh} {soa.retry} {soa.expire} {soa.minimum}")
+        lines.extend(f"@ IN NS {name_server}" for name_server in self.name_servers)
+        return "\n".join(lines) + "\n"
+
+
+class ReverseIndex:
+    """
+    The PTR records of every reverse zone, built from the A records of the forward zones.
+
+    Each forward zone is read once and its addresses are spread over the reverse zones of
+    their network (/8, /16 or /24), so that any number of reverse zones are regenerated
+    from a single pass over the forward data. PTR owners are relative to their reverse zone.
+    """
+
+    def __init__(self, prefix_length: int = 24):
+        if prefix_length not in REVERSE_PREFIX_LENGTHS:
+            raise ValueError(f"Unsupported prefix length: /{prefix_length}")
+        self.prefix_length = prefix_length
+        self.zones: Dict[str, List[PTRRecord]] = defaultdict(list)
+        self.templates: Dict[str, ZoneTemplate] = {}
+        self.skipped = 0
+
+    def reverse_zone(self, octets: List[str]) -> Tuple[str, str]:
+        """
+        Returns the reverse zone of an address and the owner of its PTR record in that zone.
+        """
+        network_labels = self.prefix_length // 8
+        network = ".".join(reversed(octets[:network_labels]))
+        return f"{network}.{REVERSE_DOMAIN}", ".".join(reversed(octets[network_labels:]))
+
+    def add_zone(self, zone: DNSFile) -> int:
+        """
+        Indexes the A records of a forward zone, included ones too. Returns the number of PTR records added.
+        """
+        origin = forward_origin(zone)
+        template = None
+        added = 0
+        included = (include.records for include in zone.includes)
+        for record in chain(zone.records.get(RecordType.A, ()), *included):
+            if record.type != RecordType.A or record.class_ != DNSClass.IN:
+                continue
+            octets = split_address(record.rdata)
+            if octets is None:
+                self.skipped += 1
+                continue
+            zone_name, owner = self.reverse_zone(octets)
+            self.zones[zone_name].append(PTRRecord(name=owner, ttl=record.ttl, class_=DNSClass.IN, type=RecordType.PTR,
+                                                   rdata=qualify(record.name, origin), comment=None))
+            if zone_name not in self.templates:
+                template = template or ZoneTemplate.from_zone(zone)
+                self.templates[zone_name] = template
+            added += 1
+        return added
+
+
+def ptr_key(record: PTRRecord, zone_name: str) -> Tuple[str, str]:
+    # PTR records compared regardless of case, final dots and whether their owner is written relative to the zone
+    owner = record.name.lower().rstrip(".").removesuffix(f".{zone_name}")
+    return owner, record.rdata.lower().rstrip(".")
+
+
+def reconcile_reverse_zone(path: Path, zone_name: str, records: List[PTRRecord], template: ZoneTemplate,
+                           prune: bool = False, logger: Optional[Logger] = None, backup_policy: Optional[BackupPolicy] = None,
+                           writer: Optional[ZoneWriter] = None) -> bool:
+    """
+    Brings the reverse zone at path in line with the PTR records generated for it, creating it from
+    the template if it doesn't exist. Existing PTR records missing from the forward zones are kept
+    unless prune is set. The zone is cleaned, and only rewritten if it changed: returns True if it was.
+    """
+    if path.exists():
+        zone = DNSFile(path, logger=logger, backup_policy=backup_policy, writer=writer)
+    else:
+        zone = DNSFile(path, logger=logger, backup_policy=backup_policy, writer=writer, content=template.render(zone_name))
+        zone.modified = True
+
+    generated = {}
+    for record in records:
+        generated.setdefault(ptr_key(record, zone_name), record)
+    existing = zone.records.get(RecordType.PTR, [])
+    kept = []
+    for record in existing:
+        key = ptr_key(record, zone_name)
+        if key in generated:
+            # The record already in the zone is kept as written (TTL, owner form)
+            generated[key] = None
+            kept.append(record)
+        elif not prune:
+            kept.append(record)
+    added = [record for record in generated.values() if record is not None]
+
+    if added or len(kept) < len(existing):
+        zone.records[RecordType.PTR] = kept + added
+        zone.modified = True
+        zone.logger.info("%s: %d PTR record(s) added, %d removed", path.name, len(added), len(existing) - len(kept))
+    zone.remove_duplicates()
+    zone.sort()
+    return zone.save()
@@ -0,0 +1,172 @@
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from cleandns.backup import is_backup
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+INOTIFY_EVENT = struct.Struct("iIII")
+INOTIFY_READ_SIZE = 64 * 1024
+# Editor swap and backup files, and the temporary files cleandns writes itself
+IGNORED_SUFFIXES = (".tmp", ".swp", ".swx", "~")
+
+
+def is_ignored(path: Path) -> bool:
+    """
+    Returns True for the files that are never zones: hidden files, temporary files and backups.
+    """
+    name = path.name
+    return name.startswith(".") or name.endswith(IGNORED_SUFFIXES) or is_backup(path)
+
+
+class InotifySource:
+    """
+    Reports the files of a directory that were written (closed after writing) or moved in, through inotify.
+    """
+
+    def __init__(self, directory: Path):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"Cannot watch {directory}")
+        self.directory = directory
+
+    def read(self, timeout: Optional[float]) -> Optional[Set[str]]:
+        """
+        Waits up to timeout seconds (forever if None) for events and returns the names of the files involved.
+        Returns None when the kernel queue overflowed and events were lost.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        names = set()
+        data = os.read(self.fd, INOTIFY_READ_SIZE)
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if length:
+                names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    """
+    Reports the files of a directory whose size, mtime or inode changed, by scanning it every interval.
+    """
+
+    def __init__(self, directory: Path, interval: float = 1.0):
+        self.directory = directory
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int, int]]:
+        snapshot = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+                except OSError:
+                    continue
+        return snapshot
+
+    def read(self, timeout: Optional[float]) -> Optional[Set[str]]:
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {name for name, state in snapshot.items() if self.snapshot.get(name) != state}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class DirectoryWatcher:
+    """
+    Waits for the zone files of a directory to change, one burst of writes at a time.
+
+    Events are gathered until the directory has been quiet for `debounce` seconds, so a file
+    written in several steps (or many files copied at once) is reported only once.
+    Uses inotify where available and falls back to polling the directory otherwise.
+    """
+    directory: Path
+    pattern: str
+    debounce: float
+
+    def __init__(self, directory: Path, pattern: str = "*", debounce: float = 0.01,
+                 poll_interval: float = 1.0, polling: bool = False):
+        self.directory = directory
+        self.pattern = pattern
+        self.debounce = debounce
+        self.source = None
+        if not polling:
+            try:
+                self.source = InotifySource(directory)
+            except (OSError, AttributeError):
+                # Not on Linux, or out of inotify watches
+                self.source = None
+        if self.source is None:
+            self.source = PollingSource(directory, poll_interval)
+
+    @property
+    def polling(self) -> bool:
+        return isinstance(self.source, PollingSource)
+
+    def is_zone(self, path: Path) -> bool:
+        return not is_ignored(path) and fnmatch.fnmatch(path.name, self.pattern)
+
+    def zones(self) -> List[Path]:
+        """
+        Returns every zone file currently in the directory.
+        """
+        return sorted(path for path in self.directory.iterdir() if path.is_file() and self.is_zone(path))
+
+    def wait(self, timeout: Optional[float] = None) -> List[Path]:
+        """
+        Blocks until zone files change (or timeout seconds pass) and returns them once the burst is over.
+        """
+        changed = self._read(timeout)
+        if changed is not None and not changed:
+            return []
+        while changed is not None:
+            more = self._read(self.debounce)
+            if more is None:
+                changed = None
+            elif not more:
+                break
+            else:
+                changed |= more
+        if changed is None:
+            # Events were lost: consider every zone changed, the caller skips the clean ones
+            return self.zones()
+        return sorted(path for path in changed if path.is_file())
+
+    def _read(self, timeout: Optional[float]) -> Optional[Set[Path]]:
+        names = self.source.read(timeout)
+        if names is None:
+            return None
+        return {self.directory / name for name in names if self.is_zone(self.directory / name)}
+
+    def close(self):
+        self.source.close()
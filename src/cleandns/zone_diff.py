@@ -0,0 +1,90 @@
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Optional, Tuple
+
+from cleandns.record_types import AbstractRecord, SOARecord
+
+
+def merge_key(record: AbstractRecord) -> Tuple[Any, ...]:
+    """
+    A total order over the records of one type that is consistent with the diff equality:
+    two records have the same key exactly when they have the same owner, class, rdata and TTL
+    as written, so that a change of case in an owner shows in the diff.
+    """
+    return record.sort_key, record.name, record.class_.value, str(record.rdata), record.ttl
+
+
+def soa_line(soa_record: SOARecord) -> str:
+    # The SOA on a single line, without the serial which is reported separately
+    return (f"{soa_record.name}\t{soa_record.ttl}\t{soa_record.class_.value}\tSOA\t{soa_record.mname} {soa_record.rname} "
+            f"{soa_record.refresh} {soa_record.retry} {soa_record.expire} {soa_record.minimum}")
+
+
+@dataclass
+class ZoneDiff:
+    """
+    The differences between two zones: the records only in the new zone (added),
+    the records only in the old zone (removed) and the serial change.
+    """
+    added: List[AbstractRecord] = field(default_factory=list)
+    removed: List[AbstractRecord] = field(default_factory=list)
+    old_serial: Optional[int] = None
+    new_serial: Optional[int] = None
+    soa_changed: bool = False
+
+    @property
+    def serial_changed(self) -> bool:
+        return self.old_serial != self.new_serial
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.serial_changed or self.soa_changed)
+
+    def lines(self) -> Iterable[str]:
+        if self.serial_changed:
+            yield f"serial: {self.old_serial} -> {self.new_serial}"
+        for record in self.removed:
+            yield f"- {soa_line(record) if isinstance(record, SOARecord) else record}"
+        for record in self.added:
+            yield f"+ {soa_line(record) if isinstance(record, SOARecord) else record}"
+
+
+def merge_join(old_records: List[AbstractRecord], new_records: List[AbstractRecord], diff: ZoneDiff):
+    """
+    Walks both record lists in merge order, adding the unmatched records to the diff.
+
+    Cleaned zones are already sorted, so ordering them by merge key is linear (Timsort only
+    has to confirm the runs), and the join itself is a single linear pass.
+    """
+    old_sorted = sorted(old_records, key=merge_key)
+    new_sorted = sorted(new_records, key=merge_key)
+    i = j = 0
+    while i < len(old_sorted) and j < len(new_sorted):
+        old_key = merge_key(old_sorted[i])
+        new_key = merge_key(new_sorted[j])
+        if old_key == new_key:
+            i += 1
+            j += 1
+        elif old_key < new_key:
+            diff.removed.append(old_sorted[i])
+            i += 1
+        else:
+            diff.added.append(new_sorted[j])
+            j += 1
+    diff.removed.extend(old_sorted[i:])
+    diff.added.extend(new_sorted[j:])
+
+
+def diff_zones(old_soa: Optional[SOARecord], old_records: dict, new_soa: Optional[SOARecord], new_records: dict) -> ZoneDiff:
+    """
+    Diffs two zones given as their SOA record and their records grouped by type.
+    """
+    diff = ZoneDiff(old_serial=old_soa.serial if old_soa else None,
+                    new_serial=new_soa.serial if new_soa else None)
+
+    if old_soa is not None and new_soa is not None and soa_line(old_soa) != soa_line(new_soa):
+        diff.soa_changed = True
+        diff.removed.append(old_soa)
+        diff.added.append(new_soa)
+
+    for r_type in sorted(set(old_records) | set(new_records), key=lambda t: t.value):
+        merge_join(old_records.get(r_type, []), new_records.get(r_type, []), diff)
+    return diff
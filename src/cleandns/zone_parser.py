@@ -0,0 +1,450 @@
+import codecs
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cleandns.exceptions import ZoneSyntaxError
+from cleandns.record_types import ARecord, AAAARecord, NSRecord, CNAMERecord, SOARecord, PTRRecord, GenericRecord, RecordType, DNSClass, AbstractRecord
+from cleandns.zone_writer import ZONE_FILE_ENCODING
+
+# Mapping for standard records that share the same constructor signature
+RECORD_TYPES = {
+    "A": (ARecord, RecordType.A),
+    "AAAA": (AAAARecord, RecordType.AAAA),
+    "NS": (NSRecord, RecordType.NS),
+    "CNAME": (CNAMERecord, RecordType.CNAME),
+    "PTR": (PTRRecord, RecordType.PTR),
+}
+
+# Records whose rdata is an address, kept as written; the others hold a domain name
+ADDRESS_TYPES = {RecordType.A, RecordType.AAAA}
+
+# The class mnemonics DNSClass models, and the other ones a record line may carry, which are rejected
+CLASS_NAMES = {dns_class.value for dns_class in DNSClass}
+UNSUPPORTED_CLASS_NAMES = {"HS", "NONE", "ANY"}
+
+TTL_UNITS = {"w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1}
+MAX_TTL = 2 ** 32 - 1
+# What identifies a version of an included file: its size, mtime and inode
+Fingerprint = Tuple[int, int, int]
+# Bytes decoded at once when parsing an in-memory buffer
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+def parse_ttl(text: str) -> int:
+    """
+    Parses a TTL in BIND format ("3600", "1h", "1w2d") and returns it in seconds.
+    Raises ValueError if the text is not a valid TTL.
+    """
+    if text.isdigit():
+        total = int(text)
+    else:
+        if not text or not text[0].isdigit():
+            raise ValueError(f"Invalid TTL: {text}")
+        total = 0
+        current = 0
+        for char in text.lower():
+            if char.isdigit():
+                current = current * 10 + int(char)
+            elif char in TTL_UNITS:
+                total += current * TTL_UNITS[char]
+                current = 0
+            else:
+                raise ValueError(f"Invalid TTL: {text}")
+        if not text[-1].isalpha():
+            raise ValueError(f"Invalid TTL: {text}")
+    if total > MAX_TTL:
+        raise ValueError(f"Invalid TTL: {text}")
+    return total
+
+
+def iter_lines(buffer, encoding: str = ZONE_FILE_ENCODING) -> Iterator[str]:
+    """
+    Yields the lines (without their newline) of a zone held in any bytes-like object: bytes, a memoryview
+    or an mmap of the file. The buffer is decoded one chunk at a time through zero-copy slices,
+    so only a chunk and the current line exist as text, never the whole zone.
+    """
+    view = memoryview(buffer)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ""
+    for start in range(0, view.nbytes, DECODE_CHUNK_SIZE):
+        lines = (pending + decoder.decode(view[start:start + DECODE_CHUNK_SIZE])).split("\n")
+        pending = lines.pop()
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def split_line(line: str) -> List[str]:
+    """
+    Splits a zone file line into tokens, dropping comments.
+    Quoted strings are kept as a single token (quotes included), and the grouping
+    parentheses outside of them are tokens of their own.
+    """
+    if '"' not in line and '\\' not in line:
+        # Fast path: nothing can hide a ';' or a parenthesis from us
+        line = line.split(';', 1)[0]
+        if '(' in line or ')' in line:
+            line = line.replace('(', ' ( ').replace(')', ' ) ')
+        return line.split()
+
+    tokens = []
+    current = []
+    in_quotes = False
+    escaped = False
+    for char in line:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == '\\':
+            current.append(char)
+            escaped = True
+        elif char == '"':
+            current.append(char)
+            in_quotes = not in_quotes
+        elif in_quotes:
+            current.append(char)
+        elif char == ';':
+            break
+        elif char.isspace() or char in "()":
+            if current:
+                tokens.append("".join(current))
+                current = []
+            if not char.isspace():
+                tokens.append(char)
+        else:
+            current.append(char)
+    if current:
+        tokens.append("".join(current))
+    return tokens
+
+
+class ZoneParser:
+    """
+    A single-pass parser for BIND zone files.
+
+    Lines are streamed one at a time and every supported record is yielded as soon as
+    it is complete, so the whole file never has to be held in memory. Record types
+    cleandns does not rewrite are passed through as GenericRecords: their rdata tokens are
+    kept as read (comments and grouping parentheses aside), without being parsed.
+    """
+    source_name: str
+    ttl: Optional[int]
+    includes: List["Include"]
+
+    # $INCLUDE directives are resolved relative to directory (the current directory when None), and the
+    # included files are parsed through include_cache. Included files start from the origin and default TTL given.
+    def __init__(self, source_name: str, directory: Optional[Path] = None, origin: str = ".", default_ttl: Optional[int] = None,
+                 include_cache: Optional["IncludeCache"] = None, include_stack: Tuple[Path, ...] = ()):
+        self.source_name = source_name
+        self.directory = directory
+        self.include_cache = include_cache or SHARED_INCLUDE_CACHE
+        self.include_stack = include_stack
+        # The $INCLUDE directives of the file, in order: their records are not yielded with the file's own
+        self.includes = []
+        # The fingerprint of every file included, directly or not: the file depends on all of them
+        self.dependencies: Dict[Path, Fingerprint] = {}
+        # The first $TTL directive of the file, the one written back on save
+        self.ttl = None
+        self._origin = origin
+        self._default_ttl = default_ttl
+        self._last_ttl = None
+        self._last_name = None
+        # Records of the same owner share one name object, and every distinct TTL is stored once
+        self._last_owner = (None, None)
+        self._ttls: Dict[int, int] = {}
+
+    def parse(self, lines: Iterable[str]) -> Iterator[AbstractRecord]:
+        tokens = []
+        depth = 0
+        leading_whitespace = False
+        line_number = 0
+        start_line = 0
+
+        for line_number, line in enumerate(lines, 1):
+            line_tokens = split_line(line)
+            if depth == 0:
+                if not line_tokens:
+                    continue
+                leading_whitespace = line[:1].isspace()
+                start_line = line_number
+
+            for token in line_tokens:
+                # Parentheses only group lines together (split_line keeps the quoted ones inside their string)
+                if token == '(':
+                    depth += 1
+                elif token == ')':
+                    depth -= 1
+                    if depth < 0:
+                        raise ZoneSyntaxError(f"Unbalanced parentheses in {self.source_name}, line {line_number}")
+                else:
+                    tokens.append(token)
+
+            if depth > 0:
+                continue
+
+            if tokens:
+                record = self._parse_entry(tokens, leading_whitespace, start_line)
+                if record is not None:
+                    yield record
+            tokens = []
+
+        if depth > 0:
+            raise ZoneSyntaxError(f"Unbalanced parentheses in {self.source_name}, line {start_line}")
+
+    def _parse_entry(self, tokens: List[str], leading_whitespace: bool, line_number: int) -> Optional[AbstractRecord]:
+        if not leading_whitespace and tokens[0].startswith('$'):
+            self._parse_directive(tokens, line_number)
+            return None
+
+        # Owner name (a line starting with a blank reuses the previous one)
+        if leading_whitespace:
+            if self._last_name is None:
+                raise ZoneSyntaxError(f"The last used name is undefined in {self.source_name}, line {line_number}")
+            index = 0
+        else:
+            self._last_name = self._absolute_name(tokens[0])
+            index = 1
+        name = self._last_name
+
+        # TTL and class, in either order
+        ttl = None
+        class_name = None
+        for _ in range(2):
+            if index >= len(tokens):
+                break
+            token = tokens[index]
+            if ttl is None and token[:1].isdigit():
+                try:
+                    ttl = parse_ttl(token)
+                except ValueError:
+                    raise ZoneSyntaxError(f"Invalid TTL in {self.source_name}, line {line_number}: {token}")
+                self._last_ttl = ttl
+            elif class_name is None and token.upper() in CLASS_NAMES:
+                class_name = token.upper()
+            elif class_name is None and token.upper() in UNSUPPORTED_CLASS_NAMES:
+                raise ZoneSyntaxError(f"Unsupported class {token} in {self.source_name}, line {line_number}")
+            else:
+                break
+            index += 1
+
+        if index >= len(tokens):
+            raise ZoneSyntaxError(f"Missing record type in {self.source_name}, line {line_number}")
+        rtype = tokens[index].upper()
+        rdata = tokens[index + 1:]
+
+        if rtype == "SOA":
+            return self._build_soa(name, ttl, class_name, rdata, line_number)
+
+        if ttl is None:
+            ttl = self._implicit_ttl(line_number)
+
+        if rtype not in RECORD_TYPES:
+            return self._build_generic(name, ttl, class_name, rtype, rdata, line_number)
+
+        if len(rdata) != 1:
+            raise ZoneSyntaxError(f"Invalid {rtype} record in {self.source_name}, line {line_number}")
+
+        record_cls, enum_type = RECORD_TYPES[rtype]
+        value = rdata[0] if enum_type in ADDRESS_TYPES else self._absolute_name(rdata[0])
+        return record_cls(
+            name=self._owner_text(name),
+            ttl=self._ttls.setdefault(ttl, ttl),
+            class_=DNSClass(class_name or "IN"),
+            type=enum_type,
+            rdata=value,
+            comment=None
+        )
+
+    def _build_generic(self, name: str, ttl: int, class_name: Optional[str], rtype: str, rdata: List[str], line_number: int) -> GenericRecord:
+        try:
+            enum_type = RecordType(rtype)
+        except ValueError:
+            raise ZoneSyntaxError(f"Unknown record type {rtype} in {self.source_name}, line {line_number}")
+        if not rdata:
+            raise ZoneSyntaxError(f"Missing rdata for {rtype} record in {self.source_name}, line {line_number}")
+        return GenericRecord(
+            name=self._owner_text(name),
+            ttl=self._ttls.setdefault(ttl, ttl),
+            class_=DNSClass(class_name or "IN"),
+            type=enum_type,
+            rdata=rdata[0] if len(rdata) == 1 else " ".join(rdata),
+            comment=None,
+            # The rdata isn't parsed, so the names in it may be relative: the origin is written back with it
+            origin=None if self._origin == "." else self._origin
+        )
+
+    def _build_soa(self, name: str, ttl: Optional[int], class_name: Optional[str], rdata: List[str], line_number: int) -> SOARecord:
+        if len(rdata) != 7:
+            raise ZoneSyntaxError(f"Invalid SOA record in {self.source_name}, line {line_number}")
+        mname = self._absolute_name(rdata[0])
+        rname = self._absolute_name(rdata[1])
+        try:
+            serial = int(rdata[2])
+            refresh, retry, expire, minimum = (parse_ttl(value) for value in rdata[3:])
+        except ValueError:
+            raise ZoneSyntaxError(f"Invalid SOA record in {self.source_name}, line {line_number}")
+
+        # Without a $TTL, the SOA minimum becomes the zone default (pre-RFC 2308 behaviour)
+        if self._default_ttl is None:
+            self._default_ttl = minimum
+        if ttl is None:
+            ttl = self._implicit_ttl(line_number)
+
+        return SOARecord(name=self._owner_text(name),
+                         ttl=ttl,
+                         class_=DNSClass(class_name or "IN"),
+                         type=RecordType.SOA,
+                         rdata=f"{mname} {rname} {serial} {refresh} {retry} {expire} {minimum}",
+                         comment=None,
+                         mname=mname,
+                         rname=rname,
+                         serial=serial,
+                         refresh=refresh,
+                         retry=retry,
+                         expire=expire,
+                         minimum=minimum)
+
+    def _parse_directive(self, tokens: List[str], line_number: int):
+        directive = tokens[0].upper()
+        if directive == "$TTL":
+            if len(tokens) < 2:
+                raise ZoneSyntaxError(f"Missing value for $TTL in {self.source_name}, line {line_number}")
+            try:
+                ttl = parse_ttl(tokens[1])
+            except ValueError:
+                raise ValueError(f"Invalid TTL format in {self.source_name}: {tokens[1]}")
+            if self.ttl is None:
+                self.ttl = ttl
+            self._default_ttl = ttl
+        elif directive == "$ORIGIN":
+            if len(tokens) < 2:
+                raise ZoneSyntaxError(f"Missing value for $ORIGIN in {self.source_name}, line {line_number}")
+            self._origin = self._absolute_name(tokens[1])
+            self._last_owner = (None, None)
+        elif directive == "$INCLUDE":
+            self._parse_include(tokens, line_number)
+        else:
+            raise ZoneSyntaxError(f"Unsupported directive {tokens[0]} in {self.source_name}, line {line_number}")
+
+    def _parse_include(self, tokens: List[str], line_number: int):
+        # $INCLUDE <file> [<origin>]: the origin only applies to the included file
+        if len(tokens) < 2:
+            raise ZoneSyntaxError(f"Missing file name for $INCLUDE in {self.source_name}, line {line_number}")
+        origin = self._absolute_name(tokens[2]) if len(tokens) > 2 else self._origin
+        file_name = tokens[1].strip('"')
+        path = self.directory / file_name if self.directory is not None else Path(file_name)
+        try:
+            fingerprints, records = self.include_cache.entry(path, origin, self._default_ttl, self.include_stack)
+        except OSError as e:
+            raise ZoneSyntaxError(f"Cannot include {file_name} in {self.source_name}, line {line_number}: {e.strerror}")
+        self.dependencies.update(fingerprints)
+        self.includes.append(Include(tokens[1], None if origin == "." else origin, records))
+
+    def _implicit_ttl(self, line_number: int) -> int:
+        if self._default_ttl is not None:
+            return self._default_ttl
+        if self._last_ttl is not None:
+            return self._last_ttl
+        raise ZoneSyntaxError(f"Missing default TTL value in {self.source_name}, line {line_number}")
+
+    def _absolute_name(self, name: str) -> str:
+        """
+        Returns the fully qualified form of a name (with the final dot) relative to the current origin.
+        """
+        if name == "@":
+            return self._origin
+        if name.endswith('.') and not name.endswith('\\.'):
+            return name
+        if self._origin == ".":
+            return f"{name}."
+        return f"{name}.{self._origin}"
+
+    def _owner_text(self, name: str) -> str:
+        # Owner names read relative to the root (no $ORIGIN) are stored without the final dot, like
+        # dnspython writes them. Under an $ORIGIN the dot is kept: the cleaned zone has no $ORIGIN for
+        # owners, so they must stay absolute to keep their meaning whatever origin the zone is loaded with
+        last_name, owner = self._last_owner
+        if name is not last_name:
+            owner = name if name == "." or self._origin != "." else name[:-1]
+            self._last_owner = (name, owner)
+        return owner
+
+
+@dataclass(frozen=True)
+class Include:
+    """
+    An $INCLUDE directive: the file as written, the origin it is read with (None for the root)
+    and the records it provides. The included file is never rewritten.
+    """
+    path: str
+    origin: Optional[str]
+    records: Tuple[AbstractRecord, ...]
+
+    def __str__(self) -> str:
+        # The origin is always written out, since the cleaned zone has no $ORIGIN directives
+        return f"$INCLUDE\t{self.path}\t{self.origin}" if self.origin else f"$INCLUDE\t{self.path}"
+
+
+def fingerprint(path: Path) -> Fingerprint:
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class IncludeCache:
+    """
+    The included files parsed so far, shared by every zone processed in the same process.
+
+    A fragment included by many zones is parsed once for each origin and default TTL it is read with,
+    and parsed again only when the size, mtime or inode of the fragment, or of any file it includes
+    (directly or not), change. The cached records are shared between the zones, which never modify them.
+    """
+
+    def __init__(self):
+        self.entries: Dict[Tuple[Path, str, Optional[int]], Tuple[Dict[Path, Fingerprint], Tuple[AbstractRecord, ...]]] = {}
+
+    def records(self, path: Path, origin: str, default_ttl: Optional[int],
+                include_stack: Tuple[Path, ...] = ()) -> Tuple[AbstractRecord, ...]:
+        """
+        Returns the records of the included file, nested includes included.
+        Raises OSError if the file can't be read and ZoneSyntaxError if it is invalid.
+        """
+        return self.entry(path, origin, default_ttl, include_stack)[1]
+
+    def entry(self, path: Path, origin: str, default_ttl: Optional[int],
+              include_stack: Tuple[Path, ...] = ()) -> Tuple[Dict[Path, Fingerprint], Tuple[AbstractRecord, ...]]:
+        """
+        Returns the fingerprints of the included file and of every file it includes, and its records.
+        """
+        path = path.resolve()
+        if path in include_stack:
+            raise ZoneSyntaxError(f"Recursive $INCLUDE of {path.name}")
+        key = (path, origin, default_ttl)
+        cached = self.entries.get(key)
+        if cached is not None and self._unchanged(cached[0]):
+            return cached
+
+        fingerprints = {path: fingerprint(path)}
+        parser = ZoneParser(path.name, directory=path.parent, origin=origin, default_ttl=default_ttl,
+                            include_cache=self, include_stack=include_stack + (path,))
+        with open(path, "r") as file:
+            records = list(parser.parse(file))
+        if any(record.type == RecordType.SOA for record in records):
+            raise ZoneSyntaxError(f"The included file {path.name} can't hold an SOA record")
+        for include in parser.includes:
+            records.extend(include.records)
+        fingerprints.update(parser.dependencies)
+        self.entries[key] = (fingerprints, tuple(records))
+        return self.entries[key]
+
+    @staticmethod
+    def _unchanged(fingerprints: Dict[Path, Fingerprint]) -> bool:
+        try:
+            return all(fingerprint(path) == expected for path, expected in fingerprints.items())
+        except OSError:
+            # A nested file is gone: parsing the entry again reports it
+            return False
+
+
+SHARED_INCLUDE_CACHE = IncludeCache()
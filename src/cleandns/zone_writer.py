@@ -0,0 +1,68 @@
+import os
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+DURABILITY_MODES = ["none", "file", "full"]
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+# Lines rendered and encoded together before being handed to the file
+DEFAULT_CHUNK_LINES = 4096
+ZONE_FILE_ENCODING = "utf-8"
+
+
+class ZoneWriter:
+    """
+    Writes rendered zone lines in large encoded chunks through a big binary buffer.
+
+    Durability modes:
+    - none: rely on the OS to flush the data eventually.
+    - file: fsync the new file before it replaces the old one, so a crash can't leave an empty zone.
+    - full: also fsync the directory after the replace, so the rename itself survives a crash.
+    """
+    buffer_size: int
+    durability: str
+    chunk_lines: int
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE, durability: str = "file", chunk_lines: int = DEFAULT_CHUNK_LINES):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.buffer_size = buffer_size
+        self.durability = durability
+        self.chunk_lines = chunk_lines
+
+    def open(self, path: Path, exclusive: bool = False) -> BinaryIO:
+        return open(path, "xb" if exclusive else "wb", buffering=self.buffer_size)
+
+    def _chunks(self, lines: Iterable[str]) -> Iterator[bytes]:
+        lines = iter(lines)
+        while True:
+            chunk = "".join(islice(lines, self.chunk_lines))
+            if not chunk:
+                return
+            yield chunk.encode(ZONE_FILE_ENCODING)
+
+    def write(self, file: BinaryIO, lines: Iterable[str]) -> int:
+        """
+        Writes the lines (newlines included) and returns the number of bytes written.
+        The file is flushed, and synced to disk unless durability is "none".
+        """
+        bytes_written = 0
+        for chunk in self._chunks(lines):
+            file.write(chunk)
+            bytes_written += len(chunk)
+        file.flush()
+        if self.durability != "none":
+            os.fsync(file.fileno())
+        return bytes_written
+
+    def sync_directory(self, path: Path):
+        """
+        Makes a rename inside the directory of path durable (full mode only, where the OS supports it).
+        """
+        if self.durability != "full" or os.name == "nt":
+            return
+        directory = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
@@ -1,5 +1,6 @@
+import argparse
 import pytest
-from cleandns.argument_parser import ArgumentParser
+from cleandns.argument_parser import ArgumentParser, parse_size
 
 def test_parse_arguments_files_short_flag():
     """Test parsing files using the short flag -f."""
@@ -35,3 +36,147 @@ def test_unknown_arguments():
     
     with pytest.raises(SystemExit):
         parser.parse_arguments(["--unknown-flag"])
+
+def test_strict_flag():
+    """Test that --strict is off by default and can be enabled."""
+    parser = ArgumentParser()
+
+    assert parser.parse_arguments(["-f", "file1.dns"]).strict is False
+    assert parser.parse_arguments(["-f", "file1.dns", "--strict"]).strict is True
+
+def test_jobs_flag():
+    """Test that --jobs defaults to sequential processing."""
+    parser = ArgumentParser()
+
+    assert parser.parse_arguments(["-f", "file1.dns"]).jobs == 1
+    assert parser.parse_arguments(["-f", "file1.dns", "-j", "4"]).jobs == 4
+
+def test_cache_flags():
+    """Test that the fingerprint cache is enabled by default and can be disabled or relocated."""
+    parser = ArgumentParser()
+    args = parser.parse_arguments(["-f", "file1.dns"])
+    assert args.no_cache is False
+    assert args.cache_file is None
+
+    args = parser.parse_arguments(["-f", "file1.dns", "--no-cache", "--cache-file", "index.json"])
+    assert args.no_cache is True
+    assert args.cache_file == "index.json"
+
+def test_canonical_duplicates_flag():
+    """Test that canonical duplicate detection is opt-in."""
+    parser = ArgumentParser()
+
+    assert parser.parse_arguments(["-f", "file1.dns"]).canonical_duplicates is False
+    assert parser.parse_arguments(["-f", "file1.dns", "--canonical-duplicates"]).canonical_duplicates is True
+
+def test_metrics_flags():
+    """Test that metrics are off by default."""
+    parser = ArgumentParser()
+    args = parser.parse_arguments(["-f", "file1.dns"])
+    assert args.profile is False
+    assert args.metrics_json is None
+
+    args = parser.parse_arguments(["-f", "file1.dns", "--profile", "--metrics-json", "-"])
+    assert args.profile is True
+    assert args.metrics_json == "-"
+
+def test_diff_command():
+    """Test that the diff command takes the old and the new zone."""
+    parser = ArgumentParser()
+    args = parser.parse_arguments(["diff", "old.zone", "new.zone"])
+
+    assert args.command == "diff"
+    assert (args.old, args.new) == ("old.zone", "new.zone")
+    assert parser.parse_arguments(["-f", "file1.dns"]).command is None
+
+def test_backup_flags():
+    """Test that backups default to hardlinks next to the file and accept a retention policy."""
+    parser = ArgumentParser()
+    args = parser.parse_arguments(["-f", "file1.dns"])
+    assert args.backup_mode == "hardlink"
+    assert (args.backup_dir, args.compress_backups, args.keep_backups, args.backup_max_age) == (None, False, None, None)
+
+    args = parser.parse_arguments(["-f", "file1.dns", "--backup-mode", "copy", "--backup-dir", "bak",
+                                   "--compress-backups", "--keep-backups", "5", "--backup-max-age", "1w"])
+    assert (args.backup_mode, args.backup_dir, args.compress_backups, args.keep_backups, args.backup_max_age) == ("copy", "bak", True, 5, 604800)
+
+def test_invalid_backup_max_age():
+    """Test that an invalid age is rejected by the parser."""
+    parser = ArgumentParser()
+
+    with pytest.raises(SystemExit):
+        parser.parse_arguments(["-f", "file1.dns", "--backup-max-age", "soon"])
+
+def test_check_flags():
+    """Test that check mode and full reporting are opt-in."""
+    parser = ArgumentParser()
+    args = parser.parse_arguments(["-f", "file1.dns"])
+    assert (args.check, args.report_all) == (False, False)
+
+    args = parser.parse_arguments(["-f", "file1.dns", "--check", "--report-all"])
+    assert (args.check, args.report_all) == (True, True)
+
+def test_write_flags():
+    """Test that files are fsynced with a 1 MiB buffer by default."""
+    parser = ArgumentParser()
+    args = parser.parse_arguments(["-f", "file1.dns"])
+    assert (args.durability, args.write_buffer_size) == ("file", 1024 * 1024)
+
+    args = parser.parse_arguments(["-f", "file1.dns", "--durability", "full", "--write-buffer-size", "64K"])
+    assert (args.durability, args.write_buffer_size) == ("full", 65536)
+
+@pytest.mark.parametrize("text, expected", [("4096", 4096), ("64k", 65536), ("512M", 512 * 2 ** 20), ("1GB", 2 ** 30)])
+def test_parse_size(text, expected):
+    assert parse_size(text) == expected
+
+@pytest.mark.parametrize("text", ["", "0", "M", "1.5M", "10T"])
+def test_parse_size_rejects_invalid_sizes(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_size(text)
+
+def test_watch_command():
+    """Test that the watch command uses inotify with a short debounce by default."""
+    parser = ArgumentParser()
+    args = parser.parse_arguments(["watch", "zones"])
+    assert (args.command, args.directory, args.pattern, args.debounce, args.polling) == ("watch", "zones", "*", 0.01, False)
+
+    args = parser.parse_arguments(["--durability", "none", "watch", "zones", "--pattern", "*.zone", "--polling"])
+    assert (args.durability, args.pattern, args.polling) == ("none", "*.zone", True)
+
+def test_reverse_command():
+    """Test that the reverse command builds /24 zones in the current directory without pruning by default."""
+    parser = ArgumentParser()
+    args = parser.parse_arguments(["reverse", "a.zone", "b.zone"])
+    assert (args.command, args.forward, args.output_dir, args.prefix_length, args.prune) == ("reverse", ["a.zone", "b.zone"], ".", 24, False)
+
+    args = parser.parse_arguments(["reverse", "a.zone", "-o", "reverse", "--prefix-length", "16", "--prune"])
+    assert (args.output_dir, args.prefix_length, args.prune) == ("reverse", 16, True)
+
+    with pytest.raises(SystemExit):
+        parser.parse_arguments(["reverse", "a.zone", "--prefix-length", "25"])
+
+def test_cross_zone_flags():
+    parser = ArgumentParser()
+    args = parser.parse_arguments(["-f", "file1.dns"])
+    assert (args.cross_zone_checks, args.max_cname_hops) == (False, 3)
+
+    args = parser.parse_arguments(["-f", "file1.dns", "--cross-zone-checks", "--max-cname-hops", "1"])
+    assert (args.cross_zone_checks, args.max_cname_hops) == (True, 1)
+
+def test_async_io_flags():
+    """Test that the asyncio pipeline is opt-in and bounded by default."""
+    parser = ArgumentParser()
+    args = parser.parse_arguments(["-f", "file1.dns"])
+    assert (args.async_io, args.io_workers, args.max_in_flight) == (False, 8, 16)
+
+    args = parser.parse_arguments(["-f", "file1.dns", "--async-io", "--io-workers", "2", "--max-in-flight", "4"])
+    assert (args.async_io, args.io_workers, args.max_in_flight) == (True, 2, 4)
+
+def test_max_memory_flags():
+    """Test that the bounded-memory mode is off by default and takes a size."""
+    parser = ArgumentParser()
+    args = parser.parse_arguments(["-f", "file1.dns"])
+    assert (args.max_memory, args.spill_dir) == (None, None)
+
+    args = parser.parse_arguments(["-f", "file1.dns", "--max-memory", "512M", "--spill-dir", "/var/tmp"])
+    assert (args.max_memory, args.spill_dir) == (512 * 2 ** 20, "/var/tmp")
@@ -0,0 +1,81 @@
+import gzip
+import os
+from datetime import datetime, timedelta
+import pytest
+from cleandns.backup import BackupPolicy, backup_timestamp
+from tests.conftest import ZONE_FILE_ENCODING
+
+@pytest.fixture
+def zone_file(tmp_path, forward_sample_zone_content):
+    p = tmp_path / "example.com.zone"
+    p.write_text(forward_sample_zone_content, encoding=ZONE_FILE_ENCODING)
+    return p
+
+def test_hardlink_backup_keeps_original_after_replace(zone_file, forward_sample_zone_content):
+    """Test that a hardlink backup shares the inode and survives the atomic replace."""
+    backup = BackupPolicy().create(zone_file)
+
+    assert backup.stat().st_ino == zone_file.stat().st_ino
+    tmp = zone_file.with_name("new.tmp")
+    tmp.write_text("new content", encoding=ZONE_FILE_ENCODING)
+    os.replace(tmp, zone_file)
+    assert backup.read_text(encoding=ZONE_FILE_ENCODING) == forward_sample_zone_content
+
+@pytest.mark.parametrize("mode", ["copy", "reflink"])
+def test_copy_backups(zone_file, forward_sample_zone_content, mode):
+    """Test that copies (and reflinks, or their fallback) hold the original content in a new inode."""
+    backup = BackupPolicy(mode=mode).create(zone_file)
+
+    assert backup.stat().st_ino != zone_file.stat().st_ino
+    assert backup.read_text(encoding=ZONE_FILE_ENCODING) == forward_sample_zone_content
+
+def test_no_backup(zone_file):
+    """Test that backups can be disabled."""
+    assert BackupPolicy(mode="none").create(zone_file) is None
+    assert list(zone_file.parent.iterdir()) == [zone_file]
+
+def test_compressed_backup_in_directory(tmp_path, zone_file, forward_sample_zone_content):
+    """Test that compressed backups go to the configured directory."""
+    policy = BackupPolicy(directory=tmp_path / "backups", compress=True)
+
+    backup = policy.create(zone_file, timestamp=datetime(2024, 1, 2, 3, 4, 5))
+
+    assert backup.parent.parent == tmp_path / "backups"
+    assert backup.name == "example.com.zone.2024-01-02_03-04-05.gz"
+    assert gzip.decompress(backup.read_bytes()).decode(ZONE_FILE_ENCODING) == forward_sample_zone_content
+    assert policy.backups(zone_file) == [backup]
+
+def test_prune_keep_last_and_max_age(zone_file):
+    """Test that retention keeps the newest backups and drops the ones too old."""
+    now = datetime(2024, 1, 10)
+    policy = BackupPolicy(keep_last=3)
+    backups = [policy.create(zone_file, timestamp=now - timedelta(days=days)) for days in (5, 4, 3, 2, 1)]
+    zone_file.with_name(f"{zone_file.name}.tmp").write_text("", encoding=ZONE_FILE_ENCODING)
+
+    assert policy.prune(zone_file, now=now) == backups[:2]
+    assert policy.backups(zone_file) == backups[2:]
+
+    policy = BackupPolicy(max_age=int(timedelta(days=2, hours=12).total_seconds()))
+    assert policy.prune(zone_file, now=now) == [backups[2]]
+    assert policy.backups(zone_file) == backups[3:]
+
+def test_backup_timestamp_ignores_other_files(zone_file):
+    """Test that only timestamped files are recognised as backups."""
+    assert backup_timestamp(zone_file.with_name(f"{zone_file.name}.tmp"), zone_file) is None
+    assert backup_timestamp(zone_file.with_name(f"{zone_file.name}.2024-01-02_03-04-05"), zone_file) == datetime(2024, 1, 2, 3, 4, 5)
+
+def test_backup_directory_keeps_zones_of_the_same_name_apart(tmp_path, forward_sample_zone_content):
+    """Test that zones with the same file name in different directories neither overwrite nor prune each other's backups."""
+    zones = []
+    for directory in ("a", "b"):
+        (tmp_path / directory).mkdir()
+        zones.append(tmp_path / directory / "db.local")
+        zones[-1].write_text(f"; {directory}\n{forward_sample_zone_content}", encoding=ZONE_FILE_ENCODING)
+    policy = BackupPolicy(directory=tmp_path / "backups", keep_last=1)
+    timestamp = datetime(2024, 1, 2, 3, 4, 5)
+
+    backups = [policy.create(zone, timestamp=timestamp) for zone in zones]
+
+    assert backups[0] != backups[1]
+    assert [policy.prune(zone) for zone in zones] == [[], []]
+    assert [backup.read_text(encoding=ZONE_FILE_ENCODING).splitlines()[0] for backup in backups] == ["; a", "; b"]
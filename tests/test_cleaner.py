@@ -0,0 +1,59 @@
+import pytest
+from cleandns.cleaner import clean_zone, clean_zones
+from cleandns.dns_file import DNSFile
+from cleandns.exceptions import MissingSOArecord
+from cleandns.logger import BufferedLogger
+from tests.conftest import ZONE_FILE_ENCODING
+
+@pytest.fixture
+def dirty_zone(sample_ttl_line, sample_soa_block, sample_ns_block):
+    return (f"{sample_ttl_line}\n{sample_soa_block}\n{sample_ns_block}\n"
+            "www IN A 10.0.0.1\nmail IN A 10.0.0.2\nwww IN A 10.0.0.1\n")
+
+def test_clean_zone_matches_dns_file(tmp_path, dirty_zone):
+    """Test that cleaning in memory renders exactly what DNSFile writes, without any file."""
+    p = tmp_path / "example.com.zone"
+    p.write_text(dirty_zone, encoding=ZONE_FILE_ENCODING)
+    dns = DNSFile(p, logger=BufferedLogger())
+    dns.remove_duplicates()
+    dns.sort()
+    dns.save()
+
+    result = clean_zone(dirty_zone)
+
+    assert result.text == p.read_text(encoding=ZONE_FILE_ENCODING)
+    assert (result.serial, result.modified) == (2023101002, True)
+    assert (result.records_in, result.records_out, result.duplicates_removed) == (6, 5, 1)
+
+@pytest.mark.parametrize("wrap", [str.encode, lambda text: memoryview(text.encode())], ids=["bytes", "memoryview"])
+def test_clean_zone_from_bytes(dirty_zone, wrap):
+    assert clean_zone(wrap(dirty_zone)) == clean_zone(dirty_zone)
+
+def test_clean_zone_keeps_clean_serial(dirty_zone):
+    """Test that a zone the cleaning doesn't change keeps its serial."""
+    clean_text = clean_zone(dirty_zone).text
+
+    result = clean_zone(clean_text)
+    assert (result.text, result.serial, result.modified) == (clean_text, 2023101002, False)
+
+def test_clean_zone_options(dirty_zone):
+    """Test that deduplication and sorting can be turned off."""
+    result = clean_zone(dirty_zone, dedupe=False)
+    assert (result.duplicates_removed, result.text.count("10.0.0.1")) == (0, 2)
+
+    result = clean_zone(dirty_zone, sort=False)
+    assert result.text.index("www") < result.text.index("mail")
+
+def test_clean_zone_invalid(sample_ttl_line):
+    with pytest.raises(MissingSOArecord, match="provisioned"):
+        clean_zone(f"{sample_ttl_line}\nwww IN A 10.0.0.1\n", name="provisioned")
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_clean_zones(dirty_zone, jobs):
+    """Test that the batch variant returns the result of every zone by name, in order, in parallel too."""
+    zones = {"b.example.com": dirty_zone, "a.example.com": dirty_zone.encode(), "c.example.com": memoryview(dirty_zone.encode())}
+
+    results = clean_zones(zones, jobs=jobs, canonical=True)
+
+    assert list(results) == list(zones)
+    assert all(result == clean_zone(dirty_zone) for result in results.values())
@@ -1,8 +1,11 @@
+import mmap
 import pytest
 from pathlib import Path
+from cleandns.backup import BackupPolicy
 from cleandns.dns_file import DNSFile
 from cleandns.exceptions import MissingSOArecord
 from cleandns.record_types import RecordType
+from cleandns.zone_writer import ZoneWriter
 from tests.conftest import ZONE_FILE_ENCODING
 
 # --- Fixtures for Sample Data ---
@@ -166,3 +169,266 @@ def test_save_creates_backup_and_updates_file(zone_file):
     assert len(backups) > 0
     # Verify backup content matches original state
     assert backups[0].read_text(encoding=ZONE_FILE_ENCODING) == original_content
+
+def test_native_parser_matches_strict_mode(tmp_path, complex_forward_zone_content, simple_sample_cname_records_block):
+    """Test that the native parser and the dnspython strict mode load the same records."""
+    p = tmp_path / "example.com.zone"
+    p.write_text(complex_forward_zone_content + simple_sample_cname_records_block, encoding=ZONE_FILE_ENCODING)
+
+    native = DNSFile(p)
+    strict = DNSFile(p, strict=True)
+
+    assert native.ttl == strict.ttl
+    assert native.soa_record == strict.soa_record
+    assert native.records.keys() == strict.records.keys()
+    for r_type in native.records:
+        assert sorted(native.records[r_type]) == sorted(strict.records[r_type])
+
+def test_save_skips_unmodified_zone(zone_file):
+    """Test that saving a clean zone writes nothing: no temp file, no backup, no mtime change."""
+    original_content = zone_file.read_text(encoding=ZONE_FILE_ENCODING)
+    original_mtime = zone_file.stat().st_mtime_ns
+    dns = DNSFile(zone_file)
+
+    assert dns.save() is False
+
+    assert zone_file.read_text(encoding=ZONE_FILE_ENCODING) == original_content
+    assert zone_file.stat().st_mtime_ns == original_mtime
+    assert list(zone_file.parent.iterdir()) == [zone_file]
+
+def test_remove_duplicates_ignores_ttl(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that records differing only by TTL are duplicates and the first one is kept."""
+    content = (
+        f"{sample_ttl_line}\n"
+        f"{sample_soa_block}\n"
+        "www IN A 1.2.3.4\n"
+        "www 60 IN A 1.2.3.4\n"
+    )
+    p = tmp_path / "ttl_dup.zone"
+    p.write_text(content, encoding=ZONE_FILE_ENCODING)
+
+    dns = DNSFile(p)
+    dns.remove_duplicates()
+
+    assert [r.ttl for r in dns.records[RecordType.A]] == [3600]
+    assert dns.modified is True
+
+def test_remove_duplicates_ignores_owner_case(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that owners differing only by case are duplicates by default, like dnspython merged them."""
+    p = tmp_path / "owner_case.zone"
+    p.write_text(f"{sample_ttl_line}\n{sample_soa_block}\nWww IN A 192.168.1.10\nwww IN A 192.168.1.10\n"
+                 "www IN TXT \"Case\"\nwww IN TXT \"case\"\n", encoding=ZONE_FILE_ENCODING)
+
+    dns = DNSFile(p)
+    assert dns.check() == ["duplicate A record: www\t3600\tIN\tA\t192.168.1.10"]
+    dns.remove_duplicates()
+
+    assert [r.name for r in dns.records[RecordType.A]] == ["Www"]
+    assert len(dns.records[RecordType.TXT]) == 2
+
+def test_remove_duplicates_canonical(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that canonical duplicate detection ignores case and the final dot."""
+    content = (
+        f"{sample_ttl_line}\n"
+        f"{sample_soa_block}\n"
+        "www IN CNAME host.example.com.\n"
+        "WWW. IN CNAME HOST.example.com.\n"
+    )
+    p = tmp_path / "case_dup.zone"
+    p.write_text(content, encoding=ZONE_FILE_ENCODING)
+
+    dns = DNSFile(p)
+    dns.remove_duplicates()
+    assert len(dns.records[RecordType.CNAME]) == 2
+    assert dns.modified is False
+
+    dns.remove_duplicates(canonical=True)
+    assert [r.name for r in dns.records[RecordType.CNAME]] == ["www"]
+    assert dns.modified is True
+
+def test_diff_ignores_formatting(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that the diff compares records, not whitespace, and reports the serial change."""
+    old = tmp_path / "old.zone"
+    old.write_text(f"{sample_ttl_line}\n{sample_soa_block}\nwww IN A 1.2.3.4\nmail IN A 5.6.7.8\n", encoding=ZONE_FILE_ENCODING)
+    new = tmp_path / "new.zone"
+    new.write_text(
+        f"{sample_ttl_line}\n"
+        "@\tIN\tSOA\tns1.example.com. admin.example.com. 2023101002 3600 1800 604800 86400\n"
+        "www\t3600\tIN\tA\t1.2.3.4\n"
+        "ftp\tIN\tA\t9.9.9.9\n",
+        encoding=ZONE_FILE_ENCODING
+    )
+
+    diff = DNSFile(old).diff(DNSFile(new))
+
+    assert (diff.old_serial, diff.new_serial) == (2023101001, 2023101002)
+    assert diff.soa_changed is False
+    assert [r.name for r in diff.removed] == ["mail"]
+    assert [r.name for r in diff.added] == ["ftp"]
+    assert list(diff.lines()) == ["serial: 2023101001 -> 2023101002", "- mail\t3600\tIN\tA\t5.6.7.8", "+ ftp\t3600\tIN\tA\t9.9.9.9"]
+
+def test_check_clean_zone(tmp_path, complex_forward_zone_content):
+    """Test that a zone cleaned by remove_duplicates() and sort() passes the check."""
+    p = tmp_path / "clean.zone"
+    p.write_text(complex_forward_zone_content, encoding=ZONE_FILE_ENCODING)
+    dns = DNSFile(p)
+    assert dns.check() != []
+
+    dns.remove_duplicates()
+    dns.sort()
+
+    assert dns.check() == []
+
+def test_check_stops_at_first_violation(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that the check reports one violation, or all of them with report_all."""
+    content = (
+        f"{sample_ttl_line}\n"
+        f"{sample_soa_block}\n"
+        "b IN A 2.2.2.2\n"
+        "a IN A 1.1.1.1\n"
+        "a IN A 1.1.1.1\n"
+        "c IN A 3.3.3.3\n"
+    )
+    p = tmp_path / "dirty.zone"
+    p.write_text(content, encoding=ZONE_FILE_ENCODING)
+    dns = DNSFile(p)
+
+    assert dns.check() == ["A record a is out of order (after b)"]
+    assert dns.check(report_all=True) == ["A record a is out of order (after b)", "duplicate A record: a\t3600\tIN\tA\t1.1.1.1"]
+    assert dns.modified is False
+
+def test_check_matches_modified_flag(tmp_path, complex_reverse_zone_content, forward_sample_zone_content):
+    """Test that the check fails exactly when cleaning would modify the zone."""
+    for content in (complex_reverse_zone_content, forward_sample_zone_content):
+        p = tmp_path / "zone"
+        p.write_text(content, encoding=ZONE_FILE_ENCODING)
+        dns = DNSFile(p)
+        violations = dns.check(report_all=True)
+        dns.remove_duplicates()
+        dns.sort()
+        assert bool(violations) == dns.modified
+
+def test_save_keeps_other_record_types(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that records cleandns doesn't rewrite survive a save and take part in dedupe and sort."""
+    content = (
+        f"{sample_ttl_line}\n"
+        f"{sample_soa_block}\n"
+        "zz IN TXT \"Hello World\"\n"
+        "@ IN MX 10 mail.example.com.\n"
+        "aa IN TXT \"Hello World\"\n"
+        "aa IN TXT \"hello world\"\n"
+        "@ IN MX 10 mail.example.com.\n"
+        "v6 IN AAAA 2001:db8::1\n"
+    )
+    p = tmp_path / "generic.zone"
+    p.write_text(content, encoding=ZONE_FILE_ENCODING)
+
+    dns = DNSFile(p)
+    dns.remove_duplicates(canonical=True)
+    dns.sort()
+    dns.save()
+
+    lines = p.read_text(encoding=ZONE_FILE_ENCODING).splitlines()
+    assert [line for line in lines if "\tTXT\t" in line or "\tMX\t" in line or "\tAAAA\t" in line] == [
+        'aa\t3600\tIN\tTXT\t"Hello World"',
+        'aa\t3600\tIN\tTXT\t"hello world"',
+        'zz\t3600\tIN\tTXT\t"Hello World"',
+        ".\t3600\tIN\tMX\t10 mail.example.com.",
+        "v6\t3600\tIN\tAAAA\t2001:db8::1",
+    ]
+
+def test_save_reports_bytes_written(zone_file):
+    """Test that the writer's byte count matches the rewritten file and nothing else is left behind."""
+    dns = DNSFile(zone_file, backup_policy=BackupPolicy(mode="none"), writer=ZoneWriter(chunk_lines=2))
+    dns.modified = True
+
+    assert dns.save() is True
+    assert dns.bytes_written == zone_file.stat().st_size
+    assert zone_file.read_text(encoding=ZONE_FILE_ENCODING) == "".join(dns.render_lines())
+    assert list(zone_file.parent.iterdir()) == [zone_file]
+
+def test_content_from_buffers_matches_file(zone_file):
+    """Test that a zone given as text, bytes or an mmap of the file loads exactly like the file itself."""
+    expected = DNSFile(zone_file)
+    data = zone_file.read_bytes()
+
+    with open(zone_file, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for content in (data.decode(ZONE_FILE_ENCODING), data, memoryview(data), mapped):
+            for strict in (False, True):
+                loaded = DNSFile(zone_file, strict=strict, content=content)
+                assert (loaded.ttl, loaded.soa_record) == (expected.ttl, expected.soa_record)
+                assert {t: sorted(r) for t, r in loaded.records.items()} == {t: sorted(r) for t, r in expected.records.items()}
+
+def test_save_keeps_includes(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that $INCLUDE directives are written back and zone records repeating included ones are dropped."""
+    (tmp_path / "hosts.inc").write_text("www IN A 10.0.0.1\n", encoding=ZONE_FILE_ENCODING)
+    p = tmp_path / "example.com.zone"
+    p.write_text(f"{sample_ttl_line}\n{sample_soa_block}\n$INCLUDE hosts.inc\nwww IN A 10.0.0.1\nmail IN A 10.0.0.2\n",
+                 encoding=ZONE_FILE_ENCODING)
+
+    dns = DNSFile(p, backup_policy=BackupPolicy(mode="none"))
+    assert dns.check() == ["duplicate A record: www\t3600\tIN\tA\t10.0.0.1"]
+    dns.remove_duplicates()
+    dns.sort()
+    assert dns.save() is True
+
+    content = p.read_text(encoding=ZONE_FILE_ENCODING)
+    assert "\n$INCLUDE\thosts.inc\nmail\t" in content
+    assert content.count("10.0.0.1") == 0
+    assert DNSFile(p).check() == []
+
+
+def test_save_origin_zone_loads_with_its_origin(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that a zone written with $ORIGIN still means the same names once cleaned, loaded with an explicit origin."""
+    import dns.zone
+
+    p = tmp_path / "example.com.zone"
+    p.write_text(f"{sample_ttl_line}\n$ORIGIN example.com.\n{sample_soa_block}\n@ IN NS ns1\n@ IN MX 10 mail\n"
+                 "www IN CNAME web\nweb IN A 10.0.0.2\nmail IN A 10.0.0.1\n"
+                 "$ORIGIN sub.example.com.\n@ IN MX 20 relay\nrelay IN A 10.0.0.3\n", encoding=ZONE_FILE_ENCODING)
+
+    zone_file = DNSFile(p, backup_policy=BackupPolicy(mode="none"))
+    zone_file.sort()
+    assert zone_file.save() is True
+
+    zone = dns.zone.from_text(p.read_text(encoding=ZONE_FILE_ENCODING), origin="example.com.", relativize=False)
+    names = {name.to_text() for name in zone.nodes}
+    assert names == {"example.com.", "www.example.com.", "web.example.com.", "mail.example.com.",
+                     "sub.example.com.", "relay.sub.example.com."}
+    assert zone.find_rdataset("www.example.com.", "CNAME")[0].target.to_text() == "web.example.com."
+    assert zone.find_rdataset("example.com.", "MX")[0].exchange.to_text() == "mail.example.com."
+    assert zone.find_rdataset("sub.example.com.", "MX")[0].exchange.to_text() == "relay.sub.example.com."
+
+def test_save_returns_to_root_origin_before_relative_owners(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that records read after $ORIGIN . are not written under the $ORIGIN of a generic record before them."""
+    import dns.zone
+
+    p = tmp_path / "example.com.zone"
+    p.write_text(f"{sample_ttl_line}\n{sample_soa_block}\n$ORIGIN example.com.\nmail IN MX 10 relay\nmail IN MX 10 relay\n"
+                 "$ORIGIN .\nwww.example.com. IN A 10.0.0.1\n", encoding=ZONE_FILE_ENCODING)
+    before = DNSFile(p)
+
+    zone_file = DNSFile(p, backup_policy=BackupPolicy(mode="none"))
+    zone_file.remove_duplicates()
+    zone_file.sort()
+    assert zone_file.save() is True
+
+    after = DNSFile(p)
+    assert [str(r) for r in after.records[RecordType.A]] == [str(r) for r in before.records[RecordType.A]]
+    zone = dns.zone.from_text(p.read_text(encoding=ZONE_FILE_ENCODING), origin=".", relativize=False, check_origin=False)
+    assert {name.to_text() for name in zone.nodes} == {".", "mail.example.com.", "www.example.com."}
+
+def test_save_keeps_parenthesised_quoted_rdata(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that TXT and SPF rdata grouped in parentheses is written back with its quoted text untouched."""
+    p = tmp_path / "generic.zone"
+    p.write_text(f"{sample_ttl_line}\n{sample_soa_block}\ntxt IN TXT (\"a  b\")\nspf IN SPF ( \"v=spf1  -all\"\n    \"x (y)\" )\n"
+                 "txt IN TXT \"a  b\"\n", encoding=ZONE_FILE_ENCODING)
+
+    dns = DNSFile(p, backup_policy=BackupPolicy(mode="none"))
+    dns.remove_duplicates()
+    dns.sort()
+    assert dns.save() is True
+
+    lines = p.read_text(encoding=ZONE_FILE_ENCODING).splitlines()
+    assert [line.split("\t")[-1] for line in lines if "\tTXT\t" in line or "\tSPF\t" in line] == [
+        '"a  b"', '"v=spf1  -all" "x (y)"']
@@ -0,0 +1,107 @@
+import pytest
+from benchmarks.zone_generator import write_zone
+from cleandns import external_sort
+from cleandns.backup import BackupPolicy
+from cleandns.dns_file import DNSFile
+from cleandns.external_sort import RECORD_MEMORY_ESTIMATE, ExternalZoneFile
+from cleandns.logger import BufferedLogger
+from cleandns.metrics import FileMetrics
+from tests.conftest import ZONE_FILE_ENCODING
+
+NO_BACKUP = BackupPolicy(mode="none")
+
+@pytest.fixture(autouse=True)
+def small_runs(monkeypatch):
+    # Tiny batches and fan-in, so that small zones go through spilling and several merge rounds
+    monkeypatch.setattr(external_sort, "SPILL_BATCH", 4)
+    monkeypatch.setattr(external_sort, "MAX_FAN_IN", 3)
+
+def clean_in_memory(path, canonical=False):
+    dns = DNSFile(path, logger=BufferedLogger(), backup_policy=NO_BACKUP)
+    dns.remove_duplicates(canonical=canonical)
+    dns.sort()
+    return dns.save()
+
+def clean_external(path, canonical=False, records_per_run=16, metrics=None):
+    zone = ExternalZoneFile(path, RECORD_MEMORY_ESTIMATE * records_per_run, logger=BufferedLogger(),
+                            metrics=metrics, backup_policy=NO_BACKUP)
+    return zone.clean(canonical=canonical)
+
+def assert_same_output(tmp_path, content, canonical=False, records_per_run=16):
+    in_memory = tmp_path / "in_memory.zone"
+    external = tmp_path / "external.zone"
+    in_memory.write_text(content, encoding=ZONE_FILE_ENCODING)
+    external.write_text(content, encoding=ZONE_FILE_ENCODING)
+
+    assert clean_external(external, canonical, records_per_run) == clean_in_memory(in_memory, canonical)
+    assert external.read_text(encoding=ZONE_FILE_ENCODING) == in_memory.read_text(encoding=ZONE_FILE_ENCODING)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["external.zone", "in_memory.zone"]
+
+@pytest.mark.parametrize("kind", ["forward", "reverse"])
+@pytest.mark.parametrize("canonical", [False, True])
+@pytest.mark.parametrize("records_per_run", [1, 16, 100_000])
+def test_matches_in_memory_path(tmp_path, kind, canonical, records_per_run):
+    """Test that spilled runs, multi-round merges and the in-memory fast path all give DNSFile's output."""
+    source = write_zone(tmp_path / "source", records=400, kind=kind, duplicate_ratio=0.2, disorder=0.7, seed=5)
+    content = source.read_text(encoding=ZONE_FILE_ENCODING)
+    source.unlink()
+
+    assert_same_output(tmp_path, content, canonical, records_per_run)
+
+@pytest.mark.parametrize("canonical", [False, True])
+def test_matches_in_memory_duplicates(tmp_path, sample_ttl_line, sample_soa_block, canonical):
+    """Test that case, final dot, TTL and type mixes deduplicate exactly like DNSFile."""
+    content = (
+        f"{sample_ttl_line}\n{sample_soa_block}\n"
+        "www IN A 10.0.0.1\n"
+        "aa IN TXT \"Hello  World\"\n"
+        "WWW IN A 10.0.0.1\n"
+        "www.example.com. IN CNAME host\n"
+        "www 300 IN A 10.0.0.1\n"
+        "ns1 IN NS ns1.example.com.\n"
+        "aa IN TXT \"Hello World\"\n"
+        "mail IN A 10.0.0.3\n"
+        "www. IN A 10.0.0.1\n"
+        "www IN A 10.0.0.1\n"
+    )
+    assert_same_output(tmp_path, content, canonical, records_per_run=2)
+
+def test_clean_zone_is_not_rewritten(tmp_path):
+    """Test that a clean zone is left untouched, like DNSFile.save()."""
+    path = write_zone(tmp_path / "clean.zone", records=100, disorder=0)
+    content = path.read_text(encoding=ZONE_FILE_ENCODING)
+    mtime = path.stat().st_mtime_ns
+
+    assert clean_external(path) is False
+    assert path.read_text(encoding=ZONE_FILE_ENCODING) == content
+    assert path.stat().st_mtime_ns == mtime
+    assert list(tmp_path.iterdir()) == [path]
+
+def test_trailing_duplicate_marks_zone_modified(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that a duplicate at the very end of its type still counts as a change."""
+    content = f"{sample_ttl_line}\n{sample_soa_block}\na IN A 10.0.0.1\nb IN A 10.0.0.2\nb IN A 10.0.0.2\n"
+
+    assert_same_output(tmp_path, content)
+
+@pytest.mark.parametrize("canonical", [False, True])
+def test_matches_in_memory_includes(tmp_path, sample_ttl_line, sample_soa_block, canonical):
+    """Test that $INCLUDE lines are kept and records repeating included ones dropped, like DNSFile."""
+    (tmp_path / "hosts.inc").write_text("www IN A 10.0.0.1\n", encoding=ZONE_FILE_ENCODING)
+    zones = tmp_path / "zones"
+    zones.mkdir()
+    content = (
+        f"{sample_ttl_line}\n{sample_soa_block}\n$INCLUDE ../hosts.inc\n"
+        "mail IN A 10.0.0.3\n"
+        "WWW IN A 10.0.0.1\n"
+        "www IN A 10.0.0.1\n"
+    )
+    assert_same_output(zones, content, canonical, records_per_run=2)
+
+def test_fills_metrics(tmp_path):
+    path = write_zone(tmp_path / "dup.zone", records=200, duplicate_ratio=0.1, disorder=0)
+    metrics = FileMetrics(str(path))
+
+    assert clean_external(path, metrics=metrics) is True
+    assert (metrics.records_in - metrics.records_out, metrics.duplicates_removed) == (20, 20)
+    assert metrics.modified is True
+    assert list(metrics.phases) == ["parse", "write", "replace"]
@@ -0,0 +1,99 @@
+import os
+import pytest
+from cleandns.fingerprint_cache import FingerprintCache
+from tests.conftest import ZONE_FILE_ENCODING
+
+@pytest.fixture
+def zone_file(tmp_path, forward_sample_zone_content):
+    p = tmp_path / "example.com.zone"
+    p.write_text(forward_sample_zone_content, encoding=ZONE_FILE_ENCODING)
+    return p
+
+@pytest.fixture
+def cache(tmp_path):
+    return FingerprintCache(tmp_path / "cache" / "fingerprints.json")
+
+def test_unknown_file_is_not_clean(cache, zone_file):
+    """Test that a file never seen before has to be processed."""
+    cache.load()
+    assert cache.is_clean(zone_file) is False
+
+def test_saved_fingerprint_marks_file_clean(cache, zone_file):
+    """Test that an updated entry survives a save/load round trip."""
+    cache.update(zone_file)
+    cache.save()
+
+    reloaded = FingerprintCache(cache.path)
+    reloaded.load()
+    assert reloaded.is_clean(zone_file) is True
+
+def test_modified_file_is_not_clean(cache, zone_file):
+    """Test that a content change invalidates the entry."""
+    cache.update(zone_file)
+    zone_file.write_text(zone_file.read_text(encoding=ZONE_FILE_ENCODING) + "new IN A 1.2.3.4\n", encoding=ZONE_FILE_ENCODING)
+
+    assert cache.is_clean(zone_file) is False
+
+def test_touched_file_is_clean_by_hash(cache, zone_file):
+    """Test that a metadata-only change falls back to the content hash."""
+    cache.update(zone_file)
+    stat = zone_file.stat()
+    os.utime(zone_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert cache.is_clean(zone_file) is True
+
+def test_save_merges_concurrent_updates_and_prunes(cache, tmp_path, zone_file):
+    """Test that saving keeps entries written by another run and drops deleted files."""
+    other_file = tmp_path / "other.zone"
+    other_file.write_text("x", encoding=ZONE_FILE_ENCODING)
+    gone_file = tmp_path / "gone.zone"
+    gone_file.write_text("y", encoding=ZONE_FILE_ENCODING)
+
+    other_run = FingerprintCache(cache.path)
+    other_run.update(other_file)
+    other_run.update(gone_file)
+    other_run.save()
+    gone_file.unlink()
+
+    cache.update(zone_file)
+    cache.save()
+
+    reloaded = FingerprintCache(cache.path)
+    reloaded.load()
+    assert reloaded.is_clean(zone_file) is True
+    assert reloaded.is_clean(other_file) is True
+    assert str(gone_file.resolve()) not in reloaded.entries
+
+def test_corrupted_index_is_ignored(cache):
+    """Test that an unreadable index is treated as empty."""
+    cache.path.parent.mkdir(parents=True)
+    cache.path.write_text("{not json", encoding=ZONE_FILE_ENCODING)
+    cache.load()
+    assert cache.entries == {}
+
+def test_file_is_only_clean_for_its_options(cache, zone_file):
+    """Test that a file cleaned with some options is processed again with others."""
+    cache.update(zone_file)
+    cache.save()
+
+    for options, clean in [(None, True), ({"strict": False, "canonical_duplicates": True}, False)]:
+        reloaded = FingerprintCache(cache.path, options=options)
+        reloaded.load()
+        assert reloaded.is_clean(zone_file) is clean
+
+def test_changed_include_invalidates_entry(cache, tmp_path, zone_file):
+    """Test that a file is processed again once a file it includes changed, even if it didn't itself."""
+    from cleandns.dns_file import DNSFile
+
+    include = tmp_path / "hosts.inc"
+    include.write_text("www IN A 10.0.0.1\n", encoding=ZONE_FILE_ENCODING)
+    zone_file.write_text(zone_file.read_text(encoding=ZONE_FILE_ENCODING) + "$INCLUDE hosts.inc\n", encoding=ZONE_FILE_ENCODING)
+    cache.update(zone_file, DNSFile(zone_file).dependencies)
+    cache.save()
+
+    reloaded = FingerprintCache(cache.path)
+    reloaded.load()
+    assert reloaded.is_clean(zone_file) is True
+
+    include.write_text("www IN A 10.0.0.1\nwww IN A 10.0.0.1\n", encoding=ZONE_FILE_ENCODING)
+    assert reloaded.is_clean(zone_file) is False
@@ -0,0 +1,80 @@
+import logging
+import queue
+import threading
+import pytest
+from cleandns import logger as logger_module
+from cleandns.logger import BufferedLogger, CustomFormatter, LogForwarder, Logger, QueueLogger
+
+def test_formatter_is_thread_safe():
+    """Test that records of different levels formatted concurrently each keep their own prefix."""
+    formatter = CustomFormatter()
+    records = {level: logging.LogRecord("cleandns", level, __file__, 0, "message %d", (1,), None)
+               for level in (logging.INFO, logging.WARNING, logging.ERROR)}
+    expected = {level: formatter.format(record) for level, record in records.items()}
+    mismatches = []
+
+    def format_many(level):
+        for _ in range(2000):
+            if formatter.format(records[level]) != expected[level]:
+                mismatches.append(level)
+
+    threads = [threading.Thread(target=format_many, args=(level,)) for level in records]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert expected[logging.WARNING] == "[!] message 1"
+    assert mismatches == []
+
+def test_logger_copies_share_one_handler(monkeypatch):
+    """Test that a second Logger singleton (e.g. from src.cleandns.logger) doesn't print every line twice."""
+    monkeypatch.setattr(logger_module.LoggerMeta, "_instances", {})
+    first = Logger()
+    monkeypatch.setattr(logger_module.LoggerMeta, "_instances", {})
+    second = Logger()
+
+    assert first is not second
+    assert [handler.get_name() for handler in second.logger.handlers].count(logger_module.HANDLER_NAME) == 1
+
+def test_buffered_logger_formats_lazily():
+    """Test that the arguments are only formatted when the messages are read or replayed."""
+    buffered = BufferedLogger()
+    buffered.info("Wrote %d bytes to %s", 10, "a.zone")
+    buffered.warning("100% done")
+
+    assert buffered.entries[0] == ("info", "Wrote %d bytes to %s", (10, "a.zone"))
+    assert buffered.messages == [("info", "Wrote 10 bytes to a.zone"), ("warning", "100% done")]
+
+    replayed = BufferedLogger()
+    buffered.replay(replayed)
+    assert replayed.messages == buffered.messages
+
+def test_queue_logger_sends_plain_values():
+    """Test that only picklable plain values cross the queue."""
+    messages = queue.Queue()
+    QueueLogger(messages, 3).error("Failed: %s (%d)", ValueError("bad"), 2)
+
+    assert messages.get_nowait() == (3, "error", "Failed: %s (%d)", ("bad", 2))
+
+def test_forwarder_prints_in_file_order():
+    """Test that interleaved messages come out file by file, each file's on_done right after its lines."""
+    messages = queue.Queue()
+    output = BufferedLogger()
+    done = []
+    loggers = [QueueLogger(messages, index) for index in range(3)]
+
+    loggers[2].info("c1")
+    loggers[1].info("b1")
+    loggers[0].info("a1")
+    loggers[2].done("metrics c")
+    loggers[1].info("b2")
+    loggers[0].done("metrics a")
+    loggers[1].done()
+    loggers[1].done()  # a retried file may end twice
+
+    forwarder = LogForwarder(messages, output, 3, on_done=lambda index, payload: (done.append(payload), output.info("done %d", index)))
+    forwarder.start().join()
+
+    assert [message for _, message in output.messages] == ["a1", "done 0", "b1", "b2", "done 1", "c1", "done 2"]
+    assert done == ["metrics a", None, "metrics c"]
@@ -0,0 +1,234 @@
+import io
+import json
+import pytest
+from src.cleandns.fingerprint_cache import FingerprintCache
+from src.cleandns.backup import BackupPolicy
+from src.cleandns.main import check_cross_zone, clean_changed_files, generate_reverse_zones, process_file, process_files_async, process_files_parallel
+from src.cleandns.logger import BufferedLogger
+from src.cleandns.metrics import FileMetrics, MetricsReporter
+from src.cleandns.owner_index import OwnerIndex
+from tests.conftest import ZONE_FILE_ENCODING
+
+@pytest.fixture
+def zone_files(tmp_path, forward_sample_zone_content, reverse_sample_zone_content):
+    """Creates a mix of valid and invalid zone files."""
+    paths = []
+    for name, content in [("a.zone", forward_sample_zone_content), ("b.zone", "garbage\n"), ("c.zone", reverse_sample_zone_content)]:
+        p = tmp_path / name
+        p.write_text(content, encoding=ZONE_FILE_ENCODING)
+        paths.append(p)
+    return paths
+
+def test_parallel_results_in_input_order(zone_files):
+    """Test that log lines come back in input order and a bad zone only fails itself."""
+    logger = BufferedLogger()
+
+    assert process_files_parallel(zone_files, logger, jobs=2) == [True, False, True]
+
+    per_file = [message for level, message in logger.messages if level != "info" or message.startswith("Successfully")]
+    assert per_file[0] == "Successfully processed a.zone"
+    assert per_file[1].startswith("Failed to process b.zone")
+    assert per_file[2] == "Successfully processed c.zone"
+    # The lines logged by DNSFile itself are buffered with the rest of their file's output
+    assert logger.messages.index(("info", "Creating the file a.zone.tmp ...")) < logger.messages.index(("info", "Successfully processed a.zone"))
+
+def test_parallel_retries_crashed_worker(zone_files, monkeypatch):
+    """Test that a worker dying on a file only fails that file, and the output stays in input order."""
+    import os
+    from src.cleandns import main
+
+    original = main.process_file
+
+    def crash_on_c(file_path, logger, **options):
+        if file_path.name == "c.zone":
+            os._exit(1)
+        return original(file_path, logger, **options)
+
+    # The workers are forked, so they see the patched function
+    monkeypatch.setattr(main, "process_file", crash_on_c)
+    logger = BufferedLogger()
+
+    assert main.process_files_parallel(zone_files, logger, jobs=2) == [True, False, False]
+    assert logger.messages[-1] == ("error", "Failed to process c.zone: the worker process crashed")
+    assert [message for level, message in logger.messages if level == "error"][0].startswith("Failed to process b.zone")
+
+def test_parallel_all_successful(zone_files):
+    """Test that the pool reports success when every file is processed."""
+    logger = BufferedLogger()
+
+    assert process_files_parallel([zone_files[0], zone_files[2]], logger, jobs=2) == [True, True]
+
+def test_process_file_fills_metrics(tmp_path, sample_ttl_line, sample_soa_block, simple_sample_a_records_block):
+    """Test that process_file measures every phase and counts records and bytes."""
+    p = tmp_path / "dup.zone"
+    p.write_text(f"{sample_ttl_line}\n{sample_soa_block}\n{simple_sample_a_records_block}\n{simple_sample_a_records_block}\n", encoding=ZONE_FILE_ENCODING)
+    metrics = FileMetrics(str(p))
+
+    assert process_file(p, BufferedLogger(), metrics=metrics) is True
+
+    assert list(metrics.phases) == ["parse", "remove_duplicates", "sort", "write", "replace"]
+    assert (metrics.records_in, metrics.records_out, metrics.duplicates_removed) == (5, 3, 2)
+    assert metrics.bytes_read > 0
+    assert metrics.bytes_written == p.stat().st_size
+    assert metrics.modified is True
+
+def test_process_file_with_max_memory_fills_metrics(tmp_path, sample_ttl_line, sample_soa_block, simple_sample_a_records_block):
+    """Test that the bounded-memory mode counts records and bytes into the metrics main builds."""
+    p = tmp_path / "dup.zone"
+    p.write_text(f"{sample_ttl_line}\n{sample_soa_block}\n{simple_sample_a_records_block}\n{simple_sample_a_records_block}\n", encoding=ZONE_FILE_ENCODING)
+    metrics = FileMetrics(str(p))
+
+    assert process_file(p, BufferedLogger(), metrics=metrics, max_memory=4096) is True
+
+    assert (metrics.records_in, metrics.records_out, metrics.duplicates_removed) == (5, 3, 2)
+    assert metrics.bytes_read > 0
+    assert metrics.bytes_written == p.stat().st_size
+    assert metrics.modified is True
+
+def test_parallel_reports_metrics_in_input_order(zone_files):
+    """Test that the metrics of parallel runs are reported in input order."""
+    output = io.StringIO()
+    reporter = MetricsReporter(BufferedLogger(), json_output=output)
+
+    process_files_parallel(zone_files, BufferedLogger(), jobs=2, reporter=reporter)
+
+    paths = [json.loads(line)["path"] for line in output.getvalue().splitlines()]
+    assert paths == [str(zone_files[0]), str(zone_files[2])]
+
+def test_check_mode_writes_nothing(zone_files):
+    """Test that check mode fails on unclean zones without touching them."""
+    original = zone_files[0].read_text(encoding=ZONE_FILE_ENCODING)
+    logger = BufferedLogger()
+
+    assert process_file(zone_files[0], logger, check=True) is False
+
+    assert zone_files[0].read_text(encoding=ZONE_FILE_ENCODING) == original
+    assert len(list(zone_files[0].parent.iterdir())) == len(zone_files)
+    assert logger.messages[0][0] == "error"
+
+def test_clean_changed_files_skips_own_rewrites(zone_files):
+    """Test that a rewritten zone is recorded as clean, so the change its rewrite causes is skipped."""
+    cache = FingerprintCache()
+    logger = BufferedLogger()
+
+    assert clean_changed_files(zone_files, logger, cache) == [True, False, True]
+    assert clean_changed_files(zone_files, logger, cache) == [False]
+    assert cache.is_clean(zone_files[0]) and cache.is_clean(zone_files[2])
+
+def test_async_pipeline_matches_process_file(zone_files, tmp_path, forward_sample_zone_content, reverse_sample_zone_content):
+    """Test that the asyncio pipeline logs, reports and rewrites exactly like process_file."""
+    sequential = []
+    for name, content in [("a.zone", forward_sample_zone_content), ("b.zone", "garbage\n"), ("c.zone", reverse_sample_zone_content)]:
+        p = tmp_path / "sequential" / name
+        p.parent.mkdir(exist_ok=True)
+        p.write_text(content, encoding=ZONE_FILE_ENCODING)
+        sequential.append(p)
+    sequential_logger = BufferedLogger()
+    expected = [process_file(p, sequential_logger, backup_policy=BackupPolicy(mode="none")) for p in sequential]
+
+    logger = BufferedLogger()
+    output = io.StringIO()
+    reporter = MetricsReporter(BufferedLogger(), json_output=output)
+    results = process_files_async(zone_files + [tmp_path / "missing.zone"], logger, io_workers=2, max_in_flight=2,
+                                  reporter=reporter, backup_policy=BackupPolicy(mode="none"))
+
+    assert results == expected + [False]
+    def untimed(messages):
+        return [message for message in messages if not message[1].startswith("Wrote ")]
+    assert untimed(logger.messages[:len(sequential_logger.messages)]) == untimed(sequential_logger.messages)
+    assert logger.messages[-1] == ("warning", f"Skipping {tmp_path / 'missing.zone'}: Not a valid file.")
+    for p, q in zip(zone_files, sequential):
+        assert p.read_text(encoding=ZONE_FILE_ENCODING) == q.read_text(encoding=ZONE_FILE_ENCODING)
+    metrics = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [m["path"] for m in metrics] == [str(zone_files[0]), str(zone_files[2])]
+    assert list(metrics[0]["phases"]) == ["read", "parse", "remove_duplicates", "sort", "write", "replace"]
+
+def test_async_pipeline_check_mode(zone_files):
+    """Test that check mode goes through the pipeline without writing anything."""
+    before = [p.read_text(encoding=ZONE_FILE_ENCODING) for p in zone_files]
+
+    expected = [process_file(p, BufferedLogger(), check=True) for p in zone_files]
+
+    assert process_files_async(zone_files, BufferedLogger(), check=True) == expected == [False, False, True]
+    assert [p.read_text(encoding=ZONE_FILE_ENCODING) for p in zone_files] == before
+
+def test_process_file_with_max_memory_matches(zone_files, tmp_path):
+    """Test that the bounded-memory mode gives process_file's output and logs."""
+    expected = tmp_path / "expected.zone"
+    expected.write_text(zone_files[2].read_text(encoding=ZONE_FILE_ENCODING), encoding=ZONE_FILE_ENCODING)
+    assert process_file(expected, BufferedLogger(), backup_policy=BackupPolicy(mode="none")) is True
+
+    logger = BufferedLogger()
+    assert process_file(zone_files[2], logger, backup_policy=BackupPolicy(mode="none"), max_memory=4096) is True
+    assert process_file(zone_files[1], BufferedLogger(), max_memory=4096) is False
+
+    assert zone_files[2].read_text(encoding=ZONE_FILE_ENCODING) == expected.read_text(encoding=ZONE_FILE_ENCODING)
+    assert logger.messages[-1] == ("info", "Successfully processed c.zone")
+
+def test_generate_reverse_zones(tmp_path, sample_ttl_line, sample_soa_block):
+    """Test that the forward zones are merged into one reverse zone per network, and a bad zone fails the run."""
+    zones = [tmp_path / "a.com.zone", tmp_path / "b.com.zone", tmp_path / "broken.zone"]
+    zones[0].write_text(f"{sample_ttl_line}\n{sample_soa_block}\nwww IN A 10.0.0.1\n", encoding=ZONE_FILE_ENCODING)
+    zones[1].write_text(f"{sample_ttl_line}\n{sample_soa_block}\nwww IN A 10.0.0.2\nmail IN A 10.0.1.2\n", encoding=ZONE_FILE_ENCODING)
+    zones[2].write_text("www IN A 10.0.0.3\n", encoding=ZONE_FILE_ENCODING)
+    output = tmp_path / "reverse"
+
+    assert generate_reverse_zones(zones, output, BufferedLogger(), backup_policy=BackupPolicy(mode="none")) == 1
+
+    assert sorted(p.name for p in output.iterdir()) == ["0.0.10.in-addr.arpa.zone", "1.0.10.in-addr.arpa.zone"]
+    content = (output / "0.0.10.in-addr.arpa.zone").read_text(encoding=ZONE_FILE_ENCODING)
+    assert "1\t3600\tIN\tPTR\twww.a.com.\n2\t3600\tIN\tPTR\twww.b.com.\n" in content
+    assert generate_reverse_zones(zones[:2], output, BufferedLogger(), backup_policy=BackupPolicy(mode="none")) == 0
+
+@pytest.mark.parametrize("mode", ["sequential", "parallel", "async", "check"])
+def test_cross_zone_index_filled_by_every_mode(tmp_path, sample_ttl_line, sample_soa_block, mode):
+    """Test that the zones are indexed while they are processed, whichever way they are processed."""
+    zones = [tmp_path / "a.com.zone", tmp_path / "b.com.zone"]
+    zones[0].write_text(f"{sample_ttl_line}\n{sample_soa_block}\nftp IN CNAME gone\nwww IN CNAME web.b.com.\n", encoding=ZONE_FILE_ENCODING)
+    zones[1].write_text(f"{sample_ttl_line}\n{sample_soa_block}\nweb IN A 10.0.0.1\nweb IN CNAME www.a.com.\n", encoding=ZONE_FILE_ENCODING)
+    owner_index = OwnerIndex()
+    options = dict(backup_policy=BackupPolicy(mode="none"), owner_index=owner_index)
+
+    if mode == "parallel":
+        assert process_files_parallel(zones, BufferedLogger(), 2, **options) == [True, True]
+    elif mode == "async":
+        assert process_files_async(zones, BufferedLogger(), **options) == [True, True]
+    else:
+        assert [process_file(p, BufferedLogger(), check=mode == "check", **options) for p in zones] == [True, True]
+
+    logger = BufferedLogger()
+    assert check_cross_zone(owner_index, logger) is False
+    # The async pipeline indexes the zones in the order they are read
+    assert sorted(logger.messages[:-1]) == [
+        ("warning", "a.com.zone: CNAME loop at www.a.com"),
+        ("warning", "a.com.zone: dangling CNAME ftp.a.com -> gone.a.com"),
+        ("warning", "b.com.zone: CNAME loop at web.b.com"),
+        ("warning", "b.com.zone: web.b.com has both a CNAME and A data"),
+    ]
+    assert logger.messages[-1] == ("warning", "Found 4 CNAME problem(s) across 2 zone(s)")
+
+@pytest.mark.parametrize("mode", ["sequential", "parallel", "async", "check", "watch"])
+def test_included_files_are_returned_for_the_cache(tmp_path, sample_ttl_line, sample_soa_block, mode):
+    """Test that the files a zone includes are sent back with its result, whichever way it is processed."""
+    zones = [tmp_path / "a.com.zone", tmp_path / "b.com.zone"]
+    (tmp_path / "hosts.inc").write_text("www IN A 10.0.0.1\n", encoding=ZONE_FILE_ENCODING)
+    zones[0].write_text(f"{sample_ttl_line}\n{sample_soa_block}\n$INCLUDE hosts.inc\n", encoding=ZONE_FILE_ENCODING)
+    zones[1].write_text(f"{sample_ttl_line}\n{sample_soa_block}\nweb IN A 10.0.0.2\n", encoding=ZONE_FILE_ENCODING)
+    options = dict(backup_policy=BackupPolicy(mode="none"))
+    file_dependencies = {}
+
+    if mode == "parallel":
+        process_files_parallel(zones, BufferedLogger(), 2, file_dependencies=file_dependencies, **options)
+    elif mode == "async":
+        process_files_async(zones, BufferedLogger(), file_dependencies=file_dependencies, **options)
+    elif mode == "watch":
+        cache = FingerprintCache(tmp_path / "fingerprints.json")
+        clean_changed_files(zones, BufferedLogger(), cache, **options)
+        (tmp_path / "hosts.inc").write_text("www IN A 10.0.0.3\n", encoding=ZONE_FILE_ENCODING)
+        assert not cache.is_clean(zones[0]) and cache.is_clean(zones[1])
+        return
+    else:
+        for p in zones:
+            process_file(p, BufferedLogger(), check=mode == "check", dependencies=file_dependencies.setdefault(p, {}), **options)
+
+    assert [list(file_dependencies[p]) for p in zones] == [[tmp_path / "hosts.inc"], []]
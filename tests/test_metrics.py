@@ -0,0 +1,55 @@
+import io
+import json
+import pytest
+from cleandns.logger import BufferedLogger
+from cleandns.metrics import FileMetrics, MetricsReporter, NULL_METRICS
+
+def test_phase_accumulates_wall_time():
+    """Test that a phase measured twice adds up and records the peak memory."""
+    metrics = FileMetrics("example.zone")
+    with metrics.phase("sort"):
+        pass
+    first = metrics.phases["sort"]
+    with metrics.phase("sort"):
+        pass
+
+    assert metrics.phases["sort"] >= first
+    assert list(metrics.phases) == ["sort"]
+    assert metrics.peak_memory_bytes > 0
+
+def test_null_metrics_phase_is_a_no_op():
+    """Test that the null metrics accept phases without measuring anything."""
+    with NULL_METRICS.phase("sort"):
+        pass
+
+def test_reporter_emits_summary_and_json_lines():
+    """Test that the reporter logs a summary when profiling and writes one JSON object per line."""
+    logger = BufferedLogger()
+    output = io.StringIO()
+    reporter = MetricsReporter(logger, profile=True, json_output=output)
+    metrics = FileMetrics("example.zone", records_in=10, records_out=8, duplicates_removed=2)
+
+    reporter.report(metrics)
+    reporter.report(metrics)
+
+    assert logger.messages[0][1].startswith("example.zone:")
+    assert "records 10 -> 8 (2 duplicates)" in logger.messages[0][1]
+    lines = output.getvalue().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["duplicates_removed"] == 2
+
+def test_peak_memory_is_measured_per_file():
+    """Test that a file processed after a bigger one doesn't report the bigger one's peak, where peaks can be reset."""
+    big = FileMetrics("big.zone")
+    with big.phase("parse"):
+        data = bytearray(64 * 2 ** 20)
+        data[::4096] = b"x" * len(data[::4096])
+    del data
+    small = FileMetrics("small.zone")
+    with small.phase("parse"):
+        pass
+
+    if small.peak_memory_scope == "process":
+        pytest.skip("the peak memory can't be reset on this platform")
+    assert big.peak_memory_scope == "file"
+    assert small.peak_memory_bytes < big.peak_memory_bytes - 32 * 2 ** 20
@@ -0,0 +1,87 @@
+import pytest
+from cleandns.dns_file import DNSFile
+from cleandns.owner_index import OwnerIndex
+from tests.conftest import ZONE_FILE_ENCODING
+
+def write_zone(tmp_path, name, records, sample_soa_block):
+    p = tmp_path / name
+    p.write_text(f"$TTL 3600\n{sample_soa_block}\n{records}\n", encoding=ZONE_FILE_ENCODING)
+    return p
+
+def index_zones(tmp_path, sample_soa_block, max_hops=3, **zones):
+    index = OwnerIndex(max_hops=max_hops)
+    for name, records in zones.items():
+        index.add_zone(DNSFile(write_zone(tmp_path, f"{name}.zone", records, sample_soa_block)))
+    return index
+
+def test_cname_targets_resolved_across_zones(tmp_path, sample_soa_block):
+    """Test that relative, absolute, cross-zone, wildcard and external targets are not dangling."""
+    index = index_zones(tmp_path, sample_soa_block, **{
+        "example.com": "www IN CNAME web\nweb IN A 10.0.0.1\nftp IN CNAME host.example.org.\n"
+                       "cdn IN CNAME edge.cdn.net.\napex IN CNAME example.com.\nany IN CNAME foo.dyn.example.com.\n*.dyn IN A 10.0.0.2",
+        "example.org": "host IN AAAA ::1",
+    })
+
+    assert list(index.problems()) == []
+
+def test_dangling_cname(tmp_path, sample_soa_block):
+    """Test that a target inside an indexed zone without any record is reported."""
+    index = index_zones(tmp_path, sample_soa_block, **{
+        "example.com": "www IN CNAME gone\nftp IN CNAME gone.example.org.",
+        "example.org": "host IN A 10.0.0.1",
+    })
+
+    assert list(index.problems()) == ["example.com.zone: dangling CNAME www.example.com -> gone.example.com",
+                                      "example.com.zone: dangling CNAME ftp.example.com -> gone.example.org"]
+
+def test_cname_and_other_data(tmp_path, sample_soa_block):
+    """Test that a CNAME next to other data or another CNAME is reported, but not next to DNSSEC records."""
+    index = index_zones(tmp_path, sample_soa_block, **{
+        "example.com": "www IN CNAME web\nwww IN MX 10 mail\nweb IN A 10.0.0.1\nmail IN A 10.0.0.2\n"
+                       "ftp IN CNAME web\nftp IN CNAME mail\nsigned IN CNAME web\nsigned IN RRSIG CNAME 8 3 3600 1 2 3 x. sig",
+    })
+
+    assert list(index.problems()) == ["example.com.zone: www.example.com has both a CNAME and MX data",
+                                      "example.com.zone: ftp.example.com has 2 CNAME records"]
+
+@pytest.mark.parametrize("max_hops, expected", [
+    (3, []),
+    (2, ["a.example.com.zone: CNAME chain of 3 hops from one.a.example.com (more than 2)"]),
+    (1, ["a.example.com.zone: CNAME chain of 3 hops from one.a.example.com (more than 1)",
+         "b.example.com.zone: CNAME chain of 2 hops from two.b.example.com (more than 1)"]),
+])
+def test_long_cname_chains(tmp_path, sample_soa_block, max_hops, expected):
+    """Test that chains are followed across zones and reported when longer than max_hops."""
+    index = index_zones(tmp_path, sample_soa_block, max_hops=max_hops, **{
+        "a.example.com": "one IN CNAME two.b.example.com.\nend IN A 10.0.0.1",
+        "b.example.com": "two IN CNAME three\nthree IN CNAME end.a.example.com.",
+    })
+
+    assert list(index.problems()) == expected
+
+def test_cname_loop(tmp_path, sample_soa_block):
+    index = index_zones(tmp_path, sample_soa_block, **{"example.com": "a IN CNAME b\nb IN CNAME a\nc IN CNAME a"})
+
+    assert list(index.problems()) == [f"example.com.zone: CNAME loop at {name}.example.com" for name in "abc"]
+
+def test_update_merges_indexes(tmp_path, sample_soa_block):
+    """Test that indexes built separately (e.g. by worker processes) find the same problems once merged."""
+    zones = {"a.example.com": "www IN CNAME x.b.example.com.", "b.example.com": "x IN CNAME y\ny IN TXT hello"}
+    expected = list(index_zones(tmp_path, sample_soa_block, max_hops=1, **zones).problems())
+
+    merged = OwnerIndex(max_hops=1)
+    for name, records in zones.items():
+        merged.update(index_zones(tmp_path, sample_soa_block, **{name: records}))
+
+    assert list(merged.problems()) == expected != []
+
+def test_absolute_soa_owner_with_relative_records(tmp_path):
+    """Test that relative records are qualified with the zone even when its SOA owner is written absolute."""
+    p = tmp_path / "example.com.zone"
+    p.write_text("$TTL 3600\nexample.com. IN SOA ns1.example.com. admin.example.com. 1 2 3 4 5\n"
+                 "host IN A 10.0.0.1\nalias IN CNAME host.example.com.\nshort IN CNAME host\n", encoding=ZONE_FILE_ENCODING)
+    index = OwnerIndex()
+    index.add_zone(DNSFile(p))
+
+    assert list(index.problems()) == []
+    assert set(index.cnames) == {"alias.example.com", "short.example.com"}
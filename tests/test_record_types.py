@@ -1,4 +1,8 @@
-from cleandns.record_types import PTRRecord, RecordType, DNSClass
+import dataclasses
+
+import pytest
+
+from cleandns.record_types import PTRRecord, RecordType, DNSClass, SOARecord
 
 #def test_a_record_creation(sample_a_record):
 #    """Test the creation of an A record."""
@@ -40,3 +44,88 @@ from cleandns.record_types import PTRRecord, RecordType, DNSClass
 #    
 #    assert records[0] == r2
 #    assert records[1] == r1
+
+def make_ptr(name, rdata="host.example.com."):
+    return PTRRecord(name=name, ttl=300, type=RecordType.PTR, class_=DNSClass.IN, rdata=rdata, comment=None)
+
+def test_ptr_sort_key_orders_labels_numerically():
+    """Test that PTR sort keys order numeric labels by value, not alphabetically."""
+    records = [make_ptr("10.1"), make_ptr("2.1"), make_ptr("foo.1"), make_ptr("2.1", "a.example.com.")]
+
+    ordered = sorted(records, key=lambda r: r.sort_key)
+
+    assert [(r.name, r.rdata) for r in ordered] == [("2.1", "a.example.com."), ("2.1", "host.example.com."), ("10.1", "host.example.com."), ("foo.1", "host.example.com.")]
+
+def test_sort_key_matches_lt():
+    """Test that sorting by key gives the same order as sorting with __lt__."""
+    records = [make_ptr(f"{i % 7}.{i % 13}.{i % 3}", f"H{i % 5}.example.com.") for i in range(200)]
+
+    assert sorted(records, key=lambda r: r.sort_key) == sorted(records)
+
+def test_sort_key_is_cached():
+    """Test that the sort key is computed once per record."""
+    record = make_ptr("1.2.3")
+
+    assert record.sort_key is record.sort_key
+
+def test_identity_is_hashable_and_cached():
+    """Test that the identity is a hashable tuple computed once per record."""
+    record = make_ptr("1.2.3")
+
+    assert record.identity is record.identity
+    assert record.identity == ("1.2.3", DNSClass.IN, RecordType.PTR, "host.example.com.")
+    assert len({record.identity, make_ptr("1.2.3").identity}) == 1
+
+def test_canonical_identity_ignores_case_and_final_dot():
+    """Test that canonical identities match across case and the final dot."""
+    assert make_ptr("1.2.3", "HOST.example.com.").canonical_identity == make_ptr("1.2.3.", "host.example.com").canonical_identity
+    assert make_ptr("1.2.3", "HOST.example.com.").identity != make_ptr("1.2.3", "host.example.com.").identity
+
+def test_records_are_slotted():
+    """Test that records carry no per-instance __dict__."""
+    record = make_ptr("1.2.3")
+
+    assert not hasattr(record, "__dict__")
+    assert record == make_ptr("1.2.3")
+
+def make_soa(serial=1):
+    return SOARecord(name="example.com", ttl=3600, type=RecordType.SOA, class_=DNSClass.IN, rdata="", comment=None,
+                     mname="ns1.example.com.", rname="admin.example.com.", serial=serial, refresh=7200, retry=3600,
+                     expire=1209600, minimum=3600)
+
+def test_lowered_rdata_is_shared():
+    """Test that the sort key and the canonical identity reuse the lowered rdata instead of lowering it again."""
+    record = make_ptr("1.2.3", "HOST.example.com")
+
+    assert record.sort_key[1] is record.lowered_rdata
+    assert record.canonical_identity[3] is record.lowered_rdata
+
+def test_soa_text_is_cached_until_a_field_changes():
+    """Test that incrementing the serial (or changing any field) renders the SOA again."""
+    soa = make_soa()
+    assert str(soa) is str(soa)
+
+    soa.increment_serial()
+
+    assert "\t2\t; serial" in str(soa)
+    assert str(dataclasses.replace(soa, serial=5)).count("\t5\t; serial") == 1
+
+def test_invalidate_clears_cached_keys():
+    """Test that a record changed in place gets keys computed from its new fields."""
+    record = make_ptr("1.2.3")
+    assert record.identity[3] == "host.example.com."
+
+    record.rdata = "OTHER.example.com."
+    record.invalidate()
+
+    assert record.identity[3] == "OTHER.example.com."
+    assert record.sort_key[1] == "other.example.com."
+
+def test_unknown_type_mnemonics_are_rejected():
+    """Test that only known mnemonics and TYPE<n> numbers become record types, so typos don't add members."""
+    assert RecordType("LOC") is RecordType("LOC")
+    assert RecordType("TYPE65535").value == "TYPE65535"
+    for value in ("AA", "IS", "TYPE65536", "TYPE", "loc"):
+        with pytest.raises(ValueError):
+            RecordType(value)
+    assert "AA" not in RecordType._value2member_map_
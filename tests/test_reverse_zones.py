@@ -0,0 +1,116 @@
+import pytest
+from cleandns.backup import BackupPolicy
+from cleandns.dns_file import DNSFile
+from cleandns.logger import BufferedLogger
+from cleandns.record_types import RecordType
+from cleandns.reverse_zones import ReverseIndex, forward_origin, qualify, reconcile_reverse_zone
+from tests.conftest import ZONE_FILE_ENCODING
+
+NO_BACKUP = BackupPolicy(mode="none")
+
+@pytest.fixture
+def forward_zone(tmp_path, sample_ttl_line, sample_soa_block, sample_ns_block):
+    p = tmp_path / "example.com.zone"
+    p.write_text(f"{sample_ttl_line}\n{sample_soa_block}\n{sample_ns_block}\n"
+                 "www IN A 10.0.1.10\nmail IN A 10.0.1.20\nftp IN A 10.0.2.5\nwww IN AAAA ::1\n",
+                 encoding=ZONE_FILE_ENCODING)
+    return p
+
+def ptr_lines(path):
+    return [line for line in path.read_text(encoding=ZONE_FILE_ENCODING).splitlines() if "\tPTR\t" in line]
+
+@pytest.mark.parametrize("owner, expected", [
+    ("www", "www.example.com."),
+    (".", "example.com."),
+    ("WWW.Example.com", "WWW.Example.com."),
+    ("host.other.org", "host.other.org.example.com."),
+])
+def test_qualify(owner, expected):
+    assert qualify(owner, "example.com") == expected
+
+def test_forward_origin_from_file_name(forward_zone, tmp_path):
+    """Test that a zone without $ORIGIN is named after its file, and one with it after its SOA."""
+    assert forward_origin(DNSFile(forward_zone)) == "example.com"
+
+    p = tmp_path / "db.other"
+    p.write_text("$ORIGIN Other.ORG.\n@ IN SOA ns1 admin 1 2 3 4 5\n", encoding=ZONE_FILE_ENCODING)
+    assert forward_origin(DNSFile(p)) == "other.org"
+
+@pytest.mark.parametrize("prefix_length, zones", [
+    (24, {"1.0.10.in-addr.arpa": ["10", "20"], "2.0.10.in-addr.arpa": ["5"]}),
+    (16, {"0.10.in-addr.arpa": ["10.1", "20.1", "5.2"]}),
+    (8, {"10.in-addr.arpa": ["10.1.0", "20.1.0", "5.2.0"]}),
+])
+def test_index_groups_addresses_by_network(forward_zone, prefix_length, zones):
+    """Test that the A records are spread over the reverse zones of their network, with relative owners."""
+    index = ReverseIndex(prefix_length)
+
+    assert index.add_zone(DNSFile(forward_zone)) == 3
+    assert {name: [r.name for r in records] for name, records in index.zones.items()} == zones
+    assert index.zones[next(iter(zones))][0].rdata == "www.example.com."
+
+def test_index_skips_invalid_addresses(tmp_path, sample_soa_block):
+    p = tmp_path / "example.com.zone"
+    p.write_text(f"{sample_soa_block}\nbad IN A 10.0.0.256\nok IN A 10.0.0.1\n", encoding=ZONE_FILE_ENCODING)
+    index = ReverseIndex()
+
+    assert index.add_zone(DNSFile(p)) == 1
+    assert index.skipped == 1
+
+def test_index_rejects_classless_prefixes():
+    with pytest.raises(ValueError):
+        ReverseIndex(25)
+
+def test_reconcile_creates_missing_zone(forward_zone, tmp_path):
+    """Test that a new reverse zone gets the SOA and name servers of the forward zone, and a first serial."""
+    index = ReverseIndex()
+    index.add_zone(DNSFile(forward_zone))
+    path = tmp_path / "1.0.10.in-addr.arpa.zone"
+
+    assert reconcile_reverse_zone(path, "1.0.10.in-addr.arpa", index.zones["1.0.10.in-addr.arpa"],
+                                  index.templates["1.0.10.in-addr.arpa"], logger=BufferedLogger(), backup_policy=NO_BACKUP)
+
+    zone = DNSFile(path)
+    assert zone.soa_record.serial == 1
+    assert zone.soa_record.mname == "ns1.example.com."
+    assert [r.rdata for r in zone.records[RecordType.NS]] == ["ns1.example.com.", "ns2.example.com."]
+    assert ptr_lines(path) == ["10\t3600\tIN\tPTR\twww.example.com.", "20\t3600\tIN\tPTR\tmail.example.com."]
+
+    import dns.zone
+
+    loaded = dns.zone.from_file(str(path), origin="1.0.10.in-addr.arpa.", relativize=False)
+    assert loaded.get_soa().mname.to_text() == "ns1.example.com."
+    assert loaded.find_rdataset("10.1.0.10.in-addr.arpa.", "PTR")[0].target.to_text() == "www.example.com."
+
+@pytest.mark.parametrize("prune, expected", [
+    (False, ["10", "20", "30"]),
+    (True, ["10", "20"]),
+])
+def test_reconcile_existing_zone(forward_zone, tmp_path, sample_ttl_line, sample_soa_block, prune, expected):
+    """Test that missing PTR records are added, and stale ones only removed with prune."""
+    path = tmp_path / "1.0.10.in-addr.arpa.zone"
+    path.write_text(f"{sample_ttl_line}\n{sample_soa_block}\n"
+                    "30 IN PTR old.example.com.\n10.1.0.10.in-addr.arpa. IN PTR WWW.example.com\n",
+                    encoding=ZONE_FILE_ENCODING)
+    index = ReverseIndex()
+    index.add_zone(DNSFile(forward_zone))
+
+    assert reconcile_reverse_zone(path, "1.0.10.in-addr.arpa", index.zones["1.0.10.in-addr.arpa"],
+                                  index.templates["1.0.10.in-addr.arpa"], prune=prune, logger=BufferedLogger(),
+                                  backup_policy=NO_BACKUP)
+
+    # The PTR already there is kept as written
+    assert [line.split("\t")[0] for line in ptr_lines(path)] == [
+        "10.1.0.10.in-addr.arpa" if name == "10" else name for name in expected]
+    assert DNSFile(path).soa_record.serial == 2023101002
+
+def test_reconcile_up_to_date_zone_is_not_rewritten(forward_zone, tmp_path):
+    index = ReverseIndex()
+    index.add_zone(DNSFile(forward_zone))
+    path = tmp_path / "2.0.10.in-addr.arpa.zone"
+    arguments = (path, "2.0.10.in-addr.arpa", index.zones["2.0.10.in-addr.arpa"], index.templates["2.0.10.in-addr.arpa"])
+    reconcile_reverse_zone(*arguments, logger=BufferedLogger(), backup_policy=NO_BACKUP)
+    mtime = path.stat().st_mtime_ns
+
+    assert reconcile_reverse_zone(*arguments, prune=True, logger=BufferedLogger(), backup_policy=NO_BACKUP) is False
+    assert path.stat().st_mtime_ns == mtime
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).parent.parent
+# Cumulative import time of the entry point, in microseconds. It was about 200 ms when dnspython and
+# multiprocessing were imported eagerly and is under 100 ms without them; CI machines may raise it.
+IMPORT_TIME_BUDGET_US = int(os.environ.get("CLEANDNS_IMPORT_BUDGET_US", 150_000))
+# Modules only needed once a zone is actually parsed or files are processed in parallel
+LAZY_MODULES = ["dns", "multiprocessing", "concurrent.futures.process", "cleandns.dns_file",
+                "cleandns.zone_parser", "cleandns.record_types", "cleandns.watcher", "cleandns.reverse_zones"]
+
+
+def import_times(statement: str) -> dict:
+    """
+    Runs the statement in a fresh interpreter with -X importtime and returns the cumulative
+    import time of every module, in microseconds.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(ROOT / "src"), str(ROOT)]))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_startup_does_not_import_heavy_modules():
+    """Test that importing the entry point (e.g. for --help) loads neither dnspython nor the parser."""
+    modules = import_times("import src.cleandns.main")
+
+    for lazy in LAZY_MODULES:
+        assert not [module for module in modules if module == lazy or module.endswith(f".{lazy}")
+                    or module.startswith(f"{lazy}.")], f"{lazy} is imported at startup"
+
+
+def test_startup_import_time_budget():
+    """Test that the entry point imports within the budget (best of three runs, to ignore noise)."""
+    elapsed = min(import_times("import src.cleandns.main")["src.cleandns.main"] for _ in range(3))
+
+    assert elapsed < IMPORT_TIME_BUDGET_US, f"importing cleandns took {elapsed / 1000:.1f} ms"
+
+
+@pytest.mark.parametrize("arguments", [["--help"], ["--check", "-f", "missing.zone", "--no-cache"]])
+def test_cli_runs_without_parsing(arguments):
+    """Test that --help and runs without a single zone to parse never load dnspython."""
+    statement = ("import sys, src.cleandns.main as main; sys.argv = ['cleandns'] + sys.argv[1:]\n"
+                 "try:\n    main.main()\nexcept SystemExit:\n    pass\n"
+                 "assert 'dns.zone' not in sys.modules")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(ROOT / "src"), str(ROOT)]))
+    subprocess.run([sys.executable, "-c", statement, *arguments], cwd=ROOT, env=env, capture_output=True, check=True)
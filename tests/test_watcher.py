@@ -0,0 +1,48 @@
+import os
+from pathlib import Path
+import pytest
+from cleandns.watcher import DirectoryWatcher, is_ignored
+from tests.conftest import ZONE_FILE_ENCODING
+
+@pytest.fixture(params=[False, True], ids=["inotify", "polling"])
+def watcher(request, tmp_path):
+    watcher = DirectoryWatcher(tmp_path, debounce=0.05, poll_interval=0.02, polling=request.param)
+    yield watcher
+    watcher.close()
+
+@pytest.mark.parametrize("name, ignored", [
+    ("example.com.zone", False),
+    ("example.com.zone.tmp", True),
+    ("example.com.zone.2024-01-31_12-00-00", True),
+    ("example.com.zone.2024-01-31_12-00-00.gz", True),
+    (".example.com.zone.swp", True),
+    ("example.com.zone~", True),
+])
+def test_is_ignored(name, ignored):
+    assert is_ignored(Path(name)) is ignored
+
+def test_wait_reports_a_burst_once(watcher, tmp_path, forward_sample_zone_content):
+    """Test that several writes to a file are reported as a single change."""
+    zone = tmp_path / "example.com.zone"
+    for _ in range(3):
+        zone.write_text(forward_sample_zone_content, encoding=ZONE_FILE_ENCODING)
+
+    assert watcher.wait(timeout=2) == [zone]
+    assert watcher.wait(timeout=0.1) == []
+
+def test_wait_ignores_own_files(watcher, tmp_path, forward_sample_zone_content):
+    """Test that temporary files and backups never trigger a clean, while a zone moved in does."""
+    zone = tmp_path / "example.com.zone"
+    tmp = tmp_path / "example.com.zone.tmp"
+    tmp.write_text(forward_sample_zone_content, encoding=ZONE_FILE_ENCODING)
+    (tmp_path / "example.com.zone.2024-01-31_12-00-00").write_text("", encoding=ZONE_FILE_ENCODING)
+    os.replace(tmp, zone)
+
+    assert watcher.wait(timeout=2) == [zone]
+
+def test_pattern_filters_zones(tmp_path):
+    watcher = DirectoryWatcher(tmp_path, pattern="*.zone", polling=True)
+    for name in ("a.zone", "README", "a.zone.tmp"):
+        (tmp_path / name).write_text("", encoding=ZONE_FILE_ENCODING)
+
+    assert watcher.zones() == [tmp_path / "a.zone"]
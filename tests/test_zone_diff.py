@@ -0,0 +1,47 @@
+from cleandns.record_types import ARecord, PTRRecord, RecordType, DNSClass
+from cleandns.zone_diff import ZoneDiff, merge_join
+
+def make_a(name, rdata, ttl=3600):
+    return ARecord(name=name, ttl=ttl, type=RecordType.A, class_=DNSClass.IN, rdata=rdata, comment=None)
+
+def make_ptr(name, rdata):
+    return PTRRecord(name=name, ttl=3600, type=RecordType.PTR, class_=DNSClass.IN, rdata=rdata, comment=None)
+
+def test_merge_join_reports_added_and_removed():
+    """Test that only the unmatched records of each side are reported."""
+    old = [make_a("a", "1.1.1.1"), make_a("b", "2.2.2.2"), make_a("c", "3.3.3.3")]
+    new = [make_a("a", "1.1.1.1"), make_a("c", "3.3.3.3"), make_a("d", "4.4.4.4")]
+    diff = ZoneDiff()
+
+    merge_join(old, new, diff)
+
+    assert [r.name for r in diff.removed] == ["b"]
+    assert [r.name for r in diff.added] == ["d"]
+
+def test_merge_join_handles_unsorted_input_and_ttl_changes():
+    """Test that unsorted input is joined correctly and a TTL change is a removal plus an addition."""
+    old = [make_a("b", "2.2.2.2"), make_a("a", "1.1.1.1")]
+    new = [make_a("a", "1.1.1.1", ttl=60), make_a("b", "2.2.2.2")]
+    diff = ZoneDiff()
+
+    merge_join(old, new, diff)
+
+    assert [(r.name, r.ttl) for r in diff.removed] == [("a", 3600)]
+    assert [(r.name, r.ttl) for r in diff.added] == [("a", 60)]
+
+def test_merge_join_follows_ptr_order():
+    """Test that PTR records are joined in their natural numeric order."""
+    old = [make_ptr("2.1", "x."), make_ptr("10.1", "y.")]
+    new = [make_ptr("2.1", "x."), make_ptr("10.1", "y."), make_ptr("9.1", "z.")]
+    diff = ZoneDiff()
+
+    merge_join(old, new, diff)
+
+    assert diff.removed == []
+    assert [r.name for r in diff.added] == ["9.1"]
+
+def test_empty_diff_is_falsy():
+    """Test that identical zones produce an empty diff."""
+    diff = ZoneDiff(old_serial=1, new_serial=1)
+    assert not diff
+    assert list(diff.lines()) == []
@@ -0,0 +1,25 @@
+import pytest
+from benchmarks.zone_generator import generate_zone, write_zone
+from cleandns.dns_file import DNSFile
+from cleandns.record_types import RecordType
+
+def test_generation_is_deterministic():
+    """Test that the same arguments always generate the same zone."""
+    kwargs = dict(records=500, duplicate_ratio=0.1, disorder=0.5, seed=3)
+    assert list(generate_zone(**kwargs)) == list(generate_zone(**kwargs))
+
+@pytest.mark.parametrize("kind", ["forward", "reverse"])
+def test_zone_without_disorder_or_duplicates_is_clean(tmp_path, kind):
+    """Test that a generated zone without disorder or duplicates needs no cleaning."""
+    dns = DNSFile(write_zone(tmp_path / "clean.zone", records=300, kind=kind, disorder=0))
+    dns.remove_duplicates()
+    dns.sort()
+
+    assert dns.modified is False
+
+def test_duplicates_are_generated(tmp_path):
+    """Test that the duplicate ratio is honoured."""
+    dns = DNSFile(write_zone(tmp_path / "dup.zone", records=1000, kind="reverse", duplicate_ratio=0.1, disorder=0))
+    dns.remove_duplicates()
+
+    assert len(dns.records[RecordType.PTR]) == 900
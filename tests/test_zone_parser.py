@@ -0,0 +1,265 @@
+import pytest
+from cleandns.exceptions import ZoneSyntaxError
+from cleandns.record_types import RecordType, DNSClass
+import mmap
+from cleandns import zone_parser
+from cleandns.zone_parser import ZoneParser, iter_lines, parse_ttl, split_line
+
+def parse(content):
+    parser = ZoneParser("test.zone")
+    return parser, list(parser.parse(content.splitlines(keepends=True)))
+
+# --- Helpers ---
+
+@pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview], ids=["bytes", "bytearray", "memoryview"])
+def test_iter_lines_across_chunks(monkeypatch, wrap):
+    """Test that lines and multi-byte characters split across decode chunks come out whole."""
+    monkeypatch.setattr(zone_parser, "DECODE_CHUNK_SIZE", 3)
+    text = "a IN TXT \"caf\u00e9\"\r\n\nb IN A 10.0.0.1"
+
+    assert list(iter_lines(wrap(text.encode("utf-8")))) == ["a IN TXT \"caf\u00e9\"\r", "", "b IN A 10.0.0.1"]
+
+def test_iter_lines_over_mmap(tmp_path):
+    path = tmp_path / "example.com.zone"
+    path.write_bytes(b"a IN A 10.0.0.1\nb IN A 10.0.0.2\n")
+
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        assert list(iter_lines(mapped)) == ["a IN A 10.0.0.1", "b IN A 10.0.0.2"]
+
+
+@pytest.mark.parametrize("text, expected", [("3600", 3600), ("1h", 3600), ("1w2d", 777600), ("1H30M", 5400)])
+def test_parse_ttl(text, expected):
+    """Test that BIND TTL formats are converted to seconds."""
+    assert parse_ttl(text) == expected
+
+@pytest.mark.parametrize("text", ["", "h1", "1x", "1h30", "99999999999"])
+def test_parse_ttl_invalid(text):
+    """Test that invalid TTLs raise ValueError."""
+    with pytest.raises(ValueError):
+        parse_ttl(text)
+
+def test_split_line_keeps_quoted_semicolons():
+    """Test that a ';' inside quotes does not start a comment."""
+    assert split_line('txt IN TXT "a;b" ; comment') == ["txt", "IN", "TXT", '"a;b"']
+
+def test_split_line_separates_parentheses_outside_quotes():
+    """Test that grouping parentheses are tokens of their own, but not the ones inside quotes."""
+    assert split_line('x TXT ("a (b)")') == ["x", "TXT", "(", '"a (b)"', ")"]
+    assert split_line("@ SOA ns1 admin (1") == ["@", "SOA", "ns1", "admin", "(", "1"]
+
+# --- Parsing ---
+
+def test_parse_forward_zone(forward_sample_zone_content):
+    """Test that every supported record of the sample zone is yielded."""
+    parser, records = parse(forward_sample_zone_content)
+
+    assert parser.ttl == 3600
+    assert [r.type for r in records] == [RecordType.SOA, RecordType.NS, RecordType.NS, RecordType.A, RecordType.A, RecordType.CNAME]
+    soa = records[0]
+    assert soa.name == "."
+    assert soa.serial == 2023101001
+    assert soa.minimum == 86400
+    assert records[3].name == "www"
+    assert records[3].rdata == "192.168.1.10"
+    assert records[5].rdata == "www."
+
+def test_parse_origin_and_relative_names(sample_soa_block):
+    """Test that $ORIGIN applies to owners and rdata names, and that owners read under it stay absolute."""
+    content = (
+        "$TTL 300\n"
+        f"{sample_soa_block}\n"
+        "$ORIGIN example.com.\n"
+        "www IN A 1.2.3.4\n"
+        "ftp IN CNAME www\n"
+        "@ IN NS ns1\n"
+    )
+    _, records = parse(content)
+
+    assert [(r.name, r.rdata) for r in records[1:]] == [
+        ("www.example.com.", "1.2.3.4"),
+        ("ftp.example.com.", "www.example.com."),
+        ("example.com.", "ns1.example.com."),
+    ]
+
+def test_parse_ttl_and_class_in_any_order(sample_soa_block):
+    """Test that TTL and class may be given in either order or omitted, and blank owners reuse the last name."""
+    content = (
+        "$TTL 300\n"
+        f"{sample_soa_block}\n"
+        "a 60 IN A 1.1.1.1\n"
+        "b IN 1m A 2.2.2.2\n"
+        "  CH A 3.3.3.3\n"
+    )
+    _, records = parse(content)
+
+    assert [(r.name, r.ttl, r.class_) for r in records[1:]] == [
+        ("a", 60, DNSClass.IN),
+        ("b", 60, DNSClass.IN),
+        ("b", 300, DNSClass.CH),
+    ]
+
+def test_parse_without_ttl_uses_soa_minimum(sample_soa_block):
+    """Test that the SOA minimum is the default TTL when there is no $TTL."""
+    parser, records = parse(f"{sample_soa_block}\nwww IN A 1.2.3.4\n")
+
+    assert parser.ttl is None
+    assert records[1].ttl == 86400
+
+def test_parse_passes_other_types_through(sample_soa_block):
+    """Test that record types cleandns does not rewrite are kept with their rdata as written."""
+    content = (
+        "$TTL 300\n"
+        f"{sample_soa_block}\n"
+        "mx IN MX 10 mail\n"
+        "txt IN TXT \"a (b;\" \"Case\" ; comment\n"
+        "v6 IN AAAA 2001:db8::1\n"
+        "key IN DNSKEY 257 3 13 (\n"
+        "    AbCd== ) ; key tag\n"
+        "loc IN LOC 52 22 23.000 N 4 53 32.000 E -2.00m 0.00m 10000m 10m\n"
+    )
+    _, records = parse(content)
+
+    assert [(r.type, r.rdata) for r in records[1:]] == [
+        (RecordType.MX, "10 mail"),
+        (RecordType.TXT, '"a (b;" "Case"'),
+        (RecordType.AAAA, "2001:db8::1"),
+        (RecordType.DNSKEY, "257 3 13 AbCd=="),
+        (RecordType("LOC"), "52 22 23.000 N 4 53 32.000 E -2.00m 0.00m 10000m 10m"),
+    ]
+    assert type(records[3]).__name__ == "AAAARecord"
+    assert type(records[1]).__name__ == "GenericRecord"
+
+@pytest.mark.parametrize("line, rdata", [
+    ('x IN TXT ( "abc")', '"abc"'),
+    ('x IN TXT ("a  b")', '"a  b"'),
+    ('x IN TXT ("(a" ")b")', '"(a" ")b"'),
+], ids=["spaced", "glued", "quoted-parentheses"])
+def test_parse_parentheses_around_quoted_rdata(sample_soa_block, line, rdata):
+    """Test that grouping parentheses next to quoted strings are dropped and the quoted text is kept as written."""
+    _, records = parse(f"$TTL 300\n{sample_soa_block}\n{line}\n")
+
+    assert records[1].rdata == rdata
+
+@pytest.mark.parametrize("line", ["www IN bad-type 1.2.3.4", "www IN AA 1.2.3.4", "this is garbage text", "www IN TYPE65536 \\# 0"])
+def test_parse_unknown_type_raises(sample_soa_block, line):
+    """Test that a token that isn't a known type mnemonic or a TYPE<n> number raises ZoneSyntaxError."""
+    with pytest.raises(ZoneSyntaxError, match="Unknown record type"):
+        parse(f"$TTL 300\n{sample_soa_block}\n{line}\n")
+
+@pytest.mark.parametrize("line", ["www HS A 1.2.3.4", "www 300 none MX 10 mail", "www ANY TXT \"x\""])
+def test_parse_unsupported_class_raises(sample_soa_block, line):
+    """Test that a class DNSClass doesn't model raises ZoneSyntaxError with the file and line."""
+    with pytest.raises(ZoneSyntaxError, match="Unsupported class .* in test.zone, line 8"):
+        parse(f"$TTL 300\n{sample_soa_block}\n{line}\n")
+
+def test_parse_type_numbers(sample_soa_block):
+    """Test that RFC 3597 TYPE<n> types are kept as generic records."""
+    _, records = parse(f"$TTL 300\n{sample_soa_block}\nwww IN TYPE65534 \\# 1 00\n")
+
+    assert records[1].type is RecordType("TYPE65534")
+
+def test_parse_unbalanced_parentheses_raises(sample_ttl_line):
+    """Test that an unterminated parenthesised block raises ZoneSyntaxError."""
+    with pytest.raises(ZoneSyntaxError):
+        parse(f"{sample_ttl_line}\n@ IN SOA ns1. admin. ( 1 2 3 4 5\n")
+
+def test_parse_invalid_ttl_directive_raises(sample_soa_block):
+    """Test that an invalid $TTL raises ValueError."""
+    with pytest.raises(ValueError, match="Invalid TTL"):
+        parse(f"$TTL INVALID\n{sample_soa_block}\n")
+
+def test_parse_generate_unsupported(sample_soa_block):
+    """Test that unsupported directives raise ZoneSyntaxError."""
+    with pytest.raises(ZoneSyntaxError):
+        parse(f"$GENERATE 1-10 host$ A 10.0.0.$\n{sample_soa_block}\n")
+
+# --- $INCLUDE ---
+
+def parse_with_includes(path, cache):
+    parser = ZoneParser(path.name, directory=path.parent, include_cache=cache)
+    return parser, list(parser.parse(path.read_text(encoding="utf-8").splitlines()))
+
+def test_parse_include_relative_to_zone(tmp_path, sample_soa_block):
+    """Test that included files are found next to the zone, keep their records apart and don't change the origin."""
+    (tmp_path / "common").mkdir()
+    (tmp_path / "common" / "hosts.inc").write_text("www IN A 10.0.0.1\n$ORIGIN other.\nftp IN A 10.0.0.2\n")
+    zone = tmp_path / "example.com.zone"
+    zone.write_text(f"$ORIGIN example.com.\n{sample_soa_block}\n$INCLUDE common/hosts.inc\nmail IN A 10.0.0.3\n")
+
+    parser, records = parse_with_includes(zone, zone_parser.IncludeCache())
+
+    assert [r.name for r in records] == ["example.com.", "mail.example.com."]
+    assert len(parser.includes) == 1
+    assert str(parser.includes[0]) == "$INCLUDE\tcommon/hosts.inc\texample.com."
+    assert [r.name for r in parser.includes[0].records] == ["www.example.com.", "ftp.other."]
+
+def test_parse_include_with_origin(tmp_path, sample_soa_block):
+    """Test that the origin given to $INCLUDE applies to the included file only."""
+    (tmp_path / "hosts.inc").write_text("www IN A 10.0.0.1\n")
+    zone = tmp_path / "example.com.zone"
+    zone.write_text(f"{sample_soa_block}\n$INCLUDE hosts.inc sub.example.com.\nmail IN A 10.0.0.3\n")
+
+    parser, records = parse_with_includes(zone, zone_parser.IncludeCache())
+
+    assert records[-1].name == "mail"
+    assert parser.includes[0].origin == "sub.example.com."
+    assert parser.includes[0].records[0].name == "www.sub.example.com."
+
+def test_include_cache_shared_between_zones(tmp_path, sample_soa_block):
+    """Test that a fragment included by several zones is parsed once, and again once it changes."""
+    include = tmp_path / "hosts.inc"
+    include.write_text("www IN A 10.0.0.1\n")
+    zones = []
+    for name in ["a.zone", "b.zone"]:
+        zones.append(tmp_path / name)
+        zones[-1].write_text(f"$TTL 300\n{sample_soa_block}\n$INCLUDE hosts.inc\n")
+    cache = zone_parser.IncludeCache()
+
+    first, _ = parse_with_includes(zones[0], cache)
+    second, _ = parse_with_includes(zones[1], cache)
+    assert first.includes[0].records is second.includes[0].records
+
+    include.write_text("www IN A 10.0.0.1\nftp IN A 10.0.0.2\n")
+    third, _ = parse_with_includes(zones[0], cache)
+    assert [r.name for r in third.includes[0].records] == ["www", "ftp"]
+
+def test_include_cache_checks_nested_includes(tmp_path, sample_soa_block):
+    """Test that a cached fragment is parsed again when a file it includes changes."""
+    (tmp_path / "all.inc").write_text("$INCLUDE hosts.inc\n")
+    hosts = tmp_path / "hosts.inc"
+    hosts.write_text("www IN A 10.0.0.1\n")
+    zone = tmp_path / "example.com.zone"
+    zone.write_text(f"$TTL 300\n{sample_soa_block}\n$INCLUDE all.inc\n")
+    cache = zone_parser.IncludeCache()
+    parse_with_includes(zone, cache)
+
+    hosts.write_text("www IN A 10.0.0.1\nftp IN A 10.0.0.2\n")
+    parser, _ = parse_with_includes(zone, cache)
+
+    assert [r.name for r in parser.includes[0].records] == ["www", "ftp"]
+
+def test_parse_nested_includes(tmp_path, sample_soa_block):
+    """Test that nested includes are resolved next to their parent and flattened into it."""
+    (tmp_path / "common").mkdir()
+    (tmp_path / "common" / "all.inc").write_text("$INCLUDE hosts.inc\nmail IN A 10.0.0.3\n")
+    (tmp_path / "common" / "hosts.inc").write_text("www IN A 10.0.0.1\n")
+    zone = tmp_path / "example.com.zone"
+    zone.write_text(f"{sample_soa_block}\n$INCLUDE common/all.inc\n")
+
+    parser, _ = parse_with_includes(zone, zone_parser.IncludeCache())
+
+    assert [r.name for r in parser.includes[0].records] == ["mail", "www"]
+
+@pytest.mark.parametrize("content, message", [
+    ("$INCLUDE loop.inc\n", "Recursive"),
+    ("$INCLUDE missing.inc\n", "Cannot include"),
+    ("@ IN SOA ns1. admin. 1 2 3 4 5\n", "SOA"),
+], ids=["recursive", "missing", "soa"])
+def test_parse_invalid_include_raises(tmp_path, sample_soa_block, content, message):
+    """Test that recursive, missing and SOA-holding includes raise ZoneSyntaxError."""
+    (tmp_path / "loop.inc").write_text(content)
+    zone = tmp_path / "example.com.zone"
+    zone.write_text(f"{sample_soa_block}\n$INCLUDE loop.inc\n")
+
+    with pytest.raises(ZoneSyntaxError, match=message):
+        parse_with_includes(zone, zone_parser.IncludeCache())
@@ -0,0 +1,50 @@
+import os
+import pytest
+from cleandns.zone_writer import ZoneWriter
+from tests.conftest import ZONE_FILE_ENCODING
+
+LINES = [f"host{i}\t3600\tIN\tA\t10.0.0.{i % 256}\n" for i in range(1000)]
+
+def test_write_returns_bytes_written(tmp_path):
+    """Test that every line is written in order and the byte count matches the file."""
+    path = tmp_path / "out.zone"
+    writer = ZoneWriter(chunk_lines=7)
+
+    with writer.open(path, exclusive=True) as file:
+        written = writer.write(file, iter(LINES))
+
+    assert path.read_text(encoding=ZONE_FILE_ENCODING) == "".join(LINES)
+    assert written == path.stat().st_size
+
+def test_chunks_group_lines():
+    """Test that lines are encoded in chunks of chunk_lines."""
+    chunks = list(ZoneWriter(chunk_lines=400)._chunks(LINES))
+
+    assert len(chunks) == 3
+    assert b"".join(chunks) == "".join(LINES).encode(ZONE_FILE_ENCODING)
+
+def test_exclusive_open_refuses_existing_file(tmp_path):
+    path = tmp_path / "out.zone"
+    path.write_text("", encoding=ZONE_FILE_ENCODING)
+
+    with pytest.raises(FileExistsError):
+        ZoneWriter().open(path, exclusive=True)
+
+def test_invalid_durability_raises():
+    with pytest.raises(ValueError):
+        ZoneWriter(durability="always")
+
+@pytest.mark.parametrize("durability, file_syncs, directory_syncs", [("none", 0, 0), ("file", 1, 0), ("full", 1, 1)])
+def test_durability_modes(tmp_path, monkeypatch, durability, file_syncs, directory_syncs):
+    """Test that the file is only synced when durable, and the directory only in full mode."""
+    synced = []
+    monkeypatch.setattr(os, "fsync", synced.append)
+    path = tmp_path / "out.zone"
+    writer = ZoneWriter(durability=durability)
+
+    with writer.open(path) as file:
+        writer.write(file, LINES)
+    assert len(synced) == file_syncs
+
+    writer.sync_directory(path)
+    assert len(synced) == file_syncs + directory_syncs